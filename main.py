@@ -6,6 +6,7 @@ import sys
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import threading
+import functools
 from pathlib import Path
 from tkinter import font
 
@@ -14,8 +15,10 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
 from src.utils import ConfigManager, FileManager, Logger
 from src.downloader import VideoDownloader
+from src.download_scheduler import DownloadScheduler, PRIORITY_SELECTED, PRIORITY_NORMAL
 from src.youtube_api import YouTubeAPIService
 from src.processor import VideoProcessor
+from src.encoding_profiles import ENCODING_PROFILES, DEFAULT_PROFILE
 from src.uploader import VideoUploader
 from src.profile_manager import ProfileManager
 
@@ -433,6 +436,9 @@ class TikTokReupApp:
                  style='Modern.TEntry', width=80).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0,10))
         ttk.Button(url_input_frame, text="📋 Lấy danh sách", style='Primary.TButton',
                   command=self.fetch_channel_list).pack(side=tk.RIGHT)
+        self.channel_only_new_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(url_frame, text="Chỉ lấy video mới (từ lần lấy danh sách trước)",
+                        variable=self.channel_only_new_var).pack(anchor=tk.W, pady=(5, 0))
         
         # Danh sách video (Treeview 4 cột)
         list_frame = ttk.LabelFrame(channel_frame, text="📋 Danh sách video", padding=15)
@@ -468,6 +474,11 @@ class TikTokReupApp:
         ttk.Button(actions, text="Tải đã chọn", command=lambda: self.download_channel_videos(selected_only=True)).pack(side=tk.LEFT)
         ttk.Button(actions, text="Tải tất cả", command=lambda: self.download_channel_videos(selected_only=False)).pack(side=tk.LEFT, padx=(10,0))
         ttk.Button(actions, text="Tải lại video lỗi", command=self.retry_failed_videos).pack(side=tk.LEFT, padx=(10,0))
+        self.channel_cancel_event = threading.Event()
+        self.channel_stop_btn = ttk.Button(actions, text="Dừng tải", state="disabled",
+                                           command=lambda: self.cancel_downloads(self.channel_cancel_event,
+                                                                                 self.channel_stop_btn))
+        self.channel_stop_btn.pack(side=tk.LEFT, padx=(10,0))
         ttk.Button(actions, text="Xóa video đã chọn", command=self.delete_selected_channel_videos).pack(side=tk.LEFT, padx=(10,0))
         ttk.Button(actions, text="Xóa tất cả", command=self.delete_all_channel_videos).pack(side=tk.LEFT, padx=(10,0))
         
@@ -515,6 +526,9 @@ class TikTokReupApp:
         count_combo = ttk.Combobox(count_frame, textvariable=self.youtube_count_var, 
                                   values=["50", "100", "200", "500"], width=10, state="readonly")
         count_combo.pack(side=tk.LEFT, padx=(5, 10))
+        self.youtube_only_new_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(count_frame, text="Chỉ lấy video mới",
+                        variable=self.youtube_only_new_var).pack(side=tk.LEFT)
         
         ttk.Button(url_input_frame, text="Lấy danh sách", command=self.fetch_youtube_channel_list).pack(side=tk.RIGHT)
         
@@ -569,6 +583,11 @@ class TikTokReupApp:
         ttk.Button(actions, text="Tải đã chọn", command=lambda: self.download_youtube_videos(selected_only=True)).pack(side=tk.LEFT)
         ttk.Button(actions, text="Tải tất cả", command=lambda: self.download_youtube_videos(selected_only=False)).pack(side=tk.LEFT, padx=(10,0))
         ttk.Button(actions, text="Tải lại video lỗi", command=self.retry_failed_youtube_videos).pack(side=tk.LEFT, padx=(10,0))
+        self.youtube_cancel_event = threading.Event()
+        self.youtube_stop_btn = ttk.Button(actions, text="Dừng tải", state="disabled",
+                                           command=lambda: self.cancel_downloads(self.youtube_cancel_event,
+                                                                                 self.youtube_stop_btn))
+        self.youtube_stop_btn.pack(side=tk.LEFT, padx=(10,0))
         ttk.Button(actions, text="Xóa video đã chọn", command=self.delete_selected_youtube_videos).pack(side=tk.LEFT, padx=(10,0))
         ttk.Button(actions, text="Xóa tất cả", command=self.delete_all_youtube_videos).pack(side=tk.LEFT, padx=(10,0))
         
@@ -616,6 +635,10 @@ class TikTokReupApp:
                                state="readonly", width=10)
         cut_combo.pack(side=tk.LEFT, padx=(10, 0))
         
+        self.split_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(cut_frame, text="Chia thành nhiều phần (thay vì chỉ giữ phần đầu)", 
+                       variable=self.split_var).pack(side=tk.LEFT, padx=(10, 0))
+        
         # Watermark options
         watermark_frame = ttk.Frame(options_frame)
         watermark_frame.pack(fill=tk.X, pady=5)
@@ -627,6 +650,14 @@ class TikTokReupApp:
         self.watermark_text_var = tk.StringVar(value="TikTok Reup Offline")
         ttk.Entry(watermark_frame, textvariable=self.watermark_text_var, width=30).pack(side=tk.LEFT, padx=(10, 0))
         
+        # Music options
+        music_frame = ttk.Frame(options_frame)
+        music_frame.pack(fill=tk.X, pady=5)
+        
+        self.music_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(music_frame, text="Nhạc nền ngẫu nhiên (data/music)", 
+                       variable=self.music_var).pack(side=tk.LEFT)
+        
         # Speed options
         speed_frame = ttk.Frame(options_frame)
         speed_frame.pack(fill=tk.X, pady=5)
@@ -654,6 +685,10 @@ class TikTokReupApp:
         ttk.Checkbutton(other_frame, text="Chuyển 9:16", 
                        variable=self.convert_916_var).pack(side=tk.LEFT, padx=(20, 0))
         
+        self.blur_background_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(other_frame, text="Nền mờ", 
+                       variable=self.blur_background_var).pack(side=tk.LEFT, padx=(5, 0))
+        
         self.change_md5_var = tk.BooleanVar(value=True)
         ttk.Checkbutton(other_frame, text="Thay đổi MD5", 
                        variable=self.change_md5_var).pack(side=tk.LEFT, padx=(10, 0))
@@ -666,6 +701,11 @@ class TikTokReupApp:
                                     command=self.process_video, style="Accent.TButton")
         self.process_btn.pack(side=tk.LEFT)
         
+        self.cancel_process_btn = ttk.Button(process_btn_frame, text="Hủy", 
+                                           command=self.cancel_process, state="disabled")
+        self.cancel_process_btn.pack(side=tk.LEFT, padx=(10, 0))
+        self.process_cancel_event = threading.Event()
+        
         # Process log
         log_frame = ttk.LabelFrame(process_frame, text="Log xử lý", padding=10)
         log_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
@@ -762,6 +802,12 @@ class TikTokReupApp:
         ttk.Entry(folder_frame, textvariable=self.download_folder_var).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 10))
         ttk.Button(folder_frame, text="Browse", command=self.browse_download_folder).pack(side=tk.RIGHT)
         
+        per_host_limit = self.config.get('download.per_host_limit', 2)
+        ttk.Label(download_frame, text=f"Số video tải song song (tối đa {per_host_limit} video/nền tảng cùng lúc):").pack(anchor=tk.W)
+        self.download_workers_var = tk.IntVar(value=self.config.get('download.max_workers', 3))
+        ttk.Spinbox(download_frame, from_=1, to=16, textvariable=self.download_workers_var,
+                    width=5).pack(anchor=tk.W, pady=(0, 10))
+        
         # Process settings
         process_frame = ttk.LabelFrame(settings_frame, text="Cài đặt xử lý", padding=10)
         process_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -774,6 +820,11 @@ class TikTokReupApp:
         ttk.Entry(process_folder_frame, textvariable=self.process_folder_var).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 10))
         ttk.Button(process_folder_frame, text="Browse", command=self.browse_process_folder).pack(side=tk.RIGHT)
         
+        ttk.Label(process_frame, text="Profile mã hóa (fast-draft: nhanh, balanced: cân bằng, archive: chất lượng cao):").pack(anchor=tk.W)
+        self.encoding_profile_var = tk.StringVar(value=self.config.get('processing.encoding_profile', DEFAULT_PROFILE))
+        ttk.Combobox(process_frame, textvariable=self.encoding_profile_var,
+                     values=list(ENCODING_PROFILES), state="readonly").pack(anchor=tk.W, fill=tk.X, pady=(0, 10))
+        
         # YouTube API settings
         youtube_frame = ttk.LabelFrame(settings_frame, text="Cài đặt YouTube API", padding=10)
         youtube_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -942,12 +993,17 @@ class TikTokReupApp:
         def fetch_thread():
             try:
                 self.update_status("Đang lấy danh sách video...")
-                videos = self.downloader.list_channel_videos(url, max_videos=50)
+                if self.channel_only_new_var.get():
+                    videos = self.downloader.sync_channel_videos(url, max_videos=50)
+                else:
+                    videos = self.downloader.list_channel_videos(url, max_videos=50)
+                    self.downloader.update_channel_cursor(url, videos)
                 # Khởi tạo thêm thuộc tính 'selected' và 'progress' cho mỗi video
-                self.channel_videos = [{**v, 'selected': True, 'progress': 0.0} for v in videos]
+                self.channel_videos = self._init_video_rows(videos)
+                archived = sum(1 for v in self.channel_videos if v.get('archived'))
                 def update_ui():
                     self.refresh_channel_list_display()
-                    self.update_status(f"Đã lấy {len(videos)} video")
+                    self.update_status(f"Đã lấy {len(videos)} video ({archived} video đã tải trước đó)")
                     self.update_channel_progress(0)
                 self.root.after(0, update_ui)
             except Exception as e:
@@ -971,71 +1027,15 @@ class TikTokReupApp:
         
         def batch_thread():
             try:
-                import time
                 total = len(indices)
-                successful_downloads = 0
                 self.update_status(f"Đang tải danh sách ({total} video)...")
+                successful_downloads = self._run_download_batch(
+                    self.channel_videos, indices, self.update_row_progress, self.update_channel_progress,
+                    self.channel_cancel_event, self.channel_stop_btn)
                 
-                for idx_pos, idx in enumerate(indices, start=1):
-                    video = self.channel_videos[idx]
-                    url = video.get('url')
-                    title = video.get('title') or video.get('id')
-                    
-                    # Cập nhật tiến trình tổng
-                    self.root.after(0, self.update_channel_progress, (idx_pos-1) * 100.0 / total)
-                    self.root.after(0, self.update_row_progress, idx, 0.0)
-                    
-                    # Thử tải với retry
-                    success = False
-                    for retry in range(3):  # Thử tối đa 3 lần
-                        try:
-                            def hook(d):
-                                try:
-                                    status = d.get('status')
-                                    file_percent = None
-                                    if status == 'downloading':
-                                        downloaded = d.get('downloaded_bytes') or 0
-                                        t = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
-                                        if t:
-                                            file_percent = downloaded * 100.0 / float(t)
-                                        else:
-                                            fi = d.get('fragment_index') or 0
-                                            fc = d.get('fragment_count') or 0
-                                            if fc:
-                                                file_percent = fi * 100.0 / float(fc)
-                                    elif status == 'finished':
-                                        file_percent = 100.0
-                                    if file_percent is not None:
-                                        overall = (idx_pos-1) * 100.0 / total + (file_percent / total)
-                                        self.root.after(0, self.update_channel_progress, overall)
-                                        self.root.after(0, self.update_row_progress, idx, file_percent)
-                                except Exception:
-                                    pass
-                            
-                            result = self.downloader.download_video(url, custom_filename=None, progress_hook=hook)
-                            if result:
-                                success = True
-                                successful_downloads += 1
-                                self.root.after(0, self.update_row_progress, idx, 100.0)
-                                break
-                            else:
-                                if retry < 2:  # Chưa hết lần thử
-                                    self.root.after(0, self.update_row_progress, idx, 0.0)
-                                    time.sleep(2)  # Delay 2 giây trước khi thử lại
-                                    
-                        except Exception as e:
-                            if retry < 2:
-                                time.sleep(2)
-                            else:
-                                self.root.after(0, self.update_row_progress, idx, 0.0)
-                    
-                    if not success:
-                        self.root.after(0, self.update_row_progress, idx, 0.0)
-                    
-                    # Delay giữa các video để tránh rate limiting
-                    if idx_pos < total:
-                        time.sleep(1)
-                
+                if self.channel_cancel_event.is_set():
+                    self.root.after(0, self.update_status, f"Đã dừng tải: {successful_downloads}/{total} video thành công")
+                    return
                 self.root.after(0, self.update_channel_progress, 100.0)
                 self.root.after(0, self.update_status, f"Hoàn tất: {successful_downloads}/{total} video thành công")
                 
@@ -1051,6 +1051,84 @@ class TikTokReupApp:
                 self.root.after(0, self.update_status, "Sẵn sàng")
         threading.Thread(target=batch_thread, daemon=True).start()
 
+    def _init_video_rows(self, videos):
+        """Thêm 'selected'/'progress' cho từng video của danh sách kênh
+
+        Video đã có trong download archive (tra cục bộ, không gọi mạng) được
+        đánh dấu 100% và bỏ chọn.
+        """
+        archived_paths = self.downloader.archived_paths(videos)
+        rows = []
+        for v in videos:
+            archived = v.get('url') in archived_paths
+            rows.append({**v, 'selected': not archived, 'progress': 100.0 if archived else 0.0,
+                         'archived': archived})
+        return rows
+
+    def cancel_downloads(self, cancel_event: threading.Event, stop_btn):
+        """Dừng lượt tải danh sách đang chạy (video đang tải dở vẫn chạy nốt)"""
+        cancel_event.set()
+        stop_btn.config(state="disabled")
+        self.update_status("Đang dừng tải: chờ các video đang tải xong...")
+
+    def _run_download_batch(self, videos, indices, row_progress, overall_progress,
+                            cancel_event: threading.Event, stop_btn) -> int:
+        """Tải các dòng `indices` song song qua DownloadScheduler, trả về số video tải thành công
+
+        Dòng đang được chọn (cột 'Tải?') được ưu tiên tải trước. Video đã có
+        trong download archive được tính thành công ngay, không đưa vào hàng đợi.
+        `cancel_event` (nút "Dừng tải") dừng việc lấy video mới từ hàng đợi.
+        """
+        cancel_event.clear()
+        self.root.after(0, lambda: stop_btn.config(state="normal"))
+        try:
+            return self._schedule_downloads(videos, indices, row_progress, overall_progress, cancel_event)
+        finally:
+            self.root.after(0, lambda: stop_btn.config(state="disabled"))
+
+    def _schedule_downloads(self, videos, indices, row_progress, overall_progress,
+                            cancel_event: threading.Event) -> int:
+        """Phần tải thực sự của _run_download_batch"""
+        total = len(indices)
+        row_percents = {idx: 0.0 for idx in indices}
+        successful_downloads = 0
+        pending = []
+        archived_paths = self.downloader.archived_paths([videos[idx] for idx in indices])
+        for idx in indices:
+            if videos[idx].get('url') in archived_paths:
+                successful_downloads += 1
+                row_percents[idx] = 100.0
+                self.root.after(0, row_progress, idx, 100.0)
+            else:
+                pending.append(idx)
+        if successful_downloads:
+            Logger.log_info(f"Bỏ qua {successful_downloads} video đã tải trước đó")
+            self.root.after(0, overall_progress, sum(row_percents.values()) / total)
+
+        def on_progress(idx, percent):
+            row_percents[idx] = percent
+            self.root.after(0, row_progress, idx, percent)
+            self.root.after(0, overall_progress, sum(row_percents.values()) / total)
+
+        jobs = [(idx, videos[idx].get('url'),
+                 PRIORITY_SELECTED if videos[idx].get('selected') else PRIORITY_NORMAL)
+                for idx in pending]
+        # Đọc cấu hình một lần trước khi chạy; các job không reload trên object dùng chung
+        self.downloader.reload_settings()
+        download = functools.partial(self.downloader.download_video, reload=False)
+        scheduler = DownloadScheduler.from_config(self.config, download, cancel_event)
+        for result in scheduler.run(jobs, on_progress=on_progress):
+            idx = result['key']
+            if result['output']:
+                successful_downloads += 1
+                on_progress(idx, 100.0)
+            else:
+                Logger.log_error(f"Không tải được {result['url']}: {result['error']}")
+                # Dòng lỗi vẫn tính là đã xong trong tiến trình tổng
+                row_percents[idx] = 100.0
+                self.root.after(0, row_progress, idx, 0.0)
+        return successful_downloads
+
     def retry_failed_videos(self):
         """Tải lại những video bị lỗi (tiến trình < 100%)"""
         if not self.channel_videos:
@@ -1136,55 +1214,86 @@ class TikTokReupApp:
                 self.process_btn.config(state="disabled")
                 self.process_log.delete(1.0, tk.END)
                 
-                current_file = file_path
                 operations = []
                 
                 # Cắt video
                 cut_option = self.cut_var.get()
+                split_parts = False
                 if cut_option != "none":
                     duration_map = {"1min": 60, "3min": 180, "5min": 300, "10min": 600, "30min": 1800}
                     duration = duration_map.get(cut_option, 60)
-                    self.root.after(0, self.log_message, f"Cắt video {cut_option}...")
-                    current_file = self.processor.cut_video(current_file, duration)
-                    if not current_file:
-                        raise Exception("Lỗi cắt video")
+                    if self.split_var.get():
+                        split_parts = True
+                    else:
+                        self.root.after(0, self.log_message, f"Cắt video {cut_option}...")
+                        operations.append({'type': 'cut', 'params': {'duration': duration}})
                 
                 # Thêm watermark
                 if self.watermark_var.get():
                     self.root.after(0, self.log_message, "Thêm watermark...")
-                    current_file = self.processor.add_watermark(current_file, self.watermark_text_var.get())
-                    if not current_file:
-                        raise Exception("Lỗi thêm watermark")
+                    operations.append({'type': 'watermark', 'params': {'text': self.watermark_text_var.get()}})
+                
+                # Nhạc nền ngẫu nhiên từ thư viện nhạc
+                if self.music_var.get():
+                    self.root.after(0, self.log_message, "Thêm nhạc nền...")
+                    operations.append({'type': 'music', 'params': {'music_path': 'random'}})
                 
                 # Thay đổi tốc độ
                 speed = self.speed_var.get()
                 if speed != 1.0:
                     self.root.after(0, self.log_message, f"Thay đổi tốc độ {speed}x...")
-                    current_file = self.processor.change_speed(current_file, speed)
-                    if not current_file:
-                        raise Exception("Lỗi thay đổi tốc độ")
+                    operations.append({'type': 'speed', 'params': {'speed': speed}})
                 
                 # Lật video
                 flip_option = self.flip_var.get()
                 if flip_option != "none":
                     self.root.after(0, self.log_message, f"Lật video {flip_option}...")
-                    current_file = self.processor.flip_video(current_file, flip_option)
-                    if not current_file:
-                        raise Exception("Lỗi lật video")
+                    operations.append({'type': 'flip', 'params': {'direction': flip_option}})
                 
                 # Chuyển 9:16
                 if self.convert_916_var.get():
                     self.root.after(0, self.log_message, "Chuyển đổi tỷ lệ 9:16...")
-                    current_file = self.processor.convert_to_9_16(current_file)
-                    if not current_file:
-                        raise Exception("Lỗi chuyển đổi 9:16")
+                    mode = 'blur' if self.blur_background_var.get() else 'pad'
+                    operations.append({'type': '9_16', 'params': {'mode': mode}})
                 
                 # Thay đổi MD5
                 if self.change_md5_var.get():
                     self.root.after(0, self.log_message, "Thay đổi MD5...")
-                    current_file = self.processor.change_md5(current_file)
-                    if not current_file:
-                        raise Exception("Lỗi thay đổi MD5")
+                    operations.append({'type': 'md5'})
+                
+                # Chạy toàn bộ chuỗi thao tác trong một lần FFmpeg
+                self.process_cancel_event.clear()
+                self.root.after(0, lambda: self.cancel_process_btn.config(state="normal"))
+                
+                def on_progress(progress):
+                    self.root.after(0, self.update_process_progress, progress)
+                
+                if split_parts:
+                    # Chia cả video thành các phần trong một lần, rồi xử lý từng phần
+                    self.root.after(0, self.log_message, f"Chia video thành các phần {cut_option}...")
+                    parts = self.processor.split_video(file_path, duration)
+                    if not parts:
+                        raise Exception("Lỗi chia video")
+                    output_files = []
+                    for part in parts:
+                        if self.process_cancel_event.is_set():
+                            raise Exception("Đã hủy xử lý")
+                        output_file = self.processor.process_pipeline(part, operations,
+                                                                      progress_callback=on_progress,
+                                                                      cancel_event=self.process_cancel_event)
+                        if not output_file:
+                            raise Exception(f"Lỗi xử lý phần: {part}")
+                        output_files.append(output_file)
+                    self.root.after(0, self.process_split_success, output_files)
+                    return
+                
+                current_file = self.processor.process_pipeline(file_path, operations,
+                                                               progress_callback=on_progress,
+                                                               cancel_event=self.process_cancel_event)
+                if not current_file:
+                    if self.process_cancel_event.is_set():
+                        raise Exception("Đã hủy xử lý")
+                    raise Exception("Lỗi xử lý video")
                 
                 self.root.after(0, self.process_success, current_file)
                 
@@ -1195,6 +1304,24 @@ class TikTokReupApp:
         
         threading.Thread(target=process_thread, daemon=True).start()
     
+    def cancel_process(self):
+        """Hủy lần xử lý đang chạy"""
+        self.process_cancel_event.set()
+        self.cancel_process_btn.config(state="disabled")
+        self.update_status("Đang hủy xử lý...")
+    
+    def update_process_progress(self, progress):
+        """Hiển thị tiến trình FFmpeg trên status bar"""
+        percent = progress.get('percent')
+        text = f"Đang xử lý video... {percent:.0f}%" if percent is not None else "Đang xử lý video..."
+        if progress.get('fps'):
+            text += f" | {progress['fps']:.0f} fps"
+        if progress.get('speed'):
+            text += f" | {progress['speed']:.2f}x"
+        if progress.get('eta') is not None:
+            text += f" | còn {progress['eta']:.0f}s"
+        self.update_status(text)
+    
     def log_message(self, message):
         """Thêm message vào log"""
         self.process_log.insert(tk.END, f"{message}\n")
@@ -1207,6 +1334,13 @@ class TikTokReupApp:
         self.log_message(f"Xử lý thành công: {file_path}")
         messagebox.showinfo("Thành công", f"Xử lý video thành công:\n{file_path}")
     
+    def process_split_success(self, file_paths):
+        """Chia và xử lý các phần thành công"""
+        self.processed_files.extend(file_paths)
+        for file_path in file_paths:
+            self.log_message(f"Xử lý thành công: {file_path}")
+        messagebox.showinfo("Thành công", f"Đã tạo {len(file_paths)} phần video trong thư mục xử lý")
+    
     def process_error(self, error_msg):
         """Xử lý lỗi"""
         self.log_message(f"Lỗi: {error_msg}")
@@ -1215,6 +1349,7 @@ class TikTokReupApp:
     def process_finish(self):
         """Kết thúc xử lý"""
         self.process_btn.config(state="normal")
+        self.cancel_process_btn.config(state="disabled")
         self.update_status("Sẵn sàng")
     
     def upload_video(self):
@@ -1338,7 +1473,9 @@ class TikTokReupApp:
         try:
             self.config.set('download.resolution', self.resolution_var.get())
             self.config.set('download.output_path', self.download_folder_var.get())
+            self.config.set('download.max_workers', self.download_workers_var.get())
             self.config.set('processing.output_path', self.process_folder_var.get())
+            self.config.set('processing.encoding_profile', self.encoding_profile_var.get())
             self.config.set('ffmpeg.path', self.ffmpeg_path_var.get())
             self.config.set('download.youtube_api_key', self.youtube_api_key_var.get())
             
@@ -1355,7 +1492,9 @@ class TikTokReupApp:
         """Reset cài đặt"""
         self.resolution_var.set('1080p')
         self.download_folder_var.set('data/videos')
+        self.download_workers_var.set(3)
         self.process_folder_var.set('data/processed')
+        self.encoding_profile_var.set(DEFAULT_PROFILE)
         self.ffmpeg_path_var.set('tools/ffmpeg.exe')
         self.youtube_api_key_var.set('')
         messagebox.showinfo("Thông báo", "Đã reset cài đặt về mặc định")
@@ -1512,11 +1651,16 @@ class TikTokReupApp:
                 self.update_status("Đang lấy danh sách video...")
                 max_videos = int(self.youtube_count_var.get())
                 
+                # Chỉ lấy video mới: dừng ở video mới nhất của lần lấy trước
+                cursor = self.downloader.channel_cursor(url) if self.youtube_only_new_var.get() else None
+                
                 # Thử YouTube API trước
-                videos = self.youtube_api.get_channel_videos(url, max_results=max_videos)
+                videos = self.youtube_api.get_channel_videos(url, max_results=max_videos, since=cursor)
+                # Con trỏ chỉ lấy từ kết quả API: published_at của yt-dlp là upload_date YYYYMMDD
+                api_videos = videos
                 
                 # Nếu YouTube API trả về ít video hơn mong muốn, thử yt-dlp
-                if len(videos) < max_videos * 0.8:  # Nếu ít hơn 80% số video mong muốn
+                if not cursor and len(videos) < max_videos * 0.8:  # Nếu ít hơn 80% số video mong muốn
                     Logger.log_info("YouTube API trả về ít video, thử yt-dlp...")
                     try:
                         yt_dlp_videos = self.downloader.list_channel_videos(url)
@@ -1540,12 +1684,15 @@ class TikTokReupApp:
                     except Exception as e:
                         Logger.log_warning(f"yt-dlp fallback thất bại: {e}")
                 
+                self.downloader.update_channel_cursor(url, api_videos)
+                
                 # Khởi tạo thêm thuộc tính 'selected' và 'progress' cho mỗi video
-                self.youtube_videos = [{**v, 'selected': True, 'progress': 0.0} for v in videos]
+                self.youtube_videos = self._init_video_rows(videos)
+                archived = sum(1 for v in self.youtube_videos if v.get('archived'))
                 
                 def update_ui():
                     self.refresh_youtube_list_display()
-                    self.update_status(f"Đã lấy {len(videos)} video")
+                    self.update_status(f"Đã lấy {len(videos)} video ({archived} video đã tải trước đó)")
                     self.update_youtube_progress(0)
                 self.root.after(0, update_ui)
                 
@@ -1572,71 +1719,15 @@ class TikTokReupApp:
         
         def batch_thread():
             try:
-                import time
                 total = len(indices)
-                successful_downloads = 0
                 self.update_status(f"Đang tải danh sách YouTube ({total} video)...")
+                successful_downloads = self._run_download_batch(
+                    self.youtube_videos, indices, self.update_youtube_row_progress, self.update_youtube_progress,
+                    self.youtube_cancel_event, self.youtube_stop_btn)
                 
-                for idx_pos, idx in enumerate(indices, start=1):
-                    video = self.youtube_videos[idx]
-                    url = video.get('url')
-                    title = video.get('title') or video.get('id')
-                    
-                    # Cập nhật tiến trình tổng
-                    self.root.after(0, self.update_youtube_progress, (idx_pos-1) * 100.0 / total)
-                    self.root.after(0, self.update_youtube_row_progress, idx, 0.0)
-                    
-                    # Thử tải với retry
-                    success = False
-                    for retry in range(3):
-                        try:
-                            def hook(d):
-                                try:
-                                    status = d.get('status')
-                                    file_percent = None
-                                    if status == 'downloading':
-                                        downloaded = d.get('downloaded_bytes') or 0
-                                        t = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
-                                        if t:
-                                            file_percent = downloaded * 100.0 / float(t)
-                                        else:
-                                            fi = d.get('fragment_index') or 0
-                                            fc = d.get('fragment_count') or 0
-                                            if fc:
-                                                file_percent = fi * 100.0 / float(fc)
-                                    elif status == 'finished':
-                                        file_percent = 100.0
-                                    if file_percent is not None:
-                                        overall = (idx_pos-1) * 100.0 / total + (file_percent / total)
-                                        self.root.after(0, self.update_youtube_progress, overall)
-                                        self.root.after(0, self.update_youtube_row_progress, idx, file_percent)
-                                except Exception:
-                                    pass
-                            
-                            result = self.downloader.download_video(url, custom_filename=None, progress_hook=hook)
-                            if result:
-                                success = True
-                                successful_downloads += 1
-                                self.root.after(0, self.update_youtube_row_progress, idx, 100.0)
-                                break
-                            else:
-                                if retry < 2:
-                                    self.root.after(0, self.update_youtube_row_progress, idx, 0.0)
-                                    time.sleep(2)
-                                    
-                        except Exception as e:
-                            if retry < 2:
-                                time.sleep(2)
-                            else:
-                                self.root.after(0, self.update_youtube_row_progress, idx, 0.0)
-                    
-                    if not success:
-                        self.root.after(0, self.update_youtube_row_progress, idx, 0.0)
-                    
-                    # Delay giữa các video
-                    if idx_pos < total:
-                        time.sleep(1)
-                
+                if self.youtube_cancel_event.is_set():
+                    self.root.after(0, self.update_status, f"Đã dừng tải: {successful_downloads}/{total} video thành công")
+                    return
                 self.root.after(0, self.update_youtube_progress, 100.0)
                 self.root.after(0, self.update_status, f"Hoàn tất: {successful_downloads}/{total} video thành công")
                 
@@ -0,0 +1,75 @@
+"""
+Xử lý hàng loạt song song bằng process pool
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from .utils import ConfigManager, Logger
+
+# Số thread tối thiểu cho mỗi job FFmpeg (libx264 tận dụng tốt 4 thread trở lên)
+MIN_THREADS_PER_JOB = 4
+
+def plan_thread_budget(file_count: int, cpu_count: Optional[int] = None,
+                       max_workers: Optional[int] = None) -> Tuple[int, int]:
+    """Chia số core cho các job FFmpeg chạy đồng thời
+
+    Trả về (số worker, số thread mỗi job) sao cho worker * thread không vượt
+    quá số core, tránh oversubscription.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    if not max_workers:
+        max_workers = max(1, cpu_count // MIN_THREADS_PER_JOB)
+    workers = max(1, min(file_count, max_workers, cpu_count))
+    threads = max(1, cpu_count // workers)
+    return workers, threads
+
+# Processor dùng lại trong mỗi worker process (tránh khởi tạo lại cache cho từng file)
+_worker_processor = None
+
+def _process_file(config: ConfigManager, input_file: str,
+                  operations: List[Dict[str, Any]], threads: int) -> Dict[str, Any]:
+    """Hàm chạy trong worker process"""
+    global _worker_processor
+    try:
+        if _worker_processor is None:
+            from .processor import VideoProcessor
+            _worker_processor = VideoProcessor(config)
+        output_file = _worker_processor.process_pipeline(input_file, operations, threads=threads)
+        if output_file:
+            return {'input': input_file, 'output': output_file, 'error': None}
+        return {'input': input_file, 'output': None, 'error': 'Lỗi xử lý file'}
+    except Exception as e:
+        return {'input': input_file, 'output': None, 'error': str(e)}
+
+class BatchExecutor:
+    """Chạy pipeline cho nhiều file cùng lúc trên các worker process"""
+
+    def __init__(self, config_manager: ConfigManager):
+        self.config = config_manager
+
+    def run(self, input_files: List[str], operations: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Xử lý các file song song, trả kết quả từng file ngay khi xong
+
+        Mỗi kết quả là dict: { 'input', 'output', 'error' }.
+        """
+        if not input_files:
+            return
+
+        workers, threads = plan_thread_budget(
+            len(input_files),
+            self.config.get('processing.cpu_count'),
+            self.config.get('processing.max_workers')
+        )
+        Logger.log_info(f"Xử lý song song {len(input_files)} file: {workers} worker x {threads} thread")
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(_process_file, self.config, input_file, operations, threads): input_file
+                for input_file in input_files
+            }
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except Exception as e:
+                    # Worker process chết bất thường
+                    yield {'input': futures[future], 'output': None, 'error': str(e)}
@@ -0,0 +1,102 @@
+"""
+Benchmark profile mã hóa trên máy hiện tại (nguồn tổng hợp lavfi, đo fps, dung lượng, SSIM/PSNR)
+
+Chạy: python -m src.benchmark [đường dẫn ffmpeg]
+"""
+import os
+import re
+import sys
+import time
+import shutil
+import tempfile
+import logging
+from typing import Any, Dict, List
+from .utils import FFmpegManager
+from .ffmpeg_command import FFmpegCommand
+from .encoding_profiles import ENCODING_PROFILES, profile_options
+
+class EncoderBenchmark:
+    """Mã hóa cùng một nguồn `testsrc2` với từng profile rồi so với nguồn gốc
+
+    Nguồn lavfi tạo lại được y hệt ở mỗi lần chạy nên không cần file mẫu,
+    kết quả so sánh được giữa các máy.
+    """
+
+    def __init__(self, ffmpeg: FFmpegManager, size: str = '1280x720',
+                 rate: int = 30, duration: int = 10):
+        self.ffmpeg = ffmpeg
+        self.size = size
+        self.rate = rate
+        self.duration = duration
+
+    @property
+    def source(self) -> str:
+        return f"testsrc2=size={self.size}:rate={self.rate}:duration={self.duration}"
+
+    def run(self, profiles: List[str] = None) -> List[Dict[str, Any]]:
+        """Chạy benchmark, trả về mỗi profile một dòng kết quả"""
+        results = []
+        temp_dir = tempfile.mkdtemp(prefix='.benchmark_')
+        try:
+            for name in profiles or list(ENCODING_PROFILES):
+                output_path = os.path.join(temp_dir, f'{name}.mp4')
+                result = self._measure(name, output_path)
+                if result:
+                    results.append(result)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        return results
+
+    def _measure(self, name: str, output_path: str) -> Dict[str, Any]:
+        """Mã hóa với một profile, đo tốc độ rồi tính SSIM/PSNR"""
+        command = FFmpegCommand()
+        command.add_input(self.source, '-f', 'lavfi')
+        command.add_output(output_path, ['0:v'], {'v': 'libx264'},
+                           ['-pix_fmt', 'yuv420p', *profile_options(name)])
+
+        started = time.monotonic()
+        if not self.ffmpeg.run_command(command, duration=self.duration):
+            logging.error(f"Benchmark lỗi khi mã hóa profile {name}")
+            return {}
+        elapsed = time.monotonic() - started
+        size = os.path.getsize(output_path)
+
+        return {
+            'profile': name,
+            'seconds': round(elapsed, 2),
+            'fps': round(self.duration * self.rate / elapsed, 1) if elapsed else 0.0,
+            'size': size,
+            'bitrate_kbps': round(size * 8 / self.duration / 1000, 1),
+            **self._quality(output_path)
+        }
+
+    def _quality(self, output_path: str) -> Dict[str, float]:
+        """SSIM và PSNR của file đã mã hóa so với nguồn lavfi"""
+        command = FFmpegCommand()
+        command.add_input(output_path)
+        command.add_input(self.source, '-f', 'lavfi')
+        command.add_filter("[0:v]split[d0][d1];[1:v]format=yuv420p,split[r0][r1];"
+                           "[d0][r0]ssim;[d1][r1]psnr")
+        command.add_output('-', options=['-f', 'null'])
+        stderr = self.ffmpeg.run_capture(command, timeout=max(60, self.duration * 20)) or ''
+
+        quality = {'ssim': None, 'psnr': None}
+        ssim = re.search(r'SSIM .*All:([\d.]+)', stderr)
+        psnr = re.search(r'PSNR .*average:([\d.]+|inf)', stderr)
+        if ssim:
+            quality['ssim'] = float(ssim.group(1))
+        if psnr:
+            quality['psnr'] = float(psnr.group(1))
+        return quality
+
+def main():
+    """In bảng kết quả benchmark"""
+    ffmpeg_path = sys.argv[1] if len(sys.argv) > 1 else 'ffmpeg'
+    results = EncoderBenchmark(FFmpegManager(ffmpeg_path)).run()
+    print(f"{'Profile':<12}{'fps':>8}{'Giây':>8}{'kbps':>10}{'SSIM':>8}{'PSNR':>8}")
+    for row in results:
+        print(f"{row['profile']:<12}{row['fps']:>8}{row['seconds']:>8}{row['bitrate_kbps']:>10}"
+              f"{row['ssim'] or '-':>8}{row['psnr'] or '-':>8}")
+
+if __name__ == '__main__':
+    main()
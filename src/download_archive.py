@@ -0,0 +1,142 @@
+"""
+Lưu vết video đã tải và con trỏ đồng bộ kênh (SQLite) để lần chạy sau bỏ qua mà không cần gọi mạng
+"""
+import os
+import time
+import sqlite3
+import threading
+import logging
+from typing import Any, Dict, Optional, Set
+
+class DownloadArchive:
+    """Bản ghi video đã tải theo (extractor, id video): đường dẫn, kích thước, hash nội dung
+
+    Bản ghi chỉ còn hợp lệ khi file vẫn tồn tại với đúng kích thước đã ghi;
+    file bị xóa hoặc thay đổi thì bản ghi bị bỏ và video được tải lại.
+    """
+
+    def __init__(self, db_path: str = "data/cache/download_archive.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._init_schema()
+
+    def _init_schema(self):
+        """Tạo bảng nếu chưa có"""
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS downloads (
+                    extractor TEXT NOT NULL,
+                    video_id TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    digest TEXT,
+                    url TEXT,
+                    downloaded_at REAL NOT NULL,
+                    PRIMARY KEY (extractor, video_id)
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS channel_cursors (
+                    channel TEXT PRIMARY KEY,
+                    video_id TEXT NOT NULL,
+                    published_at TEXT,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    def get(self, extractor: str, video_id: str) -> Optional[str]:
+        """Đường dẫn file đã tải của video, None nếu chưa tải hoặc file không còn nguyên vẹn"""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT path, size FROM downloads WHERE extractor = ? AND video_id = ?",
+                    (extractor.lower(), str(video_id))
+                ).fetchone()
+            if row is None:
+                return None
+            path, size = row
+            if os.path.isfile(path) and os.path.getsize(path) == size:
+                return path
+            self.remove(extractor, video_id)
+            return None
+        except Exception as e:
+            logging.error(f"Lỗi đọc download archive: {e}")
+            return None
+
+    def put(self, extractor: str, video_id: str, path: str,
+            digest: Optional[str] = None, url: Optional[str] = None):
+        """Ghi nhận video đã tải (ghi đè bản ghi cũ)"""
+        try:
+            size = os.path.getsize(path)
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO downloads (extractor, video_id, path, size, digest, url, downloaded_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (extractor.lower(), str(video_id), os.path.abspath(path), size, digest, url, time.time())
+                )
+        except Exception as e:
+            logging.error(f"Lỗi ghi download archive: {e}")
+
+    def remove(self, extractor: str, video_id: str):
+        """Xóa bản ghi của một video"""
+        try:
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM downloads WHERE extractor = ? AND video_id = ?",
+                                   (extractor.lower(), str(video_id)))
+        except Exception as e:
+            logging.error(f"Lỗi xóa download archive: {e}")
+
+    def known_ids(self, extractor: str) -> Set[str]:
+        """Tập id video đã ghi nhận của một extractor (không kiểm tra file)"""
+        try:
+            with self._lock:
+                rows = self._conn.execute("SELECT video_id FROM downloads WHERE extractor = ?",
+                                          (extractor.lower(),)).fetchall()
+            return {row[0] for row in rows}
+        except Exception as e:
+            logging.error(f"Lỗi đọc download archive: {e}")
+            return set()
+
+    def get_cursor(self, channel: str) -> Optional[Dict[str, Any]]:
+        """Con trỏ đồng bộ của kênh: video mới nhất đã thấy { 'video_id', 'published_at' }"""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT video_id, published_at FROM channel_cursors WHERE channel = ?", (channel,)
+                ).fetchone()
+            return {'video_id': row[0], 'published_at': row[1]} if row else None
+        except Exception as e:
+            logging.error(f"Lỗi đọc con trỏ kênh: {e}")
+            return None
+
+    def put_cursor(self, channel: str, video_id: str, published_at: Optional[str] = None):
+        """Lưu video mới nhất đã thấy của kênh"""
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO channel_cursors (channel, video_id, published_at, updated_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (channel, str(video_id), published_at, time.time())
+                )
+        except Exception as e:
+            logging.error(f"Lỗi ghi con trỏ kênh: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """Số video và tổng dung lượng đã ghi nhận"""
+        try:
+            with self._lock:
+                count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM downloads").fetchone()
+            return {'count': count, 'bytes': total}
+        except Exception as e:
+            logging.error(f"Lỗi đọc download archive: {e}")
+            return {'count': 0, 'bytes': 0}
+
+    def close(self):
+        """Đóng kết nối"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,222 @@
+"""
+Lập lịch tải nhiều video song song: hàng đợi ưu tiên, giới hạn theo host, token bucket
+"""
+import time
+import heapq
+import itertools
+import threading
+from queue import Empty, Queue
+from urllib.parse import urlparse
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+from .utils import ConfigManager, Logger
+
+# Độ ưu tiên: số nhỏ chạy trước
+PRIORITY_SELECTED = 0
+PRIORITY_NORMAL = 1
+
+def host_of(url: str) -> str:
+    """Host của URL, bỏ tiền tố www./m. để các biến thể cùng một nền tảng chung giới hạn"""
+    host = (urlparse(url).hostname or '').lower()
+    for prefix in ('www.', 'm.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    return host
+
+def hook_percent(status: Dict[str, Any]) -> Optional[float]:
+    """Phần trăm tải từ dict progress hook của yt-dlp (fallback theo fragment với HLS/DASH)"""
+    if status.get('status') == 'finished':
+        return 100.0
+    if status.get('status') != 'downloading':
+        return None
+    total = status.get('total_bytes') or status.get('total_bytes_estimate') or 0
+    if total:
+        return (status.get('downloaded_bytes') or 0) * 100.0 / float(total)
+    fragment_count = status.get('fragment_count') or 0
+    if fragment_count:
+        return (status.get('fragment_index') or 0) * 100.0 / float(fragment_count)
+    return None
+
+class TokenBucket:
+    """Giới hạn tần suất bắt đầu request: `rate` token/giây, tích tối đa `capacity` token"""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Lấy một token; trả về 0 nếu lấy được, ngược lại số giây cần chờ"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+class DownloadScheduler:
+    """Chạy các job tải trên một pool thread có giới hạn
+
+    - Hàng đợi ưu tiên: job có `priority` nhỏ hơn chạy trước, cùng ưu tiên thì theo thứ tự thêm
+    - Mỗi host chạy tối đa `per_host` job cùng lúc và bắt đầu job mới theo token bucket riêng
+    - Job lỗi được đưa lại hàng đợi sau `retry_delay` * 2^lần thử, worker không ngủ chờ
+    """
+
+    def __init__(self, download: Callable[..., Optional[str]], max_workers: int = 3,
+                 per_host: int = 2, rate: float = 0.5, burst: float = 2,
+                 max_attempts: int = 3, retry_delay: float = 2.0,
+                 cancel_event: Optional[threading.Event] = None):
+        self.download = download
+        self.max_workers = max(1, int(max_workers))
+        self.per_host = max(1, int(per_host))
+        self.rate = rate
+        self.burst = burst
+        self.max_attempts = max(1, int(max_attempts))
+        self.retry_delay = retry_delay
+
+        self._queue = []
+        self._counter = itertools.count()
+        self._active: Dict[str, int] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._pending = 0
+        self._condition = threading.Condition()
+        # Có thể dùng chung Event với UI (nút dừng) thay vì gọi cancel()
+        self._cancelled = cancel_event if cancel_event is not None else threading.Event()
+
+    @classmethod
+    def from_config(cls, config: ConfigManager, download: Callable[..., Optional[str]],
+                    cancel_event: Optional[threading.Event] = None) -> 'DownloadScheduler':
+        """Tạo scheduler theo các khóa download.* trong cấu hình"""
+        return cls(
+            download,
+            max_workers=config.get('download.max_workers', 3),
+            per_host=config.get('download.per_host_limit', 2),
+            rate=config.get('download.requests_per_second', 0.5),
+            burst=config.get('download.burst', 2),
+            max_attempts=config.get('download.max_attempts', 3),
+            retry_delay=config.get('download.retry_delay', 2.0),
+            cancel_event=cancel_event
+        )
+
+    def cancel(self):
+        """Dừng nhận job mới; job đang tải chạy nốt"""
+        self._cancelled.set()
+        with self._condition:
+            self._condition.notify_all()
+
+    def _push(self, job: Dict[str, Any], not_before: float = 0.0):
+        heapq.heappush(self._queue, (job['priority'], next(self._counter), not_before, job))
+
+    def _take(self) -> Tuple[Optional[Dict[str, Any]], float]:
+        """Lấy job ưu tiên cao nhất đang chạy được (gọi khi giữ lock)
+
+        Trả về (job, 0) hoặc (None, số giây nên chờ trước khi thử lại).
+        """
+        now = time.monotonic()
+        wait = 1.0
+        skipped = []
+        job = None
+        while self._queue:
+            entry = heapq.heappop(self._queue)
+            _, _, not_before, candidate = entry
+            host = candidate['host']
+            if not_before > now:
+                wait = min(wait, not_before - now)
+            elif self._active.get(host, 0) >= self.per_host:
+                pass
+            else:
+                bucket = self._buckets.setdefault(host, TokenBucket(self.rate, self.burst))
+                delay = bucket.try_acquire()
+                if delay == 0:
+                    job = candidate
+                    self._active[host] = self._active.get(host, 0) + 1
+                    break
+                wait = min(wait, delay)
+            skipped.append(entry)
+        for entry in skipped:
+            heapq.heappush(self._queue, entry)
+        return job, wait
+
+    def _worker(self, results: Queue, on_progress: Optional[Callable[[Any, float], None]]):
+        while True:
+            with self._condition:
+                job, wait = None, 0.0
+                while not self._cancelled.is_set() and self._pending:
+                    job, wait = self._take()
+                    if job:
+                        break
+                    self._condition.wait(wait)
+                if not job:
+                    return
+
+            output, error = self._run_job(job, on_progress)
+
+            with self._condition:
+                self._active[job['host']] -= 1
+                job['attempt'] += 1
+                if output is None and job['attempt'] < self.max_attempts and not self._cancelled.is_set():
+                    Logger.log_warning(f"Tải lại lần {job['attempt'] + 1}: {job['url']}")
+                    self._push(job, time.monotonic() + self.retry_delay * 2 ** (job['attempt'] - 1))
+                else:
+                    self._pending -= 1
+                    results.put({'key': job['key'], 'url': job['url'], 'output': output, 'error': error})
+                self._condition.notify_all()
+
+    def _run_job(self, job: Dict[str, Any],
+                 on_progress: Optional[Callable[[Any, float], None]]) -> Tuple[Optional[str], Optional[str]]:
+        """Chạy một lần tải, trả về (file, lỗi)"""
+        def hook(status):
+            try:
+                percent = hook_percent(status)
+                if percent is not None and on_progress:
+                    on_progress(job['key'], percent)
+            except Exception:
+                pass
+
+        if on_progress:
+            on_progress(job['key'], 0.0)
+        try:
+            output = self.download(job['url'], progress_hook=hook)
+            return (output, None) if output else (None, 'Tải video thất bại')
+        except Exception as e:
+            return None, str(e)
+
+    def run(self, jobs: Iterable[Tuple[Any, str, int]],
+            on_progress: Optional[Callable[[Any, float], None]] = None) -> Iterator[Dict[str, Any]]:
+        """Tải các job (key, url, priority), trả kết quả từng job ngay khi xong
+
+        Mỗi kết quả là dict: { 'key', 'url', 'output', 'error' }.
+        `on_progress(key, percent)` được gọi từ thread worker.
+        """
+        with self._condition:
+            for key, url, priority in jobs:
+                self._push({'key': key, 'url': url, 'priority': priority,
+                            'host': host_of(url), 'attempt': 0})
+                self._pending += 1
+            total = self._pending
+        if not total:
+            return
+
+        workers = min(self.max_workers, total)
+        Logger.log_info(f"Tải song song {total} video: {workers} luồng, tối đa {self.per_host}/host")
+        results = Queue()
+        threads = [threading.Thread(target=self._worker, args=(results, on_progress), daemon=True)
+                   for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+
+        for _ in range(total):
+            result = None
+            while result is None:
+                try:
+                    result = results.get(timeout=0.2)
+                except Empty:
+                    if not any(thread.is_alive() for thread in threads) and results.empty():
+                        # Đã hủy: các job còn lại trong hàng đợi không chạy
+                        return
+            yield result
@@ -5,10 +5,58 @@ import os
 import subprocess
 import json
 import logging
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Set, Tuple
 from urllib.parse import urlparse
 import yt_dlp
+from yt_dlp.extractor import gen_extractor_classes, get_info_extractor
 from .utils import ConfigManager, FileManager, Logger
+from .download_scheduler import host_of
+from .hashing import FileHasher
+from .download_archive import DownloadArchive
+from .metadata_cache import MetadataCache, best_format, compact_info
+
+# Extractor của các nền tảng chính theo host: thử trước khi quét toàn bộ
+# (hơn nghìn) extractor của yt-dlp, vốn tốn vài ms CPU cho mỗi URL
+HOST_EXTRACTORS = {
+    'youtube.com': 'Youtube',
+    'youtu.be': 'Youtube',
+    'tiktok.com': 'TikTok',
+    'facebook.com': 'Facebook',
+    'instagram.com': 'Instagram',
+}
+
+def _extractor_key(extractor, url: str) -> Optional[Tuple[str, str]]:
+    video_id = extractor.get_temp_id(url)
+    return (extractor.ie_key().lower(), str(video_id)) if video_id else None
+
+@lru_cache(maxsize=4096)
+def archive_key(url: str) -> Optional[Tuple[str, str]]:
+    """(extractor, id video) suy ra từ URL bằng regex của extractor yt-dlp, không gọi mạng
+
+    Trùng với `extractor_key`/`id` yt-dlp trả về sau khi trích xuất nên dùng
+    được làm khóa download archive. None nếu URL không chứa id (link rút gọn, ...).
+    """
+    if not url:
+        return None
+    ie_key = HOST_EXTRACTORS.get(host_of(url))
+    if ie_key:
+        extractor = get_info_extractor(ie_key)
+        if extractor.suitable(url):
+            return _extractor_key(extractor, url)
+    for extractor in gen_extractor_classes():
+        if extractor.ie_key() == 'Generic':
+            continue
+        if extractor.suitable(url):
+            return _extractor_key(extractor, url)
+    return None
+
+def video_archive_key(video: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """Khóa archive của một dòng danh sách video: dùng `ie_key`/`id` của entry
+    nếu có (entry phẳng của yt-dlp), không thì suy ra từ URL"""
+    if video.get('ie_key') and video.get('id'):
+        return video['ie_key'].lower(), str(video['id'])
+    return archive_key(video.get('url') or '')
 
 class VideoDownloader:
     """Tải video từ các nền tảng"""
@@ -26,6 +74,19 @@ class VideoDownloader:
         # Tạo thư mục output
         FileManager.ensure_dir(self.output_path)
         
+        # Lưu vết video đã tải để lần sau bỏ qua không cần gọi mạng
+        self.archive = None
+        if self.config.get('download.use_archive', True):
+            self.archive = DownloadArchive(os.path.join(self.config.get('cache.path', 'data/cache'),
+                                                        'download_archive.db'))
+        self.hasher = FileHasher()
+        # Thông tin video/danh sách đã trích xuất, đọc lại trong thời hạn TTL
+        self.metadata_cache = MetadataCache(os.path.join(self.config.get('cache.path', 'data/cache'),
+                                                         'metadata_cache.db'),
+                                            self.config.get('cache.metadata_ttl', 6 * 3600))
+        self.listing_ttl = self.config.get('cache.listing_ttl', 600)
+        self.metadata_cache.purge_expired()
+        
         # Cấu hình yt-dlp
         self.ydl_opts = self._get_ydl_opts()
 
@@ -51,7 +112,8 @@ class VideoDownloader:
     def _get_ydl_opts(self) -> Dict[str, Any]:
         """Cấu hình yt-dlp"""
         return {
-            'outtmpl': os.path.join(self.output_path, '%(title)s.%(ext)s'),
+            # Kèm id để các video trùng tiêu đề (tải song song) không ghi đè cùng một file
+            'outtmpl': os.path.join(self.output_path, '%(title)s [%(id)s].%(ext)s'),
             # Ưu tiên video + audio, fallback mp4 tốt nhất
             'format': f"bv*+ba/best[ext=mp4]/{self._get_format_selector()}",
             'writesubtitles': False,
@@ -282,23 +344,61 @@ class VideoDownloader:
             Logger.log_error(f"Lỗi kiểm tra URL: {e}")
             return False
     
+    def _max_height(self) -> int:
+        """Chiều cao tối đa theo độ phân giải đã cấu hình"""
+        try:
+            return int(str(self.resolution).rstrip('p'))
+        except ValueError:
+            return 1080
+    
+    def _metadata_opts(self) -> Dict[str, Any]:
+        """Option yt-dlp để lấy thông tin: giữ proxy/cookies/header, bỏ format selector và hậu xử lý
+
+        Danh sách format không được phụ thuộc selector tải: selector không khớp
+        format nào cũng không được làm lỗi lần trích xuất.
+        """
+        opts = {key: value for key, value in self.ydl_opts.items()
+                if key not in ('format', 'merge_output_format', 'postprocessors')}
+        opts['quiet'] = True
+        opts['ignore_no_formats_error'] = True
+        return opts
+    
+    def get_metadata(self, url: str) -> Optional[Dict[str, Any]]:
+        """Bản ghi rút gọn của video: id, tiêu đề, thời lượng, thumbnail, danh sách format
+        và `best_format` theo độ phân giải đang cấu hình
+
+        Đọc từ metadata cache nếu còn hạn, không thì trích xuất (không tải) rồi lưu lại.
+        """
+        key = url.strip()
+        record = self.metadata_cache.get(key)
+        if record is None:
+            with yt_dlp.YoutubeDL(self._metadata_opts()) as ydl:
+                info = ydl.extract_info(url, download=False)
+            if not info:
+                return None
+            record = compact_info(info)
+            self.metadata_cache.put(key, record)
+        return {**record, 'best_format': best_format(record.get('formats') or [], self._max_height())}
+    
     def get_video_info(self, url: str) -> Optional[Dict[str, Any]]:
         """Lấy thông tin video"""
         try:
-            with yt_dlp.YoutubeDL(self.ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                
-                return {
-                    'title': info.get('title', 'Unknown'),
-                    'duration': info.get('duration', 0),
-                    'uploader': info.get('uploader', 'Unknown'),
-                    'view_count': info.get('view_count', 0),
-                    'like_count': info.get('like_count', 0),
-                    'description': info.get('description', ''),
-                    'thumbnail': info.get('thumbnail', ''),
-                    'url': url,
-                    'platform': self._detect_platform(url)
-                }
+            record = self.get_metadata(url)
+            if not record:
+                Logger.log_error("Không lấy được thông tin video")
+                return None
+            
+            return {
+                'title': record.get('title') or 'Unknown',
+                'duration': record.get('duration') or 0,
+                'uploader': record.get('uploader') or 'Unknown',
+                'view_count': record.get('view_count') or 0,
+                'like_count': record.get('like_count') or 0,
+                'description': record.get('description') or '',
+                'thumbnail': record.get('thumbnail') or '',
+                'url': url,
+                'platform': self._detect_platform(url)
+            }
                 
         except Exception as e:
             Logger.log_error(f"Lỗi lấy thông tin video: {e}")
@@ -325,15 +425,72 @@ class VideoDownloader:
         except:
             return 'unknown'
     
-    def download_video(self, url: str, custom_filename: str = None, progress_hook=None) -> Optional[str]:
-        """Tải video"""
+    def archived_path(self, url: str) -> Optional[str]:
+        """File đã tải trước đó của URL theo download archive (không gọi mạng)"""
+        if self.archive is None:
+            return None
+        key = archive_key(url)
+        return self.archive.get(*key) if key else None
+
+    def archived_paths(self, videos: List[Dict[str, Any]]) -> Dict[str, str]:
+        """File đã tải của nhiều dòng danh sách một lượt: { url: đường dẫn } cho các video đã có trong archive
+
+        Mỗi extractor chỉ đọc tập id một lần; chỉ các video trùng id mới được
+        kiểm tra file trên đĩa.
+        """
+        if self.archive is None:
+            return {}
+        known: Dict[str, Set[str]] = {}
+        paths = {}
+        for video in videos:
+            url = video.get('url')
+            key = video_archive_key(video) if url else None
+            if not key:
+                continue
+            extractor, video_id = key
+            if extractor not in known:
+                known[extractor] = self.archive.known_ids(extractor)
+            if video_id in known[extractor]:
+                path = self.archive.get(extractor, video_id)
+                if path:
+                    paths[url] = path
+        return paths
+
+    def _record_download(self, url: str, info: Dict[str, Any], file_path: str):
+        """Ghi video vừa tải vào download archive"""
+        if self.archive is None:
+            return
+        extractor = info.get('extractor_key')
+        video_id = info.get('id')
+        if not extractor or not video_id:
+            key = archive_key(url)
+            if not key:
+                return
+            extractor, video_id = key
+        digest = self.hasher.hash_file(file_path, 'fast') or None
+        self.archive.put(extractor, video_id, file_path, digest, url)
+
+    def download_video(self, url: str, custom_filename: str = None, progress_hook=None,
+                       reload: bool = True) -> Optional[str]:
+        """Tải video (video đã có trong download archive thì trả về file cũ)
+
+        `reload=False` khi gọi từ nhiều thread: người gọi đã reload_settings() một lần trước đó.
+        """
         try:
             # Đảm bảo cấu hình mới nhất trước khi tải
-            self.reload_settings()
+            if reload:
+                self.reload_settings()
             if not self.is_supported_url(url):
                 Logger.log_error(f"URL không được hỗ trợ: {url}")
                 return None
             
+            archived = self.archived_path(url)
+            if archived:
+                Logger.log_info(f"Video đã tải trước đó, bỏ qua: {archived}")
+                if progress_hook is not None:
+                    progress_hook({'status': 'finished', 'filename': archived})
+                return archived
+            
             # Cấu hình output template
             opts = self.ydl_opts.copy()
             if custom_filename:
@@ -350,7 +507,7 @@ class VideoDownloader:
             for attempt in range(max_attempts):
                 try:
                     with yt_dlp.YoutubeDL(opts) as ydl:
-                        # Kiểm tra trước xem có phải nội dung video không
+                        # Trích xuất một lần: kiểm tra nội dung rồi tải lại từ chính info này
                         pre_info = ydl.extract_info(url, download=False)
                         if pre_info is None:
                             Logger.log_error("Không lấy được thông tin video")
@@ -367,14 +524,18 @@ class VideoDownloader:
                             Logger.log_error("Nội dung không phải video (có thể là bài ảnh của TikTok)")
                             return None
                         
-                        # Tiến hành tải
-                        info = ydl.extract_info(url, download=True)
+                        # Thông tin vừa trích xuất dùng lại cho get_video_info/get_available_formats
+                        self.metadata_cache.put(url.strip(), compact_info(pre_info))
+                        
+                        # Tiến hành tải, dùng lại info đã trích xuất (không gọi extractor lần hai)
+                        info = ydl.process_ie_result(pre_info, download=True)
                         
                         if info:
                             # Tìm file đã tải
                             filename = ydl.prepare_filename(info)
                             if os.path.exists(filename):
                                 Logger.log_info(f"Tải video thành công: {filename}")
+                                self._record_download(url, info, filename)
                                 return filename
                             else:
                                 # Tìm file với extension thực tế
@@ -383,6 +544,7 @@ class VideoDownloader:
                                     test_file = base_name + ext
                                     if os.path.exists(test_file):
                                         Logger.log_info(f"Tải video thành công: {test_file}")
+                                        self._record_download(url, info, test_file)
                                         return test_file
                         
                         Logger.log_error("Không tìm thấy file video đã tải")
@@ -438,6 +600,7 @@ class VideoDownloader:
                             filename = ydl.prepare_filename(entry)
                             if os.path.exists(filename):
                                 downloaded_files.append(filename)
+                                self._record_download(entry.get('webpage_url'), entry, filename)
                             else:
                                 # Tìm file với extension thực tế
                                 base_name = os.path.splitext(filename)[0]
@@ -445,6 +608,7 @@ class VideoDownloader:
                                     test_file = base_name + ext
                                     if os.path.exists(test_file):
                                         downloaded_files.append(test_file)
+                                        self._record_download(entry.get('webpage_url'), entry, test_file)
                                         break
             
             Logger.log_info(f"Tải playlist hoàn thành: {len(downloaded_files)} video")
@@ -455,25 +619,10 @@ class VideoDownloader:
             return []
     
     def get_available_formats(self, url: str) -> List[Dict[str, Any]]:
-        """Lấy danh sách format có sẵn"""
+        """Lấy danh sách format có sẵn (chỉ video formats)"""
         try:
-            with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
-                info = ydl.extract_info(url, download=False)
-                
-                formats = []
-                if 'formats' in info:
-                    for fmt in info['formats']:
-                        if fmt.get('vcodec') != 'none':  # Chỉ video formats
-                            formats.append({
-                                'format_id': fmt.get('format_id'),
-                                'ext': fmt.get('ext'),
-                                'resolution': fmt.get('resolution'),
-                                'fps': fmt.get('fps'),
-                                'filesize': fmt.get('filesize'),
-                                'quality': fmt.get('quality')
-                            })
-                
-                return formats
+            record = self.get_metadata(url)
+            return (record.get('formats') or []) if record else []
                 
         except Exception as e:
             Logger.log_error(f"Lỗi lấy format: {e}")
@@ -564,40 +713,9 @@ class VideoDownloader:
                     iterable = []
                 
                 for entry in iterable:
-                    if not entry:
-                        continue
-                    
-                    video_url = entry.get('url') or entry.get('webpage_url')
-                    title = entry.get('title') or ''
-                    duration = entry.get('duration') or 0
-                    video_id = entry.get('id') or ''
-                    
-                    # Lọc video hợp lệ
-                    is_valid_video = False
-                    if video_url and duration > 0:
-                        # TikTok: có '/video/' trong URL
-                        if '/video/' in video_url:
-                            is_valid_video = True
-                        # YouTube: có 'watch?v=' hoặc 'shorts/'
-                        elif 'watch?v=' in video_url or '/shorts/' in video_url:
-                            is_valid_video = True
-                        # Facebook: có '/videos/' hoặc '/watch/'
-                        elif '/videos/' in video_url or '/watch/' in video_url:
-                            is_valid_video = True
-                        # Instagram: có '/reel/' hoặc '/p/'
-                        elif '/reel/' in video_url or '/p/' in video_url:
-                            is_valid_video = True
-                        # Kiểm tra extractor key
-                        elif 'video' in (entry.get('ie_key') or '').lower():
-                            is_valid_video = True
-                    
-                    if is_valid_video:
-                        entries.append({
-                            'title': title,
-                            'url': video_url,
-                            'id': video_id,
-                            'duration': duration
-                        })
+                    video = self._flat_entry_to_video(entry)
+                    if video:
+                        entries.append(video)
                 
                 Logger.log_info(f"Đã lấy {len(entries)} video từ {url}")
                 return entries
@@ -606,11 +724,148 @@ class VideoDownloader:
             # Thử fallback URLs nếu URL gốc lỗi
             return self._try_fallback_urls(url, max_videos)
     
+    @staticmethod
+    def _flat_entry_to_video(entry: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Chuyển entry extract_flat thành dict video, None nếu không phải video hợp lệ"""
+        if not entry:
+            return None
+        
+        video_url = entry.get('url') or entry.get('webpage_url')
+        title = entry.get('title') or ''
+        duration = entry.get('duration') or 0
+        video_id = entry.get('id') or ''
+        
+        # Lọc video hợp lệ
+        is_valid_video = False
+        if video_url and duration > 0:
+            # TikTok: có '/video/' trong URL
+            if '/video/' in video_url:
+                is_valid_video = True
+            # YouTube: có 'watch?v=' hoặc 'shorts/'
+            elif 'watch?v=' in video_url or '/shorts/' in video_url:
+                is_valid_video = True
+            # Facebook: có '/videos/' hoặc '/watch/'
+            elif '/videos/' in video_url or '/watch/' in video_url:
+                is_valid_video = True
+            # Instagram: có '/reel/' hoặc '/p/'
+            elif '/reel/' in video_url or '/p/' in video_url:
+                is_valid_video = True
+            # Kiểm tra extractor key
+            elif 'video' in (entry.get('ie_key') or '').lower():
+                is_valid_video = True
+        
+        if not is_valid_video:
+            return None
+        return {
+            'title': title,
+            'url': video_url,
+            'id': video_id,
+            'duration': duration,
+            # Entry phẳng thường không có, chỉ dùng cho con trỏ đồng bộ khi có
+            'upload_date': entry.get('upload_date'),
+            # Cùng với id là khóa download archive, không phải suy ra lại từ URL
+            'ie_key': entry.get('ie_key')
+        }
+    
+    @staticmethod
+    def _channel_key(url: str) -> str:
+        """Khóa con trỏ đồng bộ của kênh (URL đã bỏ query và dấu / cuối)"""
+        return url.strip().split('?')[0].rstrip('/')
+    
+    def channel_cursor(self, url: str) -> Optional[Dict[str, Any]]:
+        """Video mới nhất đã thấy ở lần đồng bộ trước của kênh"""
+        if self.archive is None:
+            return None
+        return self.archive.get_cursor(self._channel_key(url))
+    
+    @staticmethod
+    def _cursor_published_at(video: Dict[str, Any]) -> Optional[str]:
+        """Thời điểm đăng theo định dạng ISO của YouTube API (để so sánh chuỗi với `videoPublishedAt`)
+
+        `upload_date` YYYYMMDD của yt-dlp được đổi sang đầu ngày; không có thì None
+        (con trỏ khi đó chỉ so theo id video).
+        """
+        published_at = video.get('published_at') or ''
+        if 'T' in published_at:
+            return published_at
+        upload_date = str(video.get('upload_date') or '')
+        if len(upload_date) == 8 and upload_date.isdigit():
+            return f"{upload_date[:4]}-{upload_date[4:6]}-{upload_date[6:]}T00:00:00Z"
+        return None
+    
+    def update_channel_cursor(self, url: str, videos: List[Dict[str, Any]]):
+        """Ghi video mới nhất (đầu danh sách) làm con trỏ đồng bộ của kênh"""
+        if self.archive is None or not videos or not videos[0].get('id'):
+            return
+        newest = videos[0]
+        self.archive.put_cursor(self._channel_key(url), newest['id'], self._cursor_published_at(newest))
+    
+    def sync_channel_videos(self, url: str, max_videos: int = 50) -> List[Dict[str, Any]]:
+        """Chỉ lấy video mới đăng từ lần đồng bộ trước (theo con trỏ lưu của kênh)
+        
+        Danh sách kênh được đọc lần lượt từng trang (lazy) và dừng ngay khi gặp
+        video của con trỏ, nên kênh không có video mới chỉ tốn một request.
+        Chưa có con trỏ thì lấy như `list_channel_videos`.
+        """
+        cursor = self.channel_cursor(url)
+        if not cursor:
+            videos = self.list_channel_videos(url, max_videos)
+        else:
+            known = {cursor['video_id']}
+            videos = self._list_until_known(self._normalize_url(url), known, max_videos)
+            if videos is None:
+                # Không duyệt lazy được: lấy danh sách đầy đủ rồi cắt tại video đã biết
+                videos = []
+                for video in self.list_channel_videos(url, max_videos):
+                    if video.get('id') in known:
+                        break
+                    videos.append(video)
+        self.update_channel_cursor(url, videos)
+        Logger.log_info(f"Đồng bộ kênh: {len(videos)} video mới từ {url}")
+        return videos
+    
+    def _list_until_known(self, url: str, known_ids: Set[str], max_videos: int) -> Optional[List[Dict[str, Any]]]:
+        """Duyệt entries theo từng trang, dừng khi gặp id đã biết
+
+        Trả về None nếu không duyệt được (lỗi hoặc không nhận ra entry nào) để
+        người gọi chuyển sang cách lấy đầy đủ.
+        """
+        opts = {
+            'quiet': True,
+            'extract_flat': True,
+            'lazy_playlist': True,
+            'logger': self._get_logger(),
+        }
+        try:
+            with yt_dlp.YoutubeDL(opts) as ydl:
+                # process=False: entries là generator, trang tiếp theo chỉ được tải khi duyệt tới
+                info = ydl.extract_info(url, download=False, process=False)
+                if not info or 'entries' not in info:
+                    return None
+                videos = []
+                for entry in info['entries']:
+                    if entry and str(entry.get('id') or '') in known_ids:
+                        return videos
+                    video = self._flat_entry_to_video(entry)
+                    if video:
+                        videos.append(video)
+                        if len(videos) >= max_videos:
+                            return videos
+                return videos or None
+        except Exception as e:
+            Logger.log_warning(f"Không duyệt lazy được danh sách {url}: {e}")
+            return None
+    
     def _get_tiktok_videos_direct(self, url: str, max_videos: int) -> List[Dict[str, Any]]:
         """Lấy video TikTok sử dụng phương pháp tìm kiếm"""
         try:
             # Trích xuất username từ URL
             username = url.split('@')[-1].split('/')[0]
+            cache_key = f"tiktok-listing:{username}:{max_videos}"
+            cached = self.metadata_cache.get(cache_key, self.listing_ttl)
+            if cached:
+                Logger.log_info(f"Dùng danh sách TikTok đã lưu cho @{username}: {len(cached)} video")
+                return cached
             Logger.log_info(f"Lấy video TikTok cho @{username}")
             
             # Thử nhiều phương pháp khác nhau
@@ -625,6 +880,7 @@ class VideoDownloader:
                     videos = method(username, max_videos)
                     if videos:
                         Logger.log_info(f"Thành công với phương pháp {method.__name__}: {len(videos)} video")
+                        self.metadata_cache.put(cache_key, videos)
                         return videos
                 except Exception as e:
                     Logger.log_warning(f"Phương pháp {method.__name__} thất bại: {e}")
@@ -0,0 +1,28 @@
+"""
+Profile mã hóa video (preset/CRF/tune của libx264/libx265)
+"""
+from typing import Any, Dict, List, Optional
+
+# Profile mặc định khi cấu hình không chỉ định hoặc chỉ định sai
+DEFAULT_PROFILE = 'balanced'
+
+ENCODING_PROFILES: Dict[str, Dict[str, Any]] = {
+    # Xem trước/bản nháp: nhanh nhất, chất lượng vừa đủ
+    'fast-draft': {'preset': 'ultrafast', 'crf': 28, 'tune': 'fastdecode'},
+    # Đăng lên nền tảng: cân bằng tốc độ và dung lượng
+    'balanced': {'preset': 'veryfast', 'crf': 23, 'tune': None},
+    # Lưu trữ: chậm, chất lượng cao
+    'archive': {'preset': 'slow', 'crf': 18, 'tune': None}
+}
+
+def resolve_profile(name: Optional[str]) -> str:
+    """Tên profile hợp lệ (profile không tồn tại thì dùng mặc định)"""
+    return name if name in ENCODING_PROFILES else DEFAULT_PROFILE
+
+def profile_options(name: Optional[str]) -> List[str]:
+    """Option FFmpeg của profile cho encoder video libx264/libx265"""
+    profile = ENCODING_PROFILES[resolve_profile(name)]
+    options = ['-preset', profile['preset'], '-crf', str(profile['crf'])]
+    if profile.get('tune'):
+        options += ['-tune', profile['tune']]
+    return options
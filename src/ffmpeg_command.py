@@ -0,0 +1,128 @@
+"""
+Dựng lệnh FFmpeg dạng argv (không qua shell)
+"""
+import shlex
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+def escape_filter_value(value: str) -> str:
+    """Escape giá trị option trong filtergraph (vd. text/fontfile của drawtext)
+
+    Cần escape 2 lớp: lớp option của filter (\\ ' :) rồi lớp filtergraph
+    (\\ ' [ ] , ;). Không qua shell nên không cần thêm lớp nào khác.
+    Kết quả dùng trực tiếp, KHÔNG bọc thêm dấu nháy: trong '...' FFmpeg
+    giữ nguyên dấu \\ nên một lớp escape sẽ không được gỡ.
+    """
+    for char in ('\\', "'", ':'):
+        value = value.replace(char, '\\' + char)
+    for char in ('\\', "'", '[', ']', ',', ';'):
+        value = value.replace(char, '\\' + char)
+    return value
+
+@dataclass
+class InputSpec:
+    """Một input của FFmpeg cùng các option phía input (-ss, -t, -f, ...)"""
+    path: str
+    options: List[str] = field(default_factory=list)
+
+    def to_args(self) -> List[str]:
+        return [*self.options, '-i', self.path]
+
+@dataclass
+class OutputSpec:
+    """Một output: stream được map, codec theo loại stream, option và metadata"""
+    path: str
+    maps: List[str] = field(default_factory=list)
+    codecs: Dict[str, str] = field(default_factory=dict)
+    options: List[str] = field(default_factory=list)
+    metadata: Dict[str, str] = field(default_factory=dict)
+
+    def to_args(self) -> List[str]:
+        args = []
+        for stream in self.maps:
+            args += ['-map', stream]
+        for stream_type, codec in self.codecs.items():
+            args += [f'-c:{stream_type}' if stream_type else '-c', codec]
+        args += self.options
+        for key, value in self.metadata.items():
+            args += ['-metadata', f'{key}={value}']
+        args.append(self.path)
+        return args
+
+class FFmpegCommand:
+    """Lệnh FFmpeg có cấu trúc: option chung, các input, filter graph và các output"""
+
+    def __init__(self, global_options: List[str] = None):
+        self.global_options = ['-y'] + list(global_options or [])
+        self.inputs: List[InputSpec] = []
+        self.filters: List[str] = []
+        self.outputs: List[OutputSpec] = []
+
+    def add_input(self, path: str, *options: str) -> int:
+        """Thêm input, trả về chỉ số input dùng trong filter graph/map"""
+        self.inputs.append(InputSpec(path, list(options)))
+        return len(self.inputs) - 1
+
+    def add_filter(self, chain: str):
+        """Thêm một chain vào -filter_complex"""
+        self.filters.append(chain)
+
+    def add_output(self, path: str, maps: List[str] = None, codecs: Dict[str, str] = None,
+                   options: List[str] = None, metadata: Dict[str, str] = None) -> OutputSpec:
+        """Thêm output"""
+        output = OutputSpec(path, list(maps or []), dict(codecs or {}),
+                            list(options or []), dict(metadata or {}))
+        self.outputs.append(output)
+        return output
+
+    @property
+    def first_input(self) -> Optional[str]:
+        return self.inputs[0].path if self.inputs else None
+
+    def to_argv(self, ffmpeg_path: str = 'ffmpeg') -> List[str]:
+        """Chuyển thành danh sách argv để chạy trực tiếp"""
+        argv = [ffmpeg_path, *self.global_options]
+        for spec in self.inputs:
+            argv += spec.to_args()
+        if self.filters:
+            argv += ['-filter_complex', ';'.join(self.filters)]
+        for output in self.outputs:
+            argv += output.to_args()
+        return argv
+
+    def __str__(self) -> str:
+        return ' '.join(shlex.quote(arg) for arg in self.to_argv())
+
+class CompiledTemplate:
+    """Template FFmpeg (config/templates.json) đã tách thành argv một lần khi load
+
+    Mỗi file chỉ cần gán lại các token chứa {input}/{output}, không phải
+    thay chuỗi và quote lại cả lệnh.
+    """
+
+    PLACEHOLDERS = ('{input}', '{output}')
+
+    def __init__(self, name: str, command: str, settings: Dict = None,
+                 video_options: List[str] = None):
+        self.name = name
+        self.settings = settings or {}
+        self.argv = shlex.split(command)
+        if video_options:
+            # Option của profile mã hóa đặt ngay trước output để áp dụng cho output đó
+            output_index = next((i for i, token in enumerate(self.argv) if '{output}' in token),
+                                len(self.argv))
+            self.argv[output_index:output_index] = list(video_options)
+        if self.argv and self.argv[0].lower() in ('ffmpeg', 'ffmpeg.exe'):
+            self.argv[0] = 'ffmpeg'
+        # Vị trí các token cần điền theo từng file
+        self.slots: List[Tuple[int, str]] = [
+            (i, token) for i, token in enumerate(self.argv)
+            if any(placeholder in token for placeholder in self.PLACEHOLDERS)
+        ]
+
+    def render(self, input_path: str, output_path: str) -> List[str]:
+        """Tạo argv cho một file cụ thể"""
+        argv = list(self.argv)
+        for i, token in self.slots:
+            argv[i] = token.replace('{input}', input_path).replace('{output}', output_path)
+        return argv
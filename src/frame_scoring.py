@@ -0,0 +1,53 @@
+"""
+Chấm điểm frame (độ nét, độ sáng, độ tương phản) bằng NumPy để chọn thumbnail
+"""
+from typing import Dict, List
+import numpy as np
+
+# Kích thước frame mẫu (grayscale) khi chấm điểm: đủ để so độ nét, rất rẻ để giải mã
+SAMPLE_WIDTH = 160
+SAMPLE_HEIGHT = 90
+# Frame tối/cháy sáng quá ngưỡng này gần như không dùng được làm thumbnail
+DARK_THRESHOLD = 20
+BRIGHT_THRESHOLD = 235
+
+def score_frames(frames: np.ndarray) -> Dict[str, np.ndarray]:
+    """Chấm điểm một lô frame grayscale có shape (N, H, W), tính vector hóa cho cả lô
+
+    - sharpness: phương sai của Laplacian (mờ/nhòe thì thấp)
+    - brightness: độ sáng trung bình, contrast: độ lệch chuẩn
+    - score: tổng có trọng số đã chuẩn hóa, frame quá tối/quá sáng bị phạt
+    """
+    frames = frames.astype(np.float32)
+    laplacian = (4 * frames[:, 1:-1, 1:-1]
+                 - frames[:, :-2, 1:-1] - frames[:, 2:, 1:-1]
+                 - frames[:, 1:-1, :-2] - frames[:, 1:-1, 2:])
+    sharpness = laplacian.var(axis=(1, 2))
+    brightness = frames.mean(axis=(1, 2))
+    contrast = frames.std(axis=(1, 2))
+
+    sharpness_norm = sharpness / max(float(sharpness.max()), 1e-6)
+    contrast_norm = contrast / max(float(contrast.max()), 1e-6)
+    exposure = 1 - np.abs(brightness - 128) / 128
+    score = 0.5 * sharpness_norm + 0.3 * contrast_norm + 0.2 * exposure
+    score = np.where((brightness < DARK_THRESHOLD) | (brightness > BRIGHT_THRESHOLD), score * 0.1, score)
+
+    return {
+        'sharpness': sharpness,
+        'brightness': brightness,
+        'contrast': contrast,
+        'score': score
+    }
+
+def frames_from_raw(data: bytes, width: int = SAMPLE_WIDTH, height: int = SAMPLE_HEIGHT) -> np.ndarray:
+    """Chuyển dữ liệu rawvideo gray thành mảng (N, H, W), bỏ frame thiếu ở cuối"""
+    frame_size = width * height
+    count = len(data) // frame_size
+    return np.frombuffer(data[:count * frame_size], dtype=np.uint8).reshape(count, height, width)
+
+def to_records(times: List[float], scores: Dict[str, np.ndarray]) -> List[Dict[str, float]]:
+    """Danh sách bản ghi (thời điểm + các điểm) để lưu cache"""
+    return [
+        {'time': float(time), **{name: float(values[i]) for name, values in scores.items()}}
+        for i, time in enumerate(times)
+    ]
@@ -0,0 +1,79 @@
+"""
+Tính hash nội dung file tốc độ cao (đọc buffer lớn, song song nhiều file)
+"""
+import os
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+from .media_cache import MediaCache
+
+# Mỗi lần đọc 8 MB vào cùng một buffer thay vì hàng nghìn lần đọc 4 KB
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+def _fast_hash_factory():
+    """Hàm tạo hash nhanh (không dùng cho bảo mật): xxh3_128 nếu có xxhash, không thì blake2b"""
+    try:
+        import xxhash
+        return 'xxh3_128', xxhash.xxh3_128
+    except ImportError:
+        return 'blake2b', lambda: hashlib.blake2b(digest_size=16)
+
+class FileHasher:
+    """Dịch vụ tính hash file
+
+    - Đọc bằng `readinto` vào buffer lớn dùng lại, giảm số syscall và cấp phát
+    - `hash_many` chạy song song trên thread pool (hashlib nhả GIL khi hash buffer lớn)
+    - `algorithm='fast'` dùng digest không mật mã để so trùng/khóa cache
+    - Kết quả được lưu vào MediaCache theo (đường dẫn, kích thước, mtime)
+    """
+
+    def __init__(self, media_cache: Optional[MediaCache] = None,
+                 chunk_size: int = HASH_CHUNK_SIZE, max_workers: int = None):
+        self.media_cache = media_cache
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.fast_name, self._fast_factory = _fast_hash_factory()
+
+    def _resolve(self, algorithm: str):
+        """Tên lưu cache và hàm tạo đối tượng hash cho thuật toán"""
+        if algorithm == 'fast':
+            return self.fast_name, self._fast_factory
+        return algorithm, lambda: hashlib.new(algorithm)
+
+    def hash_file(self, file_path: str, algorithm: str = 'md5') -> str:
+        """Hash hex của file, chuỗi rỗng nếu lỗi"""
+        name, factory = self._resolve(algorithm)
+        if self.media_cache is not None:
+            cached = self.media_cache.get_hash(file_path, name)
+            if cached:
+                return cached
+
+        try:
+            digest = factory()
+            buffer = bytearray(self.chunk_size)
+            view = memoryview(buffer)
+            with open(file_path, 'rb', buffering=0) as f:
+                while True:
+                    read = f.readinto(buffer)
+                    if not read:
+                        break
+                    digest.update(view[:read])
+            result = digest.hexdigest()
+        except Exception as e:
+            logging.error(f"Lỗi tính hash file {file_path}: {e}")
+            return ""
+
+        if self.media_cache is not None:
+            self.media_cache.put_hash(file_path, name, result)
+        return result
+
+    def hash_many(self, file_paths: Iterable[str], algorithm: str = 'md5') -> Dict[str, str]:
+        """Hash nhiều file song song, trả về {đường dẫn: hash} (bỏ qua file lỗi)"""
+        file_paths = list(file_paths)
+        if not file_paths:
+            return {}
+        workers = min(self.max_workers, len(file_paths))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            digests = executor.map(lambda path: self.hash_file(path, algorithm), file_paths)
+            return {path: digest for path, digest in zip(file_paths, digests) if digest}
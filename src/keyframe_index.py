@@ -0,0 +1,76 @@
+"""
+Chỉ mục keyframe (thời điểm + vị trí byte) của file video
+"""
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import List, Optional, Tuple
+
+class KeyframeIndex:
+    """Danh sách keyframe đã sắp xếp, lưu gọn bằng array, tra cứu bằng binary search"""
+
+    def __init__(self, times: array = None, offsets: array = None):
+        self.times = times if times is not None else array('d')
+        self.offsets = offsets if offsets is not None else array('q')
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def before(self, t: float) -> Optional[float]:
+        """Keyframe gần nhất tại hoặc trước t"""
+        i = bisect_right(self.times, t + 1e-6)
+        return self.times[i - 1] if i else None
+
+    def after(self, t: float) -> Optional[float]:
+        """Keyframe gần nhất tại hoặc sau t"""
+        i = bisect_left(self.times, t - 1e-6)
+        return self.times[i] if i < len(self.times) else None
+
+    def nearest(self, t: float) -> Optional[float]:
+        """Keyframe gần t nhất (trước hoặc sau)"""
+        candidates = [k for k in (self.before(t), self.after(t)) if k is not None]
+        return min(candidates, key=lambda k: abs(k - t)) if candidates else None
+
+    def offset_before(self, t: float) -> Optional[int]:
+        """Vị trí byte của keyframe tại hoặc trước t (-1 nếu container không cung cấp)"""
+        i = bisect_right(self.times, t + 1e-6)
+        return self.offsets[i - 1] if i else None
+
+    def split_points(self, count: int, duration: float) -> List[float]:
+        """Chia [0, duration] thành `count` đoạn gần bằng nhau, ranh giới đặt tại keyframe"""
+        points = []
+        for i in range(1, count):
+            keyframe = self.nearest(duration * i / count)
+            if keyframe is not None and 0 < keyframe < duration and (not points or keyframe > points[-1]):
+                points.append(keyframe)
+        return points
+
+    def interval_points(self, interval: float, duration: float) -> List[float]:
+        """Ranh giới tại keyframe gần mỗi bội số của `interval` (chia thành các phần dài ~interval)"""
+        points = []
+        t = interval
+        while t < duration:
+            keyframe = self.nearest(t)
+            if keyframe is not None and 0 < keyframe < duration and (not points or keyframe > points[-1]):
+                points.append(keyframe)
+            t += interval
+        return points
+
+    def to_blobs(self) -> Tuple[bytes, bytes]:
+        """Chuyển sang bytes (little-endian) để lưu vào cache"""
+        times, offsets = array('d', self.times), array('q', self.offsets)
+        if sys.byteorder == 'big':
+            times.byteswap()
+            offsets.byteswap()
+        return times.tobytes(), offsets.tobytes()
+
+    @classmethod
+    def from_blobs(cls, times_blob: bytes, offsets_blob: bytes) -> 'KeyframeIndex':
+        """Tạo lại chỉ mục từ bytes của to_blobs()"""
+        times, offsets = array('d'), array('q')
+        times.frombytes(times_blob)
+        offsets.frombytes(offsets_blob)
+        if sys.byteorder == 'big':
+            times.byteswap()
+            offsets.byteswap()
+        return cls(times, offsets)
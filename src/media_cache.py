@@ -0,0 +1,272 @@
+"""
+Cache SQLite cho dữ liệu đọc từ file media (probe, keyframe, ...)
+"""
+import os
+import json
+import sqlite3
+import threading
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from .probe import MediaInfo
+from .keyframe_index import KeyframeIndex
+
+class MediaCache:
+    """Cache kết quả probe, chỉ mục keyframe, hash nội dung và thư viện nhạc theo (đường dẫn tuyệt đối, kích thước, mtime_ns)
+
+    Khi file thay đổi (kích thước hoặc mtime khác), bản ghi cũ tự động bị
+    bỏ qua và ghi đè ở lần probe tiếp theo.
+    """
+
+    def __init__(self, db_path: str = "data/cache/media_cache.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._init_schema()
+
+    def _init_schema(self):
+        """Tạo bảng nếu chưa có"""
+        with self._lock, self._conn:
+            # WAL cho phép nhiều process đọc/ghi cùng lúc
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS probe (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    data TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS keyframes (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    times BLOB NOT NULL,
+                    offsets BLOB NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS file_hashes (
+                    path TEXT NOT NULL,
+                    algorithm TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    digest TEXT NOT NULL,
+                    PRIMARY KEY (path, algorithm)
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS frame_scores (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    samples INTEGER NOT NULL,
+                    data TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS music_tracks (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    duration REAL NOT NULL,
+                    loudness REAL,
+                    normalized_path TEXT NOT NULL
+                )
+            """)
+
+    @staticmethod
+    def file_key(file_path: str) -> Optional[Tuple[str, int, int]]:
+        """Khóa nhận diện file: (đường dẫn tuyệt đối, kích thước, mtime_ns)"""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns
+
+    def get_probe(self, file_path: str) -> Optional[MediaInfo]:
+        """Lấy kết quả probe còn hợp lệ, None nếu chưa có hoặc file đã thay đổi"""
+        key = self.file_key(file_path)
+        if key is None:
+            return None
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT data FROM probe WHERE path = ? AND size = ? AND mtime_ns = ?", key
+                ).fetchone()
+            if row is None:
+                return None
+            info = MediaInfo.from_dict(json.loads(row[0]))
+            info.path = file_path
+            return info
+        except Exception as e:
+            logging.error(f"Lỗi đọc probe cache: {e}")
+            return None
+
+    def put_probe(self, file_path: str, info: MediaInfo):
+        """Lưu kết quả probe (ghi đè bản ghi cũ của cùng đường dẫn)"""
+        key = self.file_key(file_path)
+        if key is None:
+            return
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO probe (path, size, mtime_ns, data) VALUES (?, ?, ?, ?)",
+                    (*key, json.dumps(info.to_dict(), ensure_ascii=False))
+                )
+        except Exception as e:
+            logging.error(f"Lỗi ghi probe cache: {e}")
+
+    def get_keyframes(self, file_path: str) -> Optional[KeyframeIndex]:
+        """Lấy chỉ mục keyframe còn hợp lệ"""
+        key = self.file_key(file_path)
+        if key is None:
+            return None
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT times, offsets FROM keyframes WHERE path = ? AND size = ? AND mtime_ns = ?", key
+                ).fetchone()
+            return KeyframeIndex.from_blobs(row[0], row[1]) if row else None
+        except Exception as e:
+            logging.error(f"Lỗi đọc keyframe cache: {e}")
+            return None
+
+    def put_keyframes(self, file_path: str, index: KeyframeIndex):
+        """Lưu chỉ mục keyframe"""
+        key = self.file_key(file_path)
+        if key is None:
+            return
+        try:
+            times_blob, offsets_blob = index.to_blobs()
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO keyframes (path, size, mtime_ns, times, offsets) VALUES (?, ?, ?, ?, ?)",
+                    (*key, sqlite3.Binary(times_blob), sqlite3.Binary(offsets_blob))
+                )
+        except Exception as e:
+            logging.error(f"Lỗi ghi keyframe cache: {e}")
+
+    def get_hash(self, file_path: str, algorithm: str) -> Optional[str]:
+        """Lấy hash nội dung còn hợp lệ theo thuật toán"""
+        key = self.file_key(file_path)
+        if key is None:
+            return None
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT digest FROM file_hashes WHERE path = ? AND algorithm = ? AND size = ? AND mtime_ns = ?",
+                    (key[0], algorithm, key[1], key[2])
+                ).fetchone()
+            return row[0] if row else None
+        except Exception as e:
+            logging.error(f"Lỗi đọc hash cache: {e}")
+            return None
+
+    def put_hash(self, file_path: str, algorithm: str, digest: str):
+        """Lưu hash nội dung"""
+        key = self.file_key(file_path)
+        if key is None:
+            return
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO file_hashes (path, algorithm, size, mtime_ns, digest) VALUES (?, ?, ?, ?, ?)",
+                    (key[0], algorithm, key[1], key[2], digest)
+                )
+        except Exception as e:
+            logging.error(f"Lỗi ghi hash cache: {e}")
+
+    def get_frame_scores(self, file_path: str, samples: int) -> Optional[List[Dict[str, float]]]:
+        """Lấy điểm các frame mẫu đã chấm (cùng số mẫu) còn hợp lệ"""
+        key = self.file_key(file_path)
+        if key is None:
+            return None
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT data FROM frame_scores WHERE path = ? AND size = ? AND mtime_ns = ? AND samples = ?",
+                    (*key, samples)
+                ).fetchone()
+            return json.loads(row[0]) if row else None
+        except Exception as e:
+            logging.error(f"Lỗi đọc frame score cache: {e}")
+            return None
+
+    def put_frame_scores(self, file_path: str, samples: int, scores: List[Dict[str, float]]):
+        """Lưu điểm các frame mẫu"""
+        key = self.file_key(file_path)
+        if key is None:
+            return
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO frame_scores (path, size, mtime_ns, samples, data) VALUES (?, ?, ?, ?, ?)",
+                    (*key, samples, json.dumps(scores))
+                )
+        except Exception as e:
+            logging.error(f"Lỗi ghi frame score cache: {e}")
+
+    def get_music_track(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """Lấy bản ghi thư viện nhạc còn hợp lệ"""
+        key = self.file_key(file_path)
+        if key is None:
+            return None
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT duration, loudness, normalized_path FROM music_tracks "
+                    "WHERE path = ? AND size = ? AND mtime_ns = ?", key
+                ).fetchone()
+            if row is None:
+                return None
+            return {'path': key[0], 'duration': row[0], 'loudness': row[1], 'normalized_path': row[2]}
+        except Exception as e:
+            logging.error(f"Lỗi đọc thư viện nhạc: {e}")
+            return None
+
+    def put_music_track(self, file_path: str, duration: float, loudness: Optional[float],
+                        normalized_path: str):
+        """Lưu bản ghi thư viện nhạc"""
+        key = self.file_key(file_path)
+        if key is None:
+            return
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO music_tracks (path, size, mtime_ns, duration, loudness, normalized_path) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (*key, duration, loudness, normalized_path)
+                )
+        except Exception as e:
+            logging.error(f"Lỗi ghi thư viện nhạc: {e}")
+
+    def list_music_tracks(self) -> List[Dict[str, Any]]:
+        """Toàn bộ bản ghi thư viện nhạc (chưa kiểm tra file còn hợp lệ)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, duration, loudness, normalized_path FROM music_tracks"
+            ).fetchall()
+        return [{'path': row[0], 'duration': row[1], 'loudness': row[2], 'normalized_path': row[3]}
+                for row in rows]
+
+    def purge_missing(self) -> int:
+        """Xóa bản ghi của các file không còn tồn tại"""
+        removed = 0
+        for table in ('probe', 'keyframes', 'file_hashes', 'frame_scores', 'music_tracks'):
+            with self._lock:
+                paths = [row[0] for row in self._conn.execute(f"SELECT DISTINCT path FROM {table}")]
+            missing = [(path,) for path in paths if not os.path.exists(path)]
+            if missing:
+                with self._lock, self._conn:
+                    self._conn.executemany(f"DELETE FROM {table} WHERE path = ?", missing)
+            removed += len(missing)
+        return removed
+
+    def close(self):
+        """Đóng kết nối"""
+        with self._lock:
+            self._conn.close()
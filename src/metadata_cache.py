@@ -0,0 +1,127 @@
+"""
+Cache thông tin video (bản ghi rút gọn từ info dict của yt-dlp) trên đĩa, có TTL
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+from typing import Any, Dict, List, Optional
+
+# Mô tả dài chỉ giữ phần đầu, đủ để hiển thị
+DESCRIPTION_LIMIT = 500
+
+def _compact_format(fmt: Dict[str, Any]) -> Dict[str, Any]:
+    """Các trường cần dùng của một format (kể cả codec/bitrate để chọn format tốt nhất khi đọc)"""
+    return {
+        'format_id': fmt.get('format_id'),
+        'ext': fmt.get('ext'),
+        'resolution': fmt.get('resolution'),
+        'height': fmt.get('height'),
+        'fps': fmt.get('fps'),
+        'filesize': fmt.get('filesize') or fmt.get('filesize_approx'),
+        'quality': fmt.get('quality'),
+        'vcodec': fmt.get('vcodec'),
+        'acodec': fmt.get('acodec'),
+        'tbr': fmt.get('tbr')
+    }
+
+def best_format(formats: List[Dict[str, Any]], max_height: int) -> Optional[Dict[str, Any]]:
+    """Format video tốt nhất không vượt quá `max_height` (ưu tiên cao hơn, có sẵn audio, bitrate lớn)"""
+    candidates = [fmt for fmt in formats
+                  if fmt.get('vcodec') != 'none' and (fmt.get('height') or 0) <= max_height]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda fmt: (fmt.get('height') or 0,
+                                            fmt.get('acodec') not in (None, 'none'),
+                                            fmt.get('tbr') or 0))
+
+def compact_info(info: Dict[str, Any]) -> Dict[str, Any]:
+    """Rút gọn info dict của yt-dlp (thường vài trăm KB vì mảng `formats`) thành bản ghi nhỏ
+
+    Không lưu format tốt nhất: nó phụ thuộc độ phân giải đang cấu hình nên
+    được chọn lại bằng `best_format` mỗi lần đọc.
+    """
+    formats = info.get('formats') or []
+    return {
+        'id': info.get('id'),
+        'extractor_key': info.get('extractor_key'),
+        'title': info.get('title'),
+        'duration': info.get('duration'),
+        'uploader': info.get('uploader'),
+        'view_count': info.get('view_count'),
+        'like_count': info.get('like_count'),
+        'description': (info.get('description') or '')[:DESCRIPTION_LIMIT],
+        'thumbnail': info.get('thumbnail'),
+        'formats': [_compact_format(fmt) for fmt in formats if fmt.get('vcodec') != 'none']
+    }
+
+class MetadataCache:
+    """Lưu bản ghi JSON theo khóa (URL) kèm thời điểm lấy; bản ghi quá `ttl` giây coi như hết hạn
+
+    Chỉ bản ghi rút gọn được lưu nên lần tra sau là một lần đọc SQLite nhỏ thay
+    vì trích xuất lại qua mạng, và không giữ info dict lớn trong bộ nhớ.
+    """
+
+    def __init__(self, db_path: str = "data/cache/metadata_cache.db", ttl: float = 6 * 3600):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._init_schema()
+
+    def _init_schema(self):
+        """Tạo bảng nếu chưa có"""
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS metadata (
+                    key TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    fetched_at REAL NOT NULL
+                )
+            """)
+
+    def get(self, key: str, ttl: Optional[float] = None) -> Optional[Any]:
+        """Bản ghi còn hạn của khóa (`ttl` ghi đè TTL mặc định), None nếu chưa có hoặc đã hết hạn"""
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT data FROM metadata WHERE key = ? AND fetched_at >= ?", (key, time.time() - ttl)
+                ).fetchone()
+            return json.loads(row[0]) if row else None
+        except Exception as e:
+            logging.error(f"Lỗi đọc metadata cache: {e}")
+            return None
+
+    def put(self, key: str, data: Any):
+        """Lưu bản ghi (ghi đè bản ghi cũ)"""
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO metadata (key, data, fetched_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(data, ensure_ascii=False, separators=(',', ':')), time.time())
+                )
+        except Exception as e:
+            logging.error(f"Lỗi ghi metadata cache: {e}")
+
+    def purge_expired(self, ttl: Optional[float] = None) -> int:
+        """Xóa bản ghi đã hết hạn, trả về số bản ghi bị xóa"""
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            with self._lock, self._conn:
+                cursor = self._conn.execute("DELETE FROM metadata WHERE fetched_at < ?", (time.time() - ttl,))
+            return cursor.rowcount
+        except Exception as e:
+            logging.error(f"Lỗi dọn metadata cache: {e}")
+            return 0
+
+    def close(self):
+        """Đóng kết nối"""
+        with self._lock:
+            self._conn.close()
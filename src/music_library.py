@@ -0,0 +1,134 @@
+"""
+Thư viện nhạc nền: chuẩn hóa độ lớn một lần, lưu chỉ mục độ dài/loudness
+"""
+import os
+import json
+import random
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+from .utils import FFmpegManager
+from .media_cache import MediaCache
+from .ffmpeg_command import FFmpegCommand
+
+MUSIC_EXTENSIONS = ('.mp3', '.m4a', '.aac', '.wav', '.flac', '.ogg', '.opus')
+# Mức loudness đích (EBU R128) cho nhạc nền đã chuẩn hóa
+TARGET_LOUDNESS = -16.0
+TARGET_TRUE_PEAK = -1.5
+TARGET_LRA = 11.0
+
+class MusicLibrary:
+    """Chỉ mục thư mục nhạc nền (mặc định data/music)
+
+    Mỗi bài được phân tích loudnorm và mã hóa một lần thành AAC đã chuẩn hóa
+    độ lớn trong thư mục cache. Độ dài và loudness tích hợp được lưu vào
+    MediaCache theo (đường dẫn, kích thước, mtime), nên lúc render chỉ cần
+    dùng file đã chuẩn hóa, chọn bài ngẫu nhiên không phải probe lại.
+    """
+
+    def __init__(self, ffmpeg: FFmpegManager, media_cache: MediaCache,
+                 music_dir: str = "data/music", cache_dir: str = "data/cache/music"):
+        self.ffmpeg = ffmpeg
+        self.media_cache = media_cache
+        self.music_dir = music_dir
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def list_sources(self) -> List[str]:
+        """Các file nhạc trong thư mục nhạc"""
+        if not os.path.isdir(self.music_dir):
+            return []
+        return sorted(
+            os.path.join(self.music_dir, name) for name in os.listdir(self.music_dir)
+            if name.lower().endswith(MUSIC_EXTENSIONS)
+        )
+
+    def scan(self) -> List[Dict[str, Any]]:
+        """Đánh chỉ mục toàn bộ thư mục nhạc, chỉ xử lý bài mới hoặc đã thay đổi"""
+        tracks = []
+        for music_path in self.list_sources():
+            track = self.prepare(music_path)
+            if track:
+                tracks.append(track)
+        logging.info(f"Thư viện nhạc: {len(tracks)} bài")
+        return tracks
+
+    def prepare(self, music_path: str) -> Optional[Dict[str, Any]]:
+        """Bản ghi của bài nhạc (path, duration, loudness, normalized_path), chuẩn hóa nếu chưa có"""
+        track = self.media_cache.get_music_track(music_path)
+        if track and os.path.exists(track['normalized_path']):
+            return track
+
+        info = self.ffmpeg.probe(music_path)
+        if not info or not info.has_audio:
+            logging.error(f"File nhạc không đọc được: {music_path}")
+            return None
+
+        measured = self._analyze(music_path)
+        normalized_path = self._normalized_path(music_path)
+        if not self._normalize(music_path, measured, normalized_path):
+            return None
+
+        loudness = float(measured['input_i']) if measured else None
+        self.media_cache.put_music_track(music_path, info.duration, loudness, normalized_path)
+        return self.media_cache.get_music_track(music_path)
+
+    def resolve(self, music_path: str) -> str:
+        """Đường dẫn file đã chuẩn hóa để mix, lỗi thì dùng file gốc"""
+        track = self.prepare(music_path)
+        return track['normalized_path'] if track else music_path
+
+    def random_track(self, min_duration: float = 0) -> Optional[Dict[str, Any]]:
+        """Chọn ngẫu nhiên một bài đã có trong chỉ mục (đủ dài nếu được yêu cầu)"""
+        candidates = []
+        for music_path in self.list_sources():
+            track = self.media_cache.get_music_track(music_path)
+            if track is None or not os.path.exists(track['normalized_path']):
+                continue
+            if track['duration'] >= min_duration:
+                candidates.append(track)
+        if not candidates:
+            # Chưa có chỉ mục: đánh chỉ mục rồi chọn lại
+            candidates = [track for track in self.scan() if track['duration'] >= min_duration]
+        return random.choice(candidates) if candidates else None
+
+    def _normalized_path(self, music_path: str) -> str:
+        """Tên file đã chuẩn hóa theo đường dẫn và trạng thái file gốc"""
+        key = repr(MediaCache.file_key(music_path))
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.m4a')
+
+    def _analyze(self, music_path: str) -> Optional[Dict[str, str]]:
+        """Lượt 1 của loudnorm: đo loudness, true peak, LRA"""
+        command = FFmpegCommand()
+        command.add_input(music_path)
+        command.add_output('-', options=[
+            '-vn', '-af', f'loudnorm=I={TARGET_LOUDNESS}:TP={TARGET_TRUE_PEAK}:LRA={TARGET_LRA}:print_format=json',
+            '-f', 'null'
+        ])
+        stderr = self.ffmpeg.run_capture(command)
+        if not stderr:
+            return None
+        try:
+            # Khối JSON loudnorm nằm ở cuối stderr
+            return json.loads(stderr[stderr.rindex('{'):stderr.rindex('}') + 1])
+        except ValueError:
+            logging.warning(f"Không đọc được kết quả loudnorm: {music_path}")
+            return None
+
+    def _normalize(self, music_path: str, measured: Optional[Dict[str, str]], output_path: str) -> bool:
+        """Lượt 2: chuẩn hóa tuyến tính theo số đo, mã hóa AAC 48 kHz stereo"""
+        loudnorm = f'loudnorm=I={TARGET_LOUDNESS}:TP={TARGET_TRUE_PEAK}:LRA={TARGET_LRA}'
+        if measured:
+            loudnorm += (f":measured_I={measured['input_i']}:measured_TP={measured['input_tp']}"
+                         f":measured_LRA={measured['input_lra']}:measured_thresh={measured['input_thresh']}"
+                         f":offset={measured['target_offset']}:linear=true")
+        temp_path = output_path + '.tmp.m4a'
+        command = FFmpegCommand()
+        command.add_input(music_path)
+        command.add_output(temp_path, ['0:a:0'], {'a': 'aac'},
+                           ['-af', loudnorm, '-ar', '48000', '-ac', '2', '-b:a', '192k'])
+        if not self.ffmpeg.run_command(command):
+            logging.error(f"Lỗi chuẩn hóa nhạc: {music_path}")
+            return False
+        os.replace(temp_path, output_path)
+        return True
@@ -0,0 +1,342 @@
+"""
+Module biên dịch chuỗi thao tác xử lý thành một lệnh FFmpeg duy nhất
+"""
+import random
+import string
+from typing import Dict, Any, List, Optional
+from .utils import ConfigManager
+from .probe import MediaInfo
+from .keyframe_index import KeyframeIndex
+from .ffmpeg_command import FFmpegCommand, escape_filter_value
+from .watermark import WatermarkRenderer, overlay_filter
+from .encoding_profiles import profile_options
+
+# Thu nhỏ nền xuống 1/4 khung hình trước khi làm mờ: blur trên 1/16 số pixel
+VERTICAL_BLUR_DOWNSCALE = 4
+
+def vertical_filter(mode: str = 'pad', label: str = 'v') -> str:
+    """Filter chuyển sang 720x1280
+
+    - 'pad': thu nhỏ vừa khung, thêm viền đen
+    - 'blur': nền là chính video được phóng to lấp đầy khung và làm mờ. Nền được
+      crop và làm mờ ở độ phân giải thấp rồi mới phóng lên, nên chi phí gần
+      bằng chế độ viền đen. Graph có một đầu vào/một đầu ra nên dùng được
+      trong -vf và nối tiếp với filter khác.
+
+    `label`: tiền tố nhãn pad nội bộ của chế độ 'blur'; mỗi lần dùng trong cùng
+    một filter graph cần tiền tố riêng vì FFmpeg không chấp nhận nhãn trùng.
+    """
+    if mode == 'blur':
+        bg_width, bg_height = 720 // VERTICAL_BLUR_DOWNSCALE, 1280 // VERTICAL_BLUR_DOWNSCALE
+        return (f"split[{label}bg][{label}fg];"
+                f"[{label}bg]scale={bg_width}:{bg_height}:force_original_aspect_ratio=increase,"
+                f"crop={bg_width}:{bg_height},boxblur=10:2,scale=720:1280:flags=fast_bilinear[{label}bgb];"
+                f"[{label}fg]scale=720:1280:force_original_aspect_ratio=decrease[{label}fgs];"
+                f"[{label}bgb][{label}fgs]overlay=(W-w)/2:(H-h)/2,setsar=1")
+    return "scale=720:1280:force_original_aspect_ratio=decrease,pad=720:1280:(ow-iw)/2:(oh-ih)/2:black"
+
+# Biến thể xuất ra từ cùng một lần giải mã: filter riêng của từng nền tảng
+# (None: giữ nguyên khung hình đã xử lý)
+VARIANT_FILTERS = {
+    '9_16': vertical_filter('pad'),
+    '9_16_blur': vertical_filter('blur', 'o_9_16_blur_'),
+    '16_9': "scale=1280:720:force_original_aspect_ratio=decrease,pad=1280:720:(ow-iw)/2:(oh-ih)/2:black",
+    'source': None,
+    # Frame đại diện trong 100 frame đầu, xuất ra ảnh
+    'thumbnail': "thumbnail=100,scale=720:-2"
+}
+
+class PipelineCompiler:
+    """Biên dịch danh sách thao tác (cut, watermark, speed, ...) thành một lần chạy FFmpeg
+
+    Thay vì mỗi bước giải mã/mã hóa lại toàn bộ file và ghi file trung gian,
+    các bước được gộp vào một `-filter_complex`, phần cắt được chuyển thành
+    seek phía input và chỉ mã hóa một lần.
+    """
+
+    SUPPORTED_OPERATIONS = ('cut', 'watermark', 'music', 'speed', 'flip', '9_16', 'md5')
+
+    def __init__(self, config_manager: ConfigManager, font_path: str,
+                 watermark_renderer: Optional[WatermarkRenderer] = None,
+                 encoding_profile: Optional[str] = None):
+        self.config = config_manager
+        self.font_path = font_path
+        # Option preset/CRF cho stream video phải mã hóa lại
+        self.video_options = profile_options(
+            encoding_profile or self.config.get('processing.encoding_profile'))
+        # Có renderer thì watermark là PNG dựng sẵn + overlay, không thì drawtext
+        self.watermark_renderer = watermark_renderer
+        # Độ dài dự kiến của output sau lần compile gần nhất (None nếu không biết)
+        self.output_duration = None
+
+    def compile(self, input_path: str, operations: List[Dict[str, Any]],
+                output_path: str, media_info: Optional[MediaInfo] = None,
+                threads: int = 0, keyframe_index: Optional[KeyframeIndex] = None) -> FFmpegCommand:
+        """Tạo lệnh FFmpeg cho toàn bộ chuỗi thao tác
+
+        `media_info` (từ ffprobe) giúp xử lý file không có audio và giới hạn
+        thời gian cắt theo độ dài thật của video. `threads` > 0 giới hạn số
+        thread của filter và encoder khi chạy nhiều job cùng lúc.
+        `keyframe_index` dùng để đặt điểm cắt đúng keyframe khi video được copy.
+        """
+        has_audio = media_info.has_audio if media_info else True
+        source_duration = media_info.duration if media_info and media_info.duration else None
+        input_start = 0.0
+        input_duration = None
+        # Hệ số tốc độ tích lũy: 1 giây ở output = speed_factor giây ở input
+        speed_factor = 1.0
+
+        # Phần tử là filter (str) hoặc ('overlay', đường dẫn PNG, filter overlay)
+        video_filters = []
+        audio_filters = []
+        music_inputs = []
+        metadata = {}
+        # Kích thước khung hình hiện tại trong chuỗi filter (để watermark vừa khung)
+        resolution = (media_info.width, media_info.height) if media_info and media_info.has_video else None
+
+        for index, operation in enumerate(operations):
+            op_type = operation.get('type')
+            op_params = operation.get('params', {})
+
+            if op_type == 'cut':
+                # Quy đổi thời gian cắt về timeline của input để seek phía input
+                start = float(op_params.get('start_time', 0)) * speed_factor
+                duration = float(op_params['duration']) * speed_factor
+                if input_duration is not None:
+                    duration = min(duration, max(input_duration - start, 0))
+                elif source_duration is not None:
+                    duration = min(duration, max(source_duration - input_start - start, 0))
+                if duration <= 0:
+                    raise ValueError("Thời điểm cắt vượt quá độ dài video")
+                input_start += start
+                input_duration = duration
+            elif op_type == 'watermark':
+                watermark = self._build_watermark(op_params.get('text'),
+                                                  op_params.get('position', 'bottom-right'), resolution)
+                if watermark:
+                    video_filters.append(watermark)
+            elif op_type == 'music':
+                music_inputs.append((op_params['music_path'], float(op_params.get('volume', 0.5))))
+            elif op_type == 'speed':
+                speed = float(op_params['speed'])
+                if speed != 1.0:
+                    video_filters.append(f"setpts={1/speed}*PTS")
+                    if has_audio:
+                        audio_filters.extend(self._build_atempo(speed))
+                    speed_factor *= speed
+            elif op_type == 'flip':
+                direction = op_params.get('direction', 'horizontal')
+                video_filters.append("hflip" if direction == "horizontal" else "vflip")
+            elif op_type == '9_16':
+                mode = op_params.get('mode') or self.config.get('processing.vertical_mode', 'pad')
+                # Nhãn theo vị trí thao tác: nhiều lần 9_16 không trùng nhãn với nhau và với biến thể
+                video_filters.append(vertical_filter(mode, f'v{index}_'))
+                resolution = (720, 1280)
+            elif op_type == 'md5':
+                metadata = self._build_random_metadata()
+            else:
+                raise ValueError(f"Thao tác không được hỗ trợ: {op_type}")
+
+        if not video_filters and input_start > 0 and keyframe_index is not None:
+            # Video được copy nên phải bắt đầu từ keyframe, tránh frame hỏng ở đầu
+            keyframe = keyframe_index.before(input_start)
+            if keyframe is not None:
+                if input_duration is not None:
+                    input_duration += input_start - keyframe
+                input_start = keyframe
+
+        output_duration = input_duration
+        if output_duration is None and source_duration is not None:
+            output_duration = max(source_duration - input_start, 0)
+        self.output_duration = output_duration / speed_factor if output_duration is not None else None
+
+        # Seek phía input: FFmpeg nhảy thẳng tới vị trí cần thiết thay vì giải mã từ đầu
+        global_options = []
+        if threads > 0:
+            global_options += ['-filter_threads', str(threads), '-filter_complex_threads', str(threads)]
+        command = FFmpegCommand(global_options)
+        input_options = []
+        if input_start > 0:
+            input_options += ['-ss', f'{input_start:.3f}']
+        if input_duration is not None:
+            input_options += ['-t', f'{input_duration:.3f}']
+        command.add_input(input_path, *input_options)
+        for music_path, _ in music_inputs:
+            command.add_input(music_path)
+
+        # Ghép filter graph
+        video_label = '0:v'
+        audio_label = '0:a?'
+        if video_filters:
+            video_label = self._add_video_chain(command, video_filters)
+        if audio_filters or music_inputs:
+            current = '[0:a]' if has_audio else None
+            if audio_filters:
+                command.add_filter(f"[0:a]{','.join(audio_filters)}[a0]")
+                current = '[a0]'
+            for index, (_, volume) in enumerate(music_inputs, start=1):
+                command.add_filter(f"[{index}:a]volume={volume}[m{index}]")
+                if current is None:
+                    # Video không có tiếng: nhạc nền là audio duy nhất
+                    current = f'[m{index}]'
+                    continue
+                command.add_filter(f"{current}[m{index}]amix=inputs=2:duration=first[mix{index}]")
+                current = f'[mix{index}]'
+            audio_label = current
+        elif not has_audio:
+            audio_label = None
+
+        maps = [video_label]
+        # Chỉ mã hóa lại stream có filter, stream còn lại copy nguyên
+        codecs = {'v': 'libx264' if video_filters else 'copy'}
+        if audio_label:
+            maps.append(audio_label)
+            codecs['a'] = 'aac' if (audio_filters or music_inputs) else 'copy'
+        options = []
+        if music_inputs and not has_audio:
+            # Nhạc nền dài hơn video thì dừng theo video
+            options.append('-shortest')
+        if threads > 0:
+            options += ['-threads', str(threads)]
+        if video_filters:
+            options += self.video_options
+        command.add_output(output_path, maps, codecs, options, metadata)
+
+        return command
+
+    def compile_variants(self, input_path: str, operations: List[Dict[str, Any]],
+                         variants: Dict[str, str], media_info: Optional[MediaInfo] = None,
+                         threads: int = 0, keyframe_index: Optional[KeyframeIndex] = None) -> FFmpegCommand:
+        """Tạo một lệnh FFmpeg xuất nhiều biến thể ({tên biến thể: đường dẫn output})
+
+        Chuỗi thao tác chung được áp dụng một lần, sau đó stream video được
+        `split` (audio đã qua filter thì `asplit`) cho từng biến thể trong cùng
+        filter graph: input chỉ được giải mã một lần cho mọi output.
+        """
+        unknown = [name for name in variants if name not in VARIANT_FILTERS]
+        if unknown:
+            raise ValueError(f"Biến thể không được hỗ trợ: {', '.join(unknown)}")
+
+        # Biến thể có filter thì video được mã hóa lại, điểm cắt không cần lùi về keyframe
+        if any(VARIANT_FILTERS[name] is not None for name in variants):
+            keyframe_index = None
+        command = self.compile(input_path, operations, '', media_info, threads, keyframe_index)
+        base_output = command.outputs.pop()
+        video_label = base_output.maps[0]
+        audio_label = base_output.maps[1] if len(base_output.maps) > 1 else None
+        video_filtered = video_label.startswith('[')
+
+        # Biến thể giữ nguyên khung hình mà video chưa qua filter thì copy, không cần split
+        copy_variants = [name for name in variants if VARIANT_FILTERS[name] is None and not video_filtered]
+        split_variants = [name for name in variants if name not in copy_variants]
+        video_source = video_label if video_filtered else f'[{video_label}]'
+        if len(split_variants) > 1:
+            command.add_filter(f"{video_source}split={len(split_variants)}"
+                               + ''.join(f'[s{i}]' for i in range(len(split_variants))))
+            branches = [f'[s{i}]' for i in range(len(split_variants))]
+        else:
+            branches = [video_source] * len(split_variants)
+
+        video_labels = {name: video_label for name in copy_variants}
+        for name, branch in zip(split_variants, branches):
+            variant_filter = VARIANT_FILTERS[name]
+            if variant_filter is None:
+                if branch == video_label:
+                    video_labels[name] = video_label
+                    continue
+                variant_filter = 'null'
+            command.add_filter(f"{branch}{variant_filter}[o_{name}]")
+            video_labels[name] = f'[o_{name}]'
+
+        # Nhãn audio của filter graph chỉ dùng được một lần
+        audio_variants = [name for name in variants if name != 'thumbnail']
+        audio_labels = {name: audio_label for name in audio_variants}
+        if audio_label and audio_label.startswith('[') and len(audio_variants) > 1:
+            command.add_filter(f"{audio_label}asplit={len(audio_variants)}"
+                               + ''.join(f'[as{i}]' for i in range(len(audio_variants))))
+            audio_labels = {name: f'[as{i}]' for i, name in enumerate(audio_variants)}
+
+        for name, output_path in variants.items():
+            if name == 'thumbnail':
+                command.add_output(output_path, [video_labels[name]], options=['-frames:v', '1'])
+                continue
+            maps = [video_labels[name]]
+            codecs = {'v': 'copy' if name in copy_variants else 'libx264'}
+            options = list(base_output.options)
+            if name not in copy_variants and not video_filtered:
+                options += self.video_options
+            if audio_labels.get(name):
+                maps.append(audio_labels[name])
+                codecs['a'] = base_output.codecs.get('a', 'copy')
+            command.add_output(output_path, maps, codecs, options, base_output.metadata)
+        return command
+
+    @staticmethod
+    def _add_video_chain(command: FFmpegCommand, video_filters: List[Any]) -> str:
+        """Thêm chuỗi filter video vào graph, tách chain tại mỗi overlay; trả về nhãn cuối"""
+        current = '[0:v]'
+        pending = []
+        step = 0
+        for video_filter in video_filters:
+            if isinstance(video_filter, str):
+                pending.append(video_filter)
+                continue
+            _, png_path, overlay = video_filter
+            if pending:
+                step += 1
+                command.add_filter(f"{current}{','.join(pending)}[v{step}]")
+                current = f'[v{step}]'
+                pending = []
+            image_index = command.add_input(png_path)
+            step += 1
+            command.add_filter(f"{current}[{image_index}:v]{overlay}[v{step}]")
+            current = f'[v{step}]'
+        if pending:
+            command.add_filter(f"{current}{','.join(pending)}[vout]")
+            return '[vout]'
+        return current
+
+    def _build_watermark(self, text: Optional[str], position: str,
+                         resolution: Optional[tuple] = None) -> Optional[Any]:
+        """Watermark theo cấu hình: overlay PNG dựng sẵn, drawtext nếu không render được"""
+        watermark_config = self.config.get('processing.watermark', {})
+        if not watermark_config.get('enabled', True):
+            return None
+
+        text = text or watermark_config.get('text', 'TikTok Reup Offline')
+        font_size = watermark_config.get('size', 24)
+        color = watermark_config.get('color', '#FFFFFF')
+
+        if self.watermark_renderer is not None:
+            png_path = self.watermark_renderer.render(text, self.font_path, font_size, color,
+                                                      resolution, watermark_config.get('logo'))
+            if png_path:
+                return ('overlay', png_path, overlay_filter(position))
+
+        return (f"drawtext=text={escape_filter_value(text)}:expansion=none"
+                f":fontfile={escape_filter_value(self.font_path)}:fontsize={font_size}"
+                f":fontcolor={color}:x=w-tw-10:y=h-th-10")
+
+    @staticmethod
+    def _build_atempo(speed: float) -> List[str]:
+        """atempo chỉ nhận 0.5 - 2.0 nên tách thành nhiều bước nếu cần"""
+        filters = []
+        while speed > 2.0:
+            filters.append("atempo=2.0")
+            speed /= 2.0
+        while speed < 0.5:
+            filters.append("atempo=0.5")
+            speed /= 0.5
+        filters.append(f"atempo={speed}")
+        return filters
+
+    @staticmethod
+    def _build_random_metadata() -> Dict[str, str]:
+        """Metadata ngẫu nhiên để thay đổi MD5"""
+        random_title = ''.join(random.choices(string.ascii_letters + string.digits, k=10))
+        random_artist = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
+        return {
+            'title': random_title,
+            'artist': random_artist,
+            'comment': 'Processed by TikTok Reup Offline'
+        }
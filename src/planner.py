@@ -0,0 +1,98 @@
+"""
+Tối ưu chuỗi thao tác trước khi biên dịch: bỏ thao tác thừa, sắp xếp lại
+"""
+from typing import Any, Dict, List, Optional
+from .probe import MediaInfo
+
+# Kích thước khung hình sau thao tác 9_16
+VERTICAL_SIZE = (720, 1280)
+# Thao tác giao hoán với 9_16 (scale + pad căn giữa) nên được chạy sau khi thu nhỏ.
+# Watermark không giao hoán: đặt sau 9_16 thì nó nằm trên viền đen thay vì trên video.
+COMMUTING_OPERATIONS = ('flip',)
+
+class OperationPlanner:
+    """Dựa vào thông tin probe để rút gọn chuỗi thao tác cho PipelineCompiler
+
+    - Bỏ thao tác không làm gì: tốc độ 1.0, 9_16 khi video đã là 720x1280,
+      cắt bao trọn cả video, hai lần lật cùng chiều liên tiếp, md5 lặp lại
+    - Đưa thao tác cắt lên đầu (quy đổi theo tốc độ đứng trước) để seek phía input
+    - Thu nhỏ (9_16) trước thao tác lật liền trước nó để lật trên ít pixel hơn;
+      các thao tác khác giữ nguyên thứ tự người dùng chọn
+    Stream nào không còn filter thì compiler tự chọn stream copy.
+    """
+
+    def plan(self, operations: List[Dict[str, Any]],
+             media_info: Optional[MediaInfo] = None) -> List[Dict[str, Any]]:
+        """Trả về chuỗi thao tác đã tối ưu (không sửa danh sách gốc)"""
+        operations = self._hoist_cuts(operations)
+        operations = self._drop_noops(operations, media_info)
+        return self._downscale_first(operations, media_info)
+
+    @staticmethod
+    def _hoist_cuts(operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Đưa thao tác cắt lên trước, thời gian cắt quy đổi về timeline trước khi đổi tốc độ"""
+        cuts = []
+        others = []
+        speed_factor = 1.0
+        for operation in operations:
+            op_type = operation.get('type')
+            params = operation.get('params', {})
+            if op_type == 'cut':
+                cut_params = dict(params)
+                cut_params['start_time'] = float(params.get('start_time', 0)) * speed_factor
+                cut_params['duration'] = float(params['duration']) * speed_factor
+                cuts.append({**operation, 'params': cut_params})
+                continue
+            if op_type == 'speed':
+                speed_factor *= float(params['speed'])
+            others.append(operation)
+        return cuts + others
+
+    @staticmethod
+    def _drop_noops(operations: List[Dict[str, Any]],
+                    media_info: Optional[MediaInfo]) -> List[Dict[str, Any]]:
+        """Bỏ các thao tác không thay đổi kết quả"""
+        size = (media_info.width, media_info.height) if media_info and media_info.has_video else None
+        duration = media_info.duration if media_info and media_info.duration else None
+        planned = []
+        for operation in operations:
+            op_type = operation.get('type')
+            params = operation.get('params', {})
+            if op_type == 'speed' and float(params['speed']) == 1.0:
+                continue
+            if op_type == 'cut' and duration is not None and not planned:
+                # Cắt từ đầu, dài hơn cả video: giữ nguyên
+                if float(params.get('start_time', 0)) <= 0 and float(params['duration']) >= duration:
+                    continue
+            if op_type == '9_16':
+                if size == VERTICAL_SIZE:
+                    continue
+                size = VERTICAL_SIZE
+            if op_type == 'md5' and any(op.get('type') == 'md5' for op in planned):
+                continue
+            if op_type == 'flip' and planned and planned[-1].get('type') == 'flip':
+                direction = params.get('direction', 'horizontal')
+                if planned[-1].get('params', {}).get('direction', 'horizontal') == direction:
+                    # Lật hai lần cùng chiều: triệt tiêu
+                    planned.pop()
+                    continue
+            planned.append(operation)
+        return planned
+
+    @staticmethod
+    def _downscale_first(operations: List[Dict[str, Any]],
+                         media_info: Optional[MediaInfo]) -> List[Dict[str, Any]]:
+        """Đưa 9_16 lên trước các thao tác lật liền trước nó nếu đó là thao tác thu nhỏ"""
+        if not media_info or not media_info.has_video:
+            return operations
+        if media_info.width * media_info.height <= VERTICAL_SIZE[0] * VERTICAL_SIZE[1]:
+            return operations
+        planned = list(operations)
+        for i, operation in enumerate(planned):
+            if operation.get('type') != '9_16':
+                continue
+            j = i
+            while j > 0 and planned[j - 1].get('type') in COMMUTING_OPERATIONS:
+                j -= 1
+            planned.insert(j, planned.pop(i))
+        return planned
@@ -0,0 +1,190 @@
+"""
+Kiểu dữ liệu thông tin media đọc từ ffprobe (chỉ đọc header container và stream)
+"""
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Any, List, Optional
+
+@dataclass
+class VideoStreamInfo:
+    """Thông tin stream video"""
+    index: int = 0
+    codec: str = ''
+    profile: str = ''
+    width: int = 0
+    height: int = 0
+    fps: float = 0.0
+    pix_fmt: str = ''
+    bitrate: int = 0
+    rotation: int = 0
+    # Khoảng cách trung bình giữa 2 keyframe (giây), 0 nếu không xác định được
+    keyframe_interval: float = 0.0
+
+@dataclass
+class AudioStreamInfo:
+    """Thông tin stream audio"""
+    index: int = 0
+    codec: str = ''
+    sample_rate: int = 0
+    channels: int = 0
+    channel_layout: str = ''
+    bitrate: int = 0
+
+@dataclass
+class MediaInfo:
+    """Thông tin file media"""
+    path: str = ''
+    format_name: str = ''
+    duration: float = 0.0
+    size: int = 0
+    bitrate: int = 0
+    video: Optional[VideoStreamInfo] = None
+    audio: List[AudioStreamInfo] = field(default_factory=list)
+
+    @property
+    def has_video(self) -> bool:
+        return self.video is not None
+
+    @property
+    def has_audio(self) -> bool:
+        return bool(self.audio)
+
+    @property
+    def width(self) -> int:
+        """Chiều rộng hiển thị (đã tính rotation)"""
+        if not self.video:
+            return 0
+        return self.video.height if self.video.rotation in (90, 270) else self.video.width
+
+    @property
+    def height(self) -> int:
+        """Chiều cao hiển thị (đã tính rotation)"""
+        if not self.video:
+            return 0
+        return self.video.width if self.video.rotation in (90, 270) else self.video.height
+
+    @property
+    def fps(self) -> float:
+        return self.video.fps if self.video else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Chuyển sang dict (giữ các key cũ duration/width/height/fps)"""
+        data = asdict(self)
+        data.update({
+            'duration_ms': int(round(self.duration * 1000)),
+            'width': self.width,
+            'height': self.height,
+            'fps': self.fps,
+            'has_audio': self.has_audio,
+            'video_codec': self.video.codec if self.video else '',
+            'audio_codec': self.audio[0].codec if self.audio else ''
+        })
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'MediaInfo':
+        """Tạo lại MediaInfo từ dict của to_dict()"""
+        video = data.get('video')
+        return cls(
+            path=data.get('path', ''),
+            format_name=data.get('format_name', ''),
+            duration=float(data.get('duration', 0.0)),
+            size=int(data.get('size', 0)),
+            bitrate=int(data.get('bitrate', 0)),
+            video=VideoStreamInfo(**video) if video else None,
+            audio=[AudioStreamInfo(**a) for a in data.get('audio', [])]
+        )
+
+def parse_ffprobe_output(path: str, data: Dict[str, Any]) -> MediaInfo:
+    """Chuyển JSON của ffprobe (-show_format -show_streams -show_packets) thành MediaInfo"""
+    fmt = data.get('format', {})
+    info = MediaInfo(
+        path=path,
+        format_name=fmt.get('format_name', ''),
+        duration=_to_float(fmt.get('duration')),
+        size=_to_int(fmt.get('size')),
+        bitrate=_to_int(fmt.get('bit_rate'))
+    )
+
+    for stream in data.get('streams', []):
+        codec_type = stream.get('codec_type')
+        if codec_type == 'video' and info.video is None:
+            # Bỏ qua ảnh bìa (attached picture) nhúng trong file
+            if stream.get('disposition', {}).get('attached_pic'):
+                continue
+            info.video = VideoStreamInfo(
+                index=_to_int(stream.get('index')),
+                codec=stream.get('codec_name', ''),
+                profile=stream.get('profile', ''),
+                width=_to_int(stream.get('width')),
+                height=_to_int(stream.get('height')),
+                fps=_parse_rate(stream.get('avg_frame_rate')) or _parse_rate(stream.get('r_frame_rate')),
+                pix_fmt=stream.get('pix_fmt', ''),
+                bitrate=_to_int(stream.get('bit_rate')),
+                rotation=_parse_rotation(stream)
+            )
+        elif codec_type == 'audio':
+            info.audio.append(AudioStreamInfo(
+                index=_to_int(stream.get('index')),
+                codec=stream.get('codec_name', ''),
+                sample_rate=_to_int(stream.get('sample_rate')),
+                channels=_to_int(stream.get('channels')),
+                channel_layout=stream.get('channel_layout', ''),
+                bitrate=_to_int(stream.get('bit_rate'))
+            ))
+
+    if info.video is not None:
+        info.video.keyframe_interval = _keyframe_interval(data.get('packets', []), info.video.index)
+        if not info.duration:
+            # Một số container chỉ có duration ở stream
+            for stream in data.get('streams', []):
+                if stream.get('index') == info.video.index:
+                    info.duration = _to_float(stream.get('duration'))
+
+    return info
+
+def _keyframe_interval(packets: List[Dict[str, Any]], stream_index: int) -> float:
+    """Tính khoảng cách keyframe trung bình từ các packet đầu file"""
+    times = []
+    for packet in packets:
+        if packet.get('stream_index') != stream_index or 'K' not in packet.get('flags', ''):
+            continue
+        pts_time = packet.get('pts_time')
+        if pts_time is not None:
+            times.append(float(pts_time))
+    if len(times) < 2:
+        return 0.0
+    times.sort()
+    return (times[-1] - times[0]) / (len(times) - 1)
+
+def _parse_rotation(stream: Dict[str, Any]) -> int:
+    """Lấy góc xoay từ display matrix hoặc tag rotate"""
+    rotation = None
+    for side_data in stream.get('side_data_list', []):
+        if 'rotation' in side_data:
+            rotation = side_data['rotation']
+            break
+    if rotation is None:
+        rotation = stream.get('tags', {}).get('rotate', 0)
+    return int(round(_to_float(rotation))) % 360
+
+def _parse_rate(rate: Optional[str]) -> float:
+    """Parse frame rate dạng '30000/1001'"""
+    try:
+        num, _, den = (rate or '').partition('/')
+        if den:
+            return float(num) / float(den) if float(den) else 0.0
+        return float(num)
+    except ValueError:
+        return 0.0
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+def _to_int(value) -> int:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
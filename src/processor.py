@@ -3,11 +3,32 @@ Module xử lý video (cắt, thêm nhạc, watermark, etc.)
 """
 import os
 import json
-import random
-import string
-from typing import Dict, Any, List, Optional, Tuple
+import shutil
+import tempfile
+import threading
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
 from PIL import Image, ImageDraw, ImageFont
 from .utils import ConfigManager, FileManager, FFmpegManager, Logger
+from .probe import MediaInfo
+from .media_cache import MediaCache
+from .render_cache import RenderCache, UNCACHED_OPERATIONS
+from .hashing import FileHasher
+from .keyframe_index import KeyframeIndex
+from .pipeline import PipelineCompiler, VARIANT_FILTERS, vertical_filter
+from .planner import OperationPlanner, VERTICAL_SIZE
+from .encoding_profiles import profile_options
+from .ffmpeg_command import FFmpegCommand, CompiledTemplate, escape_filter_value
+from .batch_executor import BatchExecutor
+from .segment_encoder import SegmentEncoder
+from .watermark import WatermarkRenderer, overlay_filter
+from .music_library import MusicLibrary
+from .thumbnails import ThumbnailEngine
+
+# Encoder dùng để mã hóa lại phần GOP dở dang khi smart cut, theo codec nguồn
+SMART_CUT_ENCODERS = {
+    'h264': 'libx264',
+    'hevc': 'libx265'
+}
 
 class VideoProcessor:
     """Xử lý video"""
@@ -15,13 +36,34 @@ class VideoProcessor:
     def __init__(self, config_manager: ConfigManager):
         self.config = config_manager
         self.output_path = self.config.get('processing.output_path', 'data/processed')
-        self.ffmpeg = FFmpegManager(self.config.get('ffmpeg.path', 'tools/ffmpeg.exe'))
+        self.cache_path = self.config.get('cache.path', 'data/cache')
+        self.media_cache = MediaCache(os.path.join(self.cache_path, 'media_cache.db'))
+        self.hasher = FileHasher(self.media_cache)
+        self.ffmpeg = FFmpegManager(self.config.get('ffmpeg.path', 'tools/ffmpeg.exe'),
+                                    self.config.get('ffmpeg.ffprobe_path'),
+                                    self.media_cache)
+        self.render_cache = None
+        if self.config.get('cache.render_enabled', True):
+            self.render_cache = RenderCache(os.path.join(self.cache_path, 'render_cache.db'),
+                                            self.config.get('cache.render_max_bytes', 20 * 1024 ** 3),
+                                            self.hasher)
+        self.watermark_renderer = WatermarkRenderer(os.path.join(self.cache_path, 'watermarks'))
+        self._font_path = None
+        self.thumbnail_engine = ThumbnailEngine(self.ffmpeg, self.output_path,
+                                                self.config.get('processing.thumbnail_workers'))
+        self.planner = OperationPlanner()
+        self.music_library = MusicLibrary(self.ffmpeg, self.media_cache,
+                                          self.config.get('processing.music_path', 'data/music'),
+                                          os.path.join(self.cache_path, 'music'))
+        self.segment_encoder = SegmentEncoder(self.ffmpeg, self.output_path,
+                                              self.config.get('processing.cpu_count'))
         
         # Tạo thư mục output
         FileManager.ensure_dir(self.output_path)
         
         # Load templates
         self.templates = self._load_templates()
+        self.compiled_templates = self._compile_templates()
     
     def _load_templates(self) -> Dict[str, Any]:
         """Tải templates xử lý"""
@@ -32,22 +74,50 @@ class VideoProcessor:
             Logger.log_error(f"Lỗi tải templates: {e}")
             return {}
     
-    def cut_video(self, input_path: str, duration: int, start_time: int = 0) -> Optional[str]:
-        """Cắt video theo thời gian"""
+    def _compile_templates(self) -> Dict[str, CompiledTemplate]:
+        """Tách lệnh của từng template thành argv một lần khi load"""
+        compiled = {}
+        for name, template in self.templates.get('video_templates', {}).items():
+            try:
+                # Template có thể chọn profile mã hóa riêng (encoding_profile)
+                video_options = (profile_options(template['encoding_profile'])
+                                 if template.get('encoding_profile') else None)
+                compiled[name] = CompiledTemplate(name, template['ffmpeg_command'],
+                                                  template.get('settings'), video_options)
+            except Exception as e:
+                Logger.log_error(f"Lỗi đọc template {name}: {e}")
+        return compiled
+    
+    def cut_video(self, input_path: str, duration: int, start_time: int = 0,
+                  mode: str = None) -> Optional[str]:
+        """Cắt video theo thời gian
+        
+        mode:
+        - 'copy': stream copy, điểm bắt đầu lùi về keyframe gần nhất
+        - 'accurate': mã hóa lại toàn bộ đoạn cắt
+        - 'smart' (mặc định): chỉ mã hóa lại GOP dở dang ở điểm cắt, phần còn lại copy
+        """
         try:
             if not os.path.exists(input_path):
                 Logger.log_error(f"File không tồn tại: {input_path}")
                 return None
             
+            mode = mode or self.config.get('processing.cut_mode', 'smart')
+            
             # Tạo tên file output
             base_name = os.path.splitext(os.path.basename(input_path))[0]
             output_filename = f"{base_name}_cut_{duration}s.mp4"
             output_path = os.path.join(self.output_path, output_filename)
             
-            # Lệnh FFmpeg
-            command = f'ffmpeg -i "{input_path}" -ss {start_time} -t {duration} -c copy "{output_path}"'
+            if mode == 'smart':
+                success = self._smart_cut(input_path, float(start_time), float(duration), output_path)
+            else:
+                # Seek phía input để không phải đọc từ đầu file
+                command = self._cut_command(input_path, float(start_time), float(duration),
+                                            output_path, accurate=(mode == 'accurate'))
+                success = self.ffmpeg.run_command(command)
             
-            if self.ffmpeg.run_command(command):
+            if success:
                 Logger.log_info(f"Cắt video thành công: {output_path}")
                 return output_path
             else:
@@ -58,6 +128,149 @@ class VideoProcessor:
             Logger.log_error(f"Lỗi cắt video: {e}")
             return None
     
+    def split_video(self, input_path: str, part_duration: float,
+                    accurate: bool = None) -> List[str]:
+        """Chia video thành các phần liên tiếp dài khoảng `part_duration` giây, trong một lần chạy
+        
+        Dùng segment muxer: mặc định stream copy với ranh giới đặt tại keyframe
+        (theo chỉ mục keyframe). `accurate` (mặc định theo `processing.split_accurate`)
+        mã hóa lại và ép keyframe đúng tại từng mốc để các phần dài bằng nhau.
+        Trả về danh sách file theo thứ tự.
+        """
+        try:
+            if not os.path.exists(input_path):
+                Logger.log_error(f"File không tồn tại: {input_path}")
+                return []
+            if accurate is None:
+                accurate = self.config.get('processing.split_accurate', False)
+            
+            base_name = os.path.splitext(os.path.basename(input_path))[0]
+            # '%' trong tên file phải nhân đôi vì segment muxer dùng mẫu kiểu printf
+            output_pattern = os.path.join(self.output_path.replace('%', '%%'),
+                                          f"{base_name.replace('%', '%%')}_part_%03d.mp4")
+            list_fd, list_path = tempfile.mkstemp(prefix='.segments_', suffix='.txt', dir=self.output_path)
+            os.close(list_fd)
+            
+            options = ['-f', 'segment', '-reset_timestamps', '1', '-segment_format', 'mp4',
+                       '-segment_list', list_path, '-segment_list_type', 'flat']
+            if accurate:
+                codecs = {'v': 'libx264', 'a': 'aac'}
+                options += self._video_options()
+                options += ['-segment_time', str(part_duration),
+                            '-force_key_frames', f'expr:gte(t,n_forced*{part_duration})']
+            else:
+                codecs = {'': 'copy'}
+                info = self.probe(input_path)
+                index = self.ffmpeg.get_keyframe_index(input_path)
+                points = index.interval_points(part_duration, info.duration) if index and info else []
+                if points:
+                    options += ['-segment_times', ','.join(f'{point:.3f}' for point in points)]
+                else:
+                    options += ['-segment_time', str(part_duration)]
+            
+            command = FFmpegCommand()
+            command.add_input(input_path)
+            command.add_output(output_pattern, ['0:v:0', '0:a?'], codecs, options)
+            
+            try:
+                if not self.ffmpeg.run_command(command):
+                    Logger.log_error("Lỗi chia video")
+                    return []
+                with open(list_path, 'r', encoding='utf-8') as f:
+                    outputs = [os.path.join(self.output_path, os.path.basename(line.strip()))
+                               for line in f if line.strip()]
+            finally:
+                os.remove(list_path)
+            
+            Logger.log_info(f"Chia video thành {len(outputs)} phần: {input_path}")
+            return outputs
+            
+        except Exception as e:
+            Logger.log_error(f"Lỗi chia video: {e}")
+            return []
+    
+    def _smart_cut(self, input_path: str, start: float, duration: float, output_path: str) -> bool:
+        """Cắt chính xác tới frame nhưng gần với tốc độ remux
+        
+        Đoạn [start, keyframe kế tiếp) được mã hóa lại, đoạn từ keyframe đó tới
+        cuối được stream copy, sau đó nối lại bằng concat demuxer. Audio được
+        copy trực tiếp từ file gốc.
+        """
+        info = self.probe(input_path)
+        encoder = SMART_CUT_ENCODERS.get(info.video.codec) if info and info.video else None
+        
+        end = start + duration
+        if info and info.duration:
+            end = min(end, info.duration)
+        
+        copy_command = self._cut_command(input_path, start, duration, output_path)
+        accurate_command = self._cut_command(input_path, start, duration, output_path, accurate=True)
+        
+        if start <= 0:
+            # Đầu file luôn là keyframe
+            return self.ffmpeg.run_command(copy_command)
+        if encoder is None:
+            # Codec không mã hóa lại được với cùng định dạng thì không nối copy được
+            Logger.log_warning("Codec không hỗ trợ smart cut, mã hóa lại toàn bộ đoạn cắt")
+            return self.ffmpeg.run_command(accurate_command)
+        
+        index = self.ffmpeg.get_keyframe_index(input_path)
+        keyframe = index.after(start) if index else None
+        if keyframe is None or keyframe >= end:
+            # Đoạn cắt nằm trọn trong một GOP: mã hóa lại cả đoạn (ngắn)
+            return self.ffmpeg.run_command(accurate_command)
+        
+        if keyframe - start < 0.001:
+            # Điểm cắt trùng keyframe: chỉ cần copy
+            return self.ffmpeg.run_command(copy_command)
+        
+        video = info.video
+        bsf = 'hevc_mp4toannexb' if video.codec == 'hevc' else 'h264_mp4toannexb'
+        temp_dir = tempfile.mkdtemp(prefix='.smartcut_', dir=self.output_path)
+        try:
+            head_path = os.path.join(temp_dir, 'head.ts')
+            tail_path = os.path.join(temp_dir, 'tail.ts')
+            list_path = os.path.join(temp_dir, 'parts.txt')
+            
+            # Phần đầu: mã hóa lại với thông số giống nguồn để nối được với phần copy
+            head_command = FFmpegCommand()
+            head_command.add_input(input_path, '-ss', str(start), '-t', str(keyframe - start))
+            head_options = ['-an'] + (['-pix_fmt', video.pix_fmt] if video.pix_fmt else []) + self._video_options()
+            head_command.add_output(head_path, ['0:v:0'], {'v': encoder}, head_options)
+            # Phần còn lại: copy nguyên từ keyframe
+            tail_command = FFmpegCommand()
+            tail_command.add_input(input_path, '-ss', str(keyframe), '-t', str(end - keyframe))
+            tail_command.add_output(tail_path, ['0:v:0'], {'v': 'copy'}, ['-an', '-bsf:v', bsf])
+            
+            if not self.ffmpeg.run_command(head_command) or not self.ffmpeg.run_command(tail_command):
+                return False
+            
+            FFmpegManager.write_concat_list(list_path, [head_path, tail_path])
+            
+            join_command = FFmpegCommand()
+            join_command.add_input(list_path, '-f', 'concat', '-safe', '0')
+            join_command.add_input(input_path, '-ss', str(start), '-t', str(end - start))
+            join_command.add_output(output_path, ['0:v:0', '1:a?'], {'': 'copy'})
+            return self.ffmpeg.run_command(join_command)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    def _cut_command(self, input_path: str, start: float, duration: float, output_path: str,
+                     accurate: bool = False) -> FFmpegCommand:
+        """Lệnh cắt với seek phía input, copy hoặc mã hóa lại toàn bộ"""
+        command = FFmpegCommand()
+        command.add_input(input_path, '-ss', str(start), '-t', str(duration))
+        if accurate:
+            command.add_output(output_path, ['0:v:0', '0:a?'], {'v': 'libx264', 'a': 'aac'},
+                               self._video_options())
+        else:
+            command.add_output(output_path, ['0:v:0', '0:a?'], {'': 'copy'})
+        return command
+    
+    def _video_options(self, profile: str = None) -> List[str]:
+        """Option preset/CRF theo profile mã hóa (mặc định `processing.encoding_profile`)"""
+        return profile_options(profile or self.config.get('processing.encoding_profile'))
+    
     def add_watermark(self, input_path: str, text: str = None, 
                      position: str = "bottom-right") -> Optional[str]:
         """Thêm watermark text"""
@@ -83,8 +296,26 @@ class VideoProcessor:
             # Tạo font path
             font_path = self._get_font_path()
             
-            # Lệnh FFmpeg với watermark
-            command = f'''ffmpeg -i "{input_path}" -vf "drawtext=text='{text}':fontfile='{font_path}':fontsize={font_size}:fontcolor={color}:x=w-tw-10:y=h-th-10" -c:a copy "{output_path}"'''
+            # Watermark dựng sẵn thành PNG (cache), ghép bằng overlay
+            info = self.probe(input_path)
+            resolution = (info.width, info.height) if info and info.has_video else None
+            png_path = self.watermark_renderer.render(text, font_path, font_size, color, resolution,
+                                                      watermark_config.get('logo'))
+            
+            command = FFmpegCommand()
+            command.add_input(input_path)
+            if png_path:
+                command.add_input(png_path)
+                command.add_filter(f"[0:v][1:v]{overlay_filter(position)}[vout]")
+                command.add_output(output_path, ['[vout]', '0:a?'], {'v': 'libx264', 'a': 'copy'},
+                                   self._video_options())
+            else:
+                # Không render được PNG: dùng drawtext (text được escape, không qua shell)
+                command.add_output(output_path, codecs={'v': 'libx264', 'a': 'copy'}, options=[
+                    *self._video_options(), '-vf', f"drawtext=text={escape_filter_value(text)}:expansion=none"
+                           f":fontfile={escape_filter_value(font_path)}:fontsize={font_size}"
+                           f":fontcolor={color}:x=w-tw-10:y=h-th-10"
+                ])
             
             if self.ffmpeg.run_command(command):
                 Logger.log_info(f"Thêm watermark thành công: {output_path}")
@@ -114,8 +345,13 @@ class VideoProcessor:
             output_filename = f"{base_name}_with_music.mp4"
             output_path = os.path.join(self.output_path, output_filename)
             
-            # Lệnh FFmpeg để mix audio
-            command = f'''ffmpeg -i "{input_path}" -i "{music_path}" -filter_complex "[0:a]volume=1.0[a0];[1:a]volume={volume}[a1];[a0][a1]amix=inputs=2:duration=first[aout]" -map 0:v -map "[aout]" -c:v copy -c:a aac "{output_path}"'''
+            # Mix bản nhạc đã chuẩn hóa độ lớn (chỉ giải mã/chuẩn hóa lần đầu)
+            music_path = self.music_library.resolve(music_path)
+            command = FFmpegCommand()
+            command.add_input(input_path)
+            command.add_input(music_path)
+            command.add_filter(f"[0:a]volume=1.0[a0];[1:a]volume={volume}[a1];[a0][a1]amix=inputs=2:duration=first[aout]")
+            command.add_output(output_path, ['0:v', '[aout]'], {'v': 'copy', 'a': 'aac'})
             
             if self.ffmpeg.run_command(command):
                 Logger.log_info(f"Thêm nhạc thành công: {output_path}")
@@ -141,7 +377,11 @@ class VideoProcessor:
             output_path = os.path.join(self.output_path, output_filename)
             
             # Lệnh FFmpeg
-            command = f'ffmpeg -i "{input_path}" -filter:v "setpts={1/speed}*PTS" -filter:a "atempo={speed}" "{output_path}"'
+            command = FFmpegCommand()
+            command.add_input(input_path)
+            command.add_output(output_path, codecs={'v': 'libx264'},
+                               options=['-filter:v', f"setpts={1/speed}*PTS",
+                                        '-filter:a', f"atempo={speed}", *self._video_options()])
             
             if self.ffmpeg.run_command(command):
                 Logger.log_info(f"Thay đổi tốc độ thành công: {output_path}")
@@ -168,9 +408,8 @@ class VideoProcessor:
             
             # Lệnh FFmpeg
             filter_name = "hflip" if direction == "horizontal" else "vflip"
-            command = f'ffmpeg -i "{input_path}" -vf "{filter_name}" "{output_path}"'
             
-            if self.ffmpeg.run_command(command):
+            if self._encode_video_filter(input_path, filter_name, output_path):
                 Logger.log_info(f"Lật video thành công: {output_path}")
                 return output_path
             else:
@@ -181,8 +420,12 @@ class VideoProcessor:
             Logger.log_error(f"Lỗi lật video: {e}")
             return None
     
-    def convert_to_9_16(self, input_path: str) -> Optional[str]:
-        """Chuyển đổi tỷ lệ 9:16"""
+    def convert_to_9_16(self, input_path: str, mode: str = None) -> Optional[str]:
+        """Chuyển đổi tỷ lệ 9:16
+        
+        `mode` (mặc định theo `processing.vertical_mode`): 'pad' viền đen,
+        'blur' nền mờ từ chính video.
+        """
         try:
             if not os.path.exists(input_path):
                 Logger.log_error(f"File không tồn tại: {input_path}")
@@ -193,10 +436,17 @@ class VideoProcessor:
             output_filename = f"{base_name}_9_16.mp4"
             output_path = os.path.join(self.output_path, output_filename)
             
+            # Đã đúng 720x1280 thì không cần mã hóa lại
+            info = self.probe(input_path)
+            if info and info.has_video and (info.width, info.height) == VERTICAL_SIZE:
+                Logger.log_info(f"Video đã là 9:16, giữ nguyên: {input_path}")
+                return input_path
+            
             # Lệnh FFmpeg
-            command = f'ffmpeg -i "{input_path}" -vf "scale=720:1280:force_original_aspect_ratio=decrease,pad=720:1280:(ow-iw)/2:(oh-ih)/2:black" "{output_path}"'
+            mode = mode or self.config.get('processing.vertical_mode', 'pad')
+            video_filter = vertical_filter(mode)
             
-            if self.ffmpeg.run_command(command):
+            if self._encode_video_filter(input_path, video_filter, output_path):
                 Logger.log_info(f"Chuyển đổi 9:16 thành công: {output_path}")
                 return output_path
             else:
@@ -207,6 +457,22 @@ class VideoProcessor:
             Logger.log_error(f"Lỗi chuyển đổi 9:16: {e}")
             return None
     
+    def _encode_video_filter(self, input_path: str, video_filter: str, output_path: str) -> bool:
+        """Mã hóa lại video với một filter, chia đoạn song song nếu video đủ dài"""
+        if self.config.get('processing.segment_encoding', True):
+            info = self.probe(input_path)
+            min_duration = self.config.get('processing.segment_min_duration', 600)
+            if info and info.duration >= min_duration and self.segment_encoder.plan_segments(info) > 1:
+                return self.segment_encoder.encode(input_path, video_filter, output_path,
+                                                   video_options=self._video_options())
+        
+        # Audio không qua filter nên copy nguyên
+        command = FFmpegCommand()
+        command.add_input(input_path)
+        command.add_output(output_path, ['0:v:0', '0:a?'], {'v': 'libx264', 'a': 'copy'},
+                           ['-vf', video_filter, *self._video_options()])
+        return self.ffmpeg.run_command(command)
+    
     def change_md5(self, input_path: str) -> Optional[str]:
         """Thay đổi MD5 để tránh duplicate detection"""
         try:
@@ -219,12 +485,11 @@ class VideoProcessor:
             output_filename = f"{base_name}_md5_changed.mp4"
             output_path = os.path.join(self.output_path, output_filename)
             
-            # Tạo metadata ngẫu nhiên
-            random_title = ''.join(random.choices(string.ascii_letters + string.digits, k=10))
-            random_artist = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
-            
-            # Lệnh FFmpeg
-            command = f'''ffmpeg -i "{input_path}" -c copy -metadata title="{random_title}" -metadata artist="{random_artist}" -metadata comment="Processed by TikTok Reup Offline" "{output_path}"'''
+            # Lệnh FFmpeg với metadata ngẫu nhiên
+            command = FFmpegCommand()
+            command.add_input(input_path)
+            command.add_output(output_path, codecs={'': 'copy'},
+                               metadata=PipelineCompiler._build_random_metadata())
             
             if self.ffmpeg.run_command(command):
                 Logger.log_info(f"Thay đổi MD5 thành công: {output_path}")
@@ -240,21 +505,18 @@ class VideoProcessor:
     def apply_template(self, input_path: str, template_name: str) -> Optional[str]:
         """Áp dụng template xử lý"""
         try:
-            if template_name not in self.templates.get('video_templates', {}):
+            template = self.compiled_templates.get(template_name)
+            if template is None:
                 Logger.log_error(f"Template không tồn tại: {template_name}")
                 return None
             
-            template = self.templates['video_templates'][template_name]
-            command = template['ffmpeg_command']
-            
-            # Thay thế placeholders
-            command = command.replace('{input}', input_path)
-            
             # Tạo tên file output
             base_name = os.path.splitext(os.path.basename(input_path))[0]
             output_filename = f"{base_name}_{template_name}.mp4"
             output_path = os.path.join(self.output_path, output_filename)
-            command = command.replace('{output}', output_path)
+            
+            # Chỉ điền đường dẫn vào các token có placeholder
+            command = template.render(input_path, output_path)
             
             if self.ffmpeg.run_command(command):
                 Logger.log_info(f"Áp dụng template thành công: {output_path}")
@@ -267,39 +529,186 @@ class VideoProcessor:
             Logger.log_error(f"Lỗi áp dụng template: {e}")
             return None
     
-    def batch_process(self, input_files: List[str], operations: List[Dict[str, Any]]) -> List[str]:
-        """Xử lý hàng loạt"""
+    def process_pipeline(self, input_path: str, operations: List[Dict[str, Any]],
+                         threads: int = 0,
+                         progress_callback: Callable[[Dict[str, Any]], None] = None,
+                         cancel_event: threading.Event = None,
+                         use_cache: bool = True) -> Optional[str]:
+        """Xử lý toàn bộ chuỗi thao tác trong một lần chạy FFmpeg
+        
+        `progress_callback` nhận tiến trình (percent, fps, speed, eta) trong lúc
+        chạy, `cancel_event` dùng để hủy giữa chừng. Nếu cùng input, cùng chuỗi
+        thao tác và cùng phiên bản FFmpeg đã được xử lý, file cũ được dùng lại.
+        """
         try:
-            results = []
+            if not os.path.exists(input_path):
+                Logger.log_error(f"File không tồn tại: {input_path}")
+                return None
+            
+            if not operations:
+                return input_path
+            
+            # Tạo tên file output
+            base_name = os.path.splitext(os.path.basename(input_path))[0]
+            output_filename = f"{base_name}_processed.mp4"
+            output_path = os.path.join(self.output_path, output_filename)
             
-            for input_file in input_files:
-                current_file = input_file
+            # Bỏ thao tác thừa, sắp xếp lại để filter đắt chạy trên ít pixel hơn
+            media_info = self.probe(input_path)
+            operations = self.planner.plan(self._prepare_music(operations), media_info)
+            if not operations:
+                Logger.log_info(f"Không có thao tác nào cần xử lý: {input_path}")
+                return input_path
+            
+            cache_key = None
+            if use_cache and self.render_cache is not None:
+                cache_key = self.render_cache.make_key(input_path, operations,
+                                                       self.ffmpeg.get_version(),
+                                                       self._render_settings())
+                cached_path = self.render_cache.get(cache_key) if cache_key else None
+                if cached_path:
+                    return self._reuse_render(cache_key, cached_path, operations, output_path)
+            
+            # Chỉ mục keyframe chỉ cần khi có thao tác cắt
+            keyframe_index = None
+            if any(op.get('type') == 'cut' for op in operations):
+                keyframe_index = self.ffmpeg.get_keyframe_index(input_path)
+            compiler = PipelineCompiler(self.config, self._get_font_path(), self.watermark_renderer)
+            command = compiler.compile(input_path, operations, output_path, media_info,
+                                       threads, keyframe_index)
+            
+            if self.ffmpeg.run_command(command, progress_callback=progress_callback,
+                                       cancel_event=cancel_event, duration=compiler.output_duration):
+                Logger.log_info(f"Xử lý pipeline thành công: {output_path}")
+                if cache_key:
+                    self.render_cache.put(cache_key, output_path)
+                return output_path
+            else:
+                Logger.log_error("Lỗi xử lý pipeline")
+                return None
                 
-                for operation in operations:
-                    op_type = operation.get('type')
-                    op_params = operation.get('params', {})
-                    
-                    if op_type == 'cut':
-                        current_file = self.cut_video(current_file, **op_params)
-                    elif op_type == 'watermark':
-                        current_file = self.add_watermark(current_file, **op_params)
-                    elif op_type == 'music':
-                        current_file = self.add_music(current_file, **op_params)
-                    elif op_type == 'speed':
-                        current_file = self.change_speed(current_file, **op_params)
-                    elif op_type == 'flip':
-                        current_file = self.flip_video(current_file, **op_params)
-                    elif op_type == '9_16':
-                        current_file = self.convert_to_9_16(current_file)
-                    elif op_type == 'md5':
-                        current_file = self.change_md5(current_file)
-                    
-                    if not current_file:
-                        Logger.log_error(f"Lỗi xử lý file: {input_file}")
-                        break
+        except Exception as e:
+            Logger.log_error(f"Lỗi xử lý pipeline: {e}")
+            return None
+    
+    def render_variants(self, input_path: str, variants: List[str] = None,
+                        operations: List[Dict[str, Any]] = None, threads: int = 0,
+                        progress_callback: Callable[[Dict[str, Any]], None] = None,
+                        cancel_event: threading.Event = None) -> Dict[str, str]:
+        """Xuất nhiều biến thể (9_16, 16_9, source, thumbnail) từ một lần giải mã
+        
+        `operations` (cắt, watermark, tốc độ, ...) áp dụng chung cho mọi biến thể.
+        Trả về {tên biến thể: đường dẫn output}, rỗng nếu lỗi.
+        """
+        try:
+            if not os.path.exists(input_path):
+                Logger.log_error(f"File không tồn tại: {input_path}")
+                return {}
+            
+            variants = variants or ['9_16', '16_9', 'thumbnail']
+            base_name = os.path.splitext(os.path.basename(input_path))[0]
+            outputs = {
+                name: os.path.join(self.output_path,
+                                   f"{base_name}_thumb.jpg" if name == 'thumbnail' else f"{base_name}_{name}.mp4")
+                for name in variants if name in VARIANT_FILTERS
+            }
+            media_info = self.probe(input_path)
+            operations = self.planner.plan(self._prepare_music(operations or []), media_info)
+            keyframe_index = None
+            if any(op.get('type') == 'cut' for op in operations):
+                keyframe_index = self.ffmpeg.get_keyframe_index(input_path)
+            compiler = PipelineCompiler(self.config, self._get_font_path(), self.watermark_renderer)
+            command = compiler.compile_variants(input_path, operations, outputs, media_info,
+                                                threads, keyframe_index)
+            
+            if self.ffmpeg.run_command(command, progress_callback=progress_callback,
+                                       cancel_event=cancel_event, duration=compiler.output_duration):
+                Logger.log_info(f"Xuất {len(outputs)} biến thể thành công: {input_path}")
+                return outputs
+            else:
+                Logger.log_error("Lỗi xuất biến thể")
+                return {}
                 
-                if current_file:
-                    results.append(current_file)
+        except Exception as e:
+            Logger.log_error(f"Lỗi xuất biến thể: {e}")
+            return {}
+    
+    def _prepare_music(self, operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Thay nhạc nền bằng bản đã chuẩn hóa; không chỉ định bài thì chọn ngẫu nhiên từ thư viện"""
+        prepared = []
+        for operation in operations:
+            if operation.get('type') == 'music':
+                params = dict(operation.get('params', {}))
+                music_path = params.get('music_path')
+                if not music_path or music_path == 'random':
+                    track = self.music_library.random_track()
+                    if track is None:
+                        raise ValueError("Thư viện nhạc trống")
+                    params['music_path'] = track['normalized_path']
+                else:
+                    params['music_path'] = self.music_library.resolve(music_path)
+                operation = {**operation, 'params': params}
+            prepared.append(operation)
+        return prepared
+    
+    def _render_settings(self) -> Dict[str, Any]:
+        """Cấu hình ảnh hưởng tới output nhưng không nằm trong tham số thao tác"""
+        return {
+            'watermark': self.config.get('processing.watermark', {}),
+            'font': self._get_font_path(),
+            'vertical_mode': self.config.get('processing.vertical_mode', 'pad'),
+            'encoding_profile': self.config.get('processing.encoding_profile')
+        }
+    
+    def _reuse_render(self, cache_key: str, cached_path: str,
+                      operations: List[Dict[str, Any]], output_path: str) -> Optional[str]:
+        """Dùng lại file đã xử lý; thao tác không cache (md5) được áp dụng lại bằng remux"""
+        if not any(op.get('type') in UNCACHED_OPERATIONS for op in operations):
+            Logger.log_info(f"Dùng lại kết quả đã xử lý: {cached_path}")
+            return cached_path
+        
+        # Metadata ngẫu nhiên mới: chỉ copy stream, không mã hóa lại
+        same_file = os.path.abspath(cached_path) == os.path.abspath(output_path)
+        target_path = output_path + '.tmp.mp4' if same_file else output_path
+        command = FFmpegCommand()
+        command.add_input(cached_path)
+        command.add_output(target_path, ['0'], {'': 'copy'},
+                           metadata=PipelineCompiler._build_random_metadata())
+        if not self.ffmpeg.run_command(command):
+            Logger.log_error("Lỗi áp dụng lại metadata cho kết quả đã xử lý")
+            return None
+        if same_file:
+            # File được ghi nhớ vừa bị thay thế: cập nhật lại kích thước/mtime
+            os.replace(target_path, output_path)
+            self.render_cache.put(cache_key, output_path)
+        Logger.log_info(f"Dùng lại kết quả đã xử lý (đổi metadata): {output_path}")
+        return output_path
+    
+    def batch_process(self, input_files: List[str], operations: List[Dict[str, Any]],
+                      parallel: bool = None, on_result: Callable[[Dict[str, Any]], None] = None) -> List[str]:
+        """Xử lý hàng loạt
+        
+        `parallel` (mặc định theo `processing.parallel_batch`) chạy nhiều file cùng
+        lúc trên process pool. `on_result` được gọi với kết quả từng file
+        ({ 'input', 'output', 'error' }) ngay khi file đó xong.
+        """
+        try:
+            results = []
+            if parallel is None:
+                parallel = self.config.get('processing.parallel_batch', False)
+            
+            if parallel:
+                file_results = BatchExecutor(self.config).run(input_files, operations)
+            else:
+                file_results = self._iter_batch_sequential(input_files, operations)
+            
+            for file_result in file_results:
+                if file_result['output']:
+                    results.append(file_result['output'])
+                else:
+                    Logger.log_error(f"Lỗi xử lý file: {file_result['input']} ({file_result['error']})")
+                if on_result:
+                    on_result(file_result)
             
             Logger.log_info(f"Xử lý hàng loạt hoàn thành: {len(results)}/{len(input_files)} file")
             return results
@@ -308,8 +717,27 @@ class VideoProcessor:
             Logger.log_error(f"Lỗi xử lý hàng loạt: {e}")
             return []
     
+    def _iter_batch_sequential(self, input_files: List[str],
+                               operations: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Xử lý lần lượt từng file trong thread hiện tại"""
+        for input_file in input_files:
+            # Toàn bộ chuỗi thao tác chạy trong một lệnh FFmpeg
+            output_file = self.process_pipeline(input_file, operations)
+            yield {
+                'input': input_file,
+                'output': output_file,
+                'error': None if output_file else 'Lỗi xử lý file'
+            }
+    
     def _get_font_path(self) -> str:
-        """Lấy đường dẫn font"""
+        """Lấy đường dẫn font (chỉ dò một lần)"""
+        if self._font_path is None:
+            self._font_path = self._find_font_path()
+        return self._font_path
+    
+    @staticmethod
+    def _find_font_path() -> str:
+        """Dò font có sẵn trên máy"""
         font_paths = [
             'data/fonts/arial.ttf',
             'data/fonts/segoeui.ttf',
@@ -323,12 +751,25 @@ class VideoProcessor:
         
         return 'arial'  # Fallback to system font
     
+    def probe(self, video_path: str) -> Optional[MediaInfo]:
+        """Lấy thông tin media có kiểu (codec, bitrate, rotation, audio, ...)"""
+        return self.ffmpeg.probe(video_path)
+    
+    def get_keyframe_index(self, video_path: str) -> Optional[KeyframeIndex]:
+        """Lấy chỉ mục keyframe (cache theo file)"""
+        return self.ffmpeg.get_keyframe_index(video_path)
+    
     def get_video_info(self, video_path: str) -> Dict[str, Any]:
         """Lấy thông tin video"""
         return self.ffmpeg.get_video_info(video_path)
     
-    def create_thumbnail(self, video_path: str, time_offset: int = 5) -> Optional[str]:
-        """Tạo thumbnail"""
+    def create_thumbnail(self, video_path: str, time_offset: int = 5,
+                         smart: bool = None) -> Optional[str]:
+        """Tạo thumbnail
+        
+        `smart` (mặc định theo `processing.smart_thumbnail`) chọn frame rõ nét,
+        đủ sáng nhất trong các frame mẫu thay vì lấy cố định tại `time_offset`.
+        """
         try:
             if not os.path.exists(video_path):
                 return None
@@ -337,10 +778,21 @@ class VideoProcessor:
             base_name = os.path.splitext(os.path.basename(video_path))[0]
             thumbnail_path = os.path.join(self.output_path, f"{base_name}_thumb.jpg")
             
-            # Lệnh FFmpeg
-            command = f'ffmpeg -i "{video_path}" -ss {time_offset} -vframes 1 "{thumbnail_path}"'
-            
-            if self.ffmpeg.run_command(command):
+            if smart is None:
+                smart = self.config.get('processing.smart_thumbnail', False)
+            seek_time = None
+            if smart:
+                # Frame mẫu đã nằm đúng keyframe nên seek thẳng tới đó
+                seek_time = self.thumbnail_engine.best_time(
+                    video_path, self.config.get('processing.thumbnail_samples', 24))
+            if seek_time is None:
+                # Seek phía input tới keyframe gần nhất: không phải giải mã từ đầu file
+                index = self.ffmpeg.get_keyframe_index(video_path)
+                seek_time = index.nearest(time_offset) if index else None
+            if seek_time is None:
+                seek_time = time_offset
+            
+            if self.thumbnail_engine.extract(video_path, [seek_time], [thumbnail_path]):
                 return thumbnail_path
             else:
                 return None
@@ -348,3 +800,32 @@ class VideoProcessor:
         except Exception as e:
             Logger.log_error(f"Lỗi tạo thumbnail: {e}")
             return None
+    
+    def create_thumbnails(self, video_path: str, count: int = 5) -> List[str]:
+        """Tạo nhiều thumbnail rải đều trong video bằng một lần chạy FFmpeg"""
+        try:
+            if not os.path.exists(video_path):
+                return []
+            return self.thumbnail_engine.thumbnails(video_path, count)
+        except Exception as e:
+            Logger.log_error(f"Lỗi tạo thumbnail: {e}")
+            return []
+    
+    def create_thumbnail_sheet(self, video_path: str, count: int = 16, columns: int = 4,
+                               contact: bool = True) -> Optional[str]:
+        """Tạo contact sheet (có lề) hoặc sprite sheet (ô sát nhau) của video"""
+        try:
+            if not os.path.exists(video_path):
+                return None
+            return self.thumbnail_engine.sheet(video_path, count, columns, spacing=4 if contact else 0)
+        except Exception as e:
+            Logger.log_error(f"Lỗi tạo contact sheet: {e}")
+            return None
+    
+    def create_folder_thumbnails(self, folder: str, mode: str = 'thumbnails', **kwargs) -> Dict[str, Any]:
+        """Tạo thumbnail/sprite/contact sheet cho cả thư mục video (song song)"""
+        try:
+            return self.thumbnail_engine.process_folder(folder, mode, **kwargs)
+        except Exception as e:
+            Logger.log_error(f"Lỗi tạo thumbnail cho thư mục: {e}")
+            return {}
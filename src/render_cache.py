@@ -0,0 +1,157 @@
+"""
+Cache kết quả xử lý theo nội dung (input, chuỗi thao tác, phiên bản FFmpeg)
+"""
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import logging
+from typing import Any, Dict, List, Optional
+from .media_cache import MediaCache
+from .hashing import FileHasher
+
+# Thao tác không đưa vào khóa cache (được áp dụng lại mỗi lần vì cho kết quả ngẫu nhiên)
+UNCACHED_OPERATIONS = ('md5',)
+
+class RenderCache:
+    """Ghi nhớ file đã xử lý trong data/processed để chạy lại không phải mã hóa lại
+
+    Khóa = sha256(hash nội dung input, chuỗi thao tác đã chuẩn hóa, cấu hình
+    ảnh hưởng tới output, phiên bản FFmpeg). Bản ghi chỉ còn hợp lệ khi file
+    output vẫn giữ nguyên kích thước và mtime. Tổng dung lượng các file được
+    ghi nhớ bị giới hạn, file dùng lâu nhất bị xóa trước (LRU).
+    """
+
+    def __init__(self, db_path: str = "data/cache/render_cache.db", max_bytes: int = 0,
+                 hasher: Optional[FileHasher] = None):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hasher = hasher or FileHasher()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._init_schema()
+
+    def _init_schema(self):
+        """Tạo bảng nếu chưa có"""
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS renders (
+                    key TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+
+    def content_hash(self, file_path: str) -> Optional[str]:
+        """Hash nội dung input (hash nhanh, chỉ tính lại khi file thay đổi)"""
+        return self.hasher.hash_file(file_path, 'fast') or None
+
+    @staticmethod
+    def normalize_operations(operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Chuẩn hóa chuỗi thao tác: bỏ thao tác không cache, số về float"""
+        normalized = []
+        for operation in operations:
+            op_type = operation.get('type')
+            if op_type in UNCACHED_OPERATIONS:
+                continue
+            params = {
+                name: float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else value
+                for name, value in operation.get('params', {}).items()
+            }
+            normalized.append({'type': op_type, 'params': params})
+        return normalized
+
+    def make_key(self, input_path: str, operations: List[Dict[str, Any]],
+                 ffmpeg_version: str, settings: Dict[str, Any] = None) -> Optional[str]:
+        """Tạo khóa cache, None nếu không đọc được input"""
+        digest = self.content_hash(input_path)
+        if digest is None:
+            return None
+        payload = json.dumps({
+            'input': digest,
+            'operations': self.normalize_operations(operations),
+            'settings': settings or {},
+            'ffmpeg': ffmpeg_version
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Lấy file output đã có, None nếu chưa có hoặc file đã bị thay đổi/xóa"""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT path, size, mtime_ns FROM renders WHERE key = ?", (key,)
+                ).fetchone()
+            if row is None:
+                return None
+            path, size, mtime_ns = row
+            if MediaCache.file_key(path) != (path, size, mtime_ns):
+                with self._lock, self._conn:
+                    self._conn.execute("DELETE FROM renders WHERE key = ?", (key,))
+                return None
+            with self._lock, self._conn:
+                self._conn.execute("UPDATE renders SET last_used = ? WHERE key = ?", (time.time(), key))
+            return path
+        except Exception as e:
+            logging.error(f"Lỗi đọc render cache: {e}")
+            return None
+
+    def put(self, key: str, output_path: str):
+        """Ghi nhớ file output rồi dọn bớt nếu vượt giới hạn dung lượng"""
+        file_key = MediaCache.file_key(output_path)
+        if file_key is None:
+            return
+        try:
+            with self._lock, self._conn:
+                # Một đường dẫn chỉ ứng với một khóa: file cũ đã bị ghi đè
+                self._conn.execute("DELETE FROM renders WHERE path = ?", (file_key[0],))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO renders (key, path, size, mtime_ns, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (key, *file_key, time.time())
+                )
+            # File vừa ghi là kết quả người gọi sắp dùng: không xóa dù một mình nó vượt giới hạn
+            self.evict(keep=key)
+        except Exception as e:
+            logging.error(f"Lỗi ghi render cache: {e}")
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Xóa các file dùng lâu nhất cho tới khi tổng dung lượng <= max_bytes
+
+        Bản ghi của khóa `keep` luôn được giữ (vẫn tính vào tổng dung lượng).
+        """
+        if self.max_bytes <= 0:
+            return 0
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, path, size FROM renders ORDER BY last_used DESC"
+            ).fetchall()
+        total = 0
+        evicted = []
+        for key, path, size in rows:
+            total += size
+            if total > self.max_bytes and key != keep:
+                evicted.append((key, path))
+        for key, path in evicted:
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                logging.warning(f"Không xóa được file cache {path}: {e}")
+        if evicted:
+            with self._lock, self._conn:
+                self._conn.executemany("DELETE FROM renders WHERE key = ?", [(key,) for key, _ in evicted])
+            logging.info(f"Render cache: xóa {len(evicted)} file cũ")
+        return len(evicted)
+
+    def close(self):
+        """Đóng kết nối"""
+        with self._lock:
+            self._conn.close()
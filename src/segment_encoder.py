@@ -0,0 +1,83 @@
+"""
+Mã hóa song song theo từng đoạn cho video dài
+"""
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from .utils import FFmpegManager, Logger
+from .ffmpeg_command import FFmpegCommand
+from .probe import MediaInfo
+from .batch_executor import MIN_THREADS_PER_JOB, plan_thread_budget
+
+class SegmentEncoder:
+    """Chia video tại keyframe thành K đoạn, mã hóa đồng thời rồi nối bằng concat demuxer
+
+    Mỗi đoạn là một process FFmpeg riêng với cùng filter graph, nên một bản
+    mã hóa dài tận dụng được toàn bộ core thay vì nghẽn ở một process.
+    """
+
+    def __init__(self, ffmpeg: FFmpegManager, temp_root: str, cpu_count: int = None,
+                 min_segment_duration: float = 60):
+        self.ffmpeg = ffmpeg
+        self.temp_root = temp_root
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+        self.min_segment_duration = min_segment_duration
+
+    def plan_segments(self, info: Optional[MediaInfo]) -> int:
+        """Số đoạn nên chia (1 nghĩa là không nên chia)"""
+        if not info or not info.has_video or not info.duration:
+            return 1
+        by_cores = max(1, self.cpu_count // MIN_THREADS_PER_JOB)
+        by_duration = int(info.duration // self.min_segment_duration)
+        return max(1, min(by_cores, by_duration))
+
+    def encode(self, input_path: str, video_filter: str, output_path: str,
+               segments: int = None, video_options: List[str] = None) -> bool:
+        """Mã hóa `input_path` với `video_filter` theo từng đoạn song song
+
+        Audio không qua filter nên được copy thẳng từ file gốc khi nối.
+        `video_options` (preset/CRF của profile) áp dụng cho mọi đoạn.
+        """
+        info = self.ffmpeg.probe(input_path)
+        index = self.ffmpeg.get_keyframe_index(input_path)
+        if not info or not index:
+            Logger.log_error("Không đọc được thông tin/keyframe để chia đoạn")
+            return False
+
+        count = segments or self.plan_segments(info)
+        boundaries = [0.0] + index.split_points(count, info.duration) + [info.duration]
+        _, threads = plan_thread_budget(len(boundaries) - 1, self.cpu_count)
+        Logger.log_info(f"Mã hóa song song {len(boundaries) - 1} đoạn x {threads} thread: {input_path}")
+
+        temp_dir = tempfile.mkdtemp(prefix='.segments_', dir=self.temp_root)
+        try:
+            segment_paths = []
+            commands = []
+            for i, (start, end) in enumerate(zip(boundaries, boundaries[1:])):
+                segment_path = os.path.join(temp_dir, f'segment_{i:03d}.mp4')
+                segment_paths.append(segment_path)
+                # Điểm đầu là keyframe nên seek phía input vừa nhanh vừa chính xác
+                command = FFmpegCommand()
+                command.add_input(input_path, '-ss', str(start), '-t', str(end - start))
+                command.add_output(segment_path, ['0:v:0'], {'v': 'libx264'},
+                                   ['-an', '-vf', video_filter, '-threads', str(threads),
+                                    *(video_options or [])])
+                commands.append(command)
+
+            with ThreadPoolExecutor(max_workers=len(commands)) as executor:
+                results = list(executor.map(self.ffmpeg.run_command, commands))
+            if not all(results):
+                Logger.log_error("Lỗi mã hóa một hoặc nhiều đoạn")
+                return False
+
+            list_path = os.path.join(temp_dir, 'segments.txt')
+            FFmpegManager.write_concat_list(list_path, segment_paths)
+            join_command = FFmpegCommand()
+            join_command.add_input(list_path, '-f', 'concat', '-safe', '0')
+            join_command.add_input(input_path)
+            join_command.add_output(output_path, ['0:v:0', '1:a?'], {'': 'copy'})
+            return self.ffmpeg.run_command(join_command)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
@@ -0,0 +1,169 @@
+"""
+Tạo thumbnail, sprite sheet và contact sheet (mỗi video một process FFmpeg)
+"""
+import os
+import math
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from .utils import FFmpegManager
+from .ffmpeg_command import FFmpegCommand
+from .frame_scoring import SAMPLE_WIDTH, SAMPLE_HEIGHT, score_frames, frames_from_raw, to_records
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.wmv', '.webm', '.flv')
+
+class ThumbnailEngine:
+    """Trích nhiều frame của một video trong một lần chạy FFmpeg
+
+    Mỗi thời điểm là một input riêng với `-ss` phía input, đặt đúng keyframe
+    theo chỉ mục keyframe: FFmpeg chỉ giải mã một frame ở mỗi vị trí thay vì
+    giải mã từ đầu file. Cả thư mục được xử lý song song nhiều video.
+    """
+
+    def __init__(self, ffmpeg: FFmpegManager, output_dir: str, max_workers: int = None):
+        self.ffmpeg = ffmpeg
+        self.output_dir = output_dir
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 1) // 2)
+
+    def plan_times(self, video_path: str, count: int) -> List[float]:
+        """Các thời điểm chia đều trong video (bỏ phần đầu/cuối), đặt tại keyframe gần nhất"""
+        info = self.ffmpeg.probe(video_path)
+        duration = info.duration if info and info.duration else 0
+        if duration <= 0:
+            return [0.0]
+        step = duration / (count + 1)
+        times = [step * (i + 1) for i in range(count)]
+
+        index = self.ffmpeg.get_keyframe_index(video_path)
+        if index:
+            times = [index.nearest(time) for time in times]
+        # Bỏ trùng khi GOP dài hơn khoảng cách giữa các thời điểm
+        return sorted(set(time for time in times if time is not None))
+
+    @staticmethod
+    def _add_seek_inputs(command: FFmpegCommand, video_path: str, times: List[float]):
+        """Mỗi thời điểm một input, seek phía input, chỉ cần 1 frame"""
+        for time in times:
+            command.add_input(video_path, '-ss', f'{time:.3f}', '-t', '1')
+
+    def extract(self, video_path: str, times: List[float], output_paths: List[str],
+                width: int = 0) -> bool:
+        """Ghi frame tại từng thời điểm ra từng file ảnh, trong một process"""
+        command = FFmpegCommand()
+        self._add_seek_inputs(command, video_path, times)
+        for i, output_path in enumerate(output_paths):
+            options = ['-frames:v', '1']
+            if width:
+                options += ['-vf', f'scale={width}:-2']
+            command.add_output(output_path, [f'{i}:v:0'], options=options)
+        return self.ffmpeg.run_command(command)
+
+    def thumbnails(self, video_path: str, count: int = 5, width: int = 0) -> List[str]:
+        """Tạo `count` thumbnail rải đều trong video"""
+        base_name = os.path.splitext(os.path.basename(video_path))[0]
+        times = self.plan_times(video_path, count)
+        output_paths = [os.path.join(self.output_dir, f"{base_name}_thumb_{i + 1:02d}.jpg")
+                        for i in range(len(times))]
+        return output_paths if self.extract(video_path, times, output_paths, width) else []
+
+    def sheet(self, video_path: str, count: int = 16, columns: int = 4,
+              tile_width: int = 320, tile_height: int = 180,
+              spacing: int = 0, output_path: str = None) -> Optional[str]:
+        """Ghép các frame thành một ảnh lưới
+
+        `spacing` = 0 cho sprite sheet (ô sát nhau, dùng cho preview khi tua),
+        `spacing` > 0 cho contact sheet (có lề giữa các ô).
+        """
+        times = self.plan_times(video_path, count)
+        if not output_path:
+            base_name = os.path.splitext(os.path.basename(video_path))[0]
+            suffix = 'contact' if spacing else 'sprite'
+            output_path = os.path.join(self.output_dir, f"{base_name}_{suffix}.jpg")
+
+        columns = max(1, min(columns, len(times)))
+        rows = math.ceil(len(times) / columns)
+
+        command = FFmpegCommand()
+        self._add_seek_inputs(command, video_path, times)
+        tiles = ''
+        for i in range(len(times)):
+            command.add_filter(
+                f"[{i}:v]trim=end_frame=1,setpts=PTS-STARTPTS,"
+                f"scale={tile_width}:{tile_height}:force_original_aspect_ratio=decrease,"
+                f"pad={tile_width}:{tile_height}:(ow-iw)/2:(oh-ih)/2:black,setsar=1[t{i}]"
+            )
+            tiles += f'[t{i}]'
+        command.add_filter(
+            f"{tiles}concat=n={len(times)}:v=1:a=0,"
+            f"tile={columns}x{rows}:margin={spacing}:padding={spacing}:color=white[vout]"
+        )
+        command.add_output(output_path, ['[vout]'], options=['-frames:v', '1'])
+        return output_path if self.ffmpeg.run_command(command) else None
+
+    def score_samples(self, video_path: str, samples: int = 24) -> List[Dict[str, float]]:
+        """Chấm điểm các frame mẫu rải đều trong video (kết quả được cache theo file)
+
+        Các frame được giải mã ở độ phân giải thấp, grayscale, đưa qua pipe
+        dạng rawvideo vào NumPy trong một lần chạy FFmpeg.
+        """
+        media_cache = self.ffmpeg.media_cache
+        if media_cache is not None:
+            cached = media_cache.get_frame_scores(video_path, samples)
+            if cached is not None:
+                return cached
+
+        times = self.plan_times(video_path, samples)
+        command = FFmpegCommand()
+        self._add_seek_inputs(command, video_path, times)
+        tiles = ''
+        for i in range(len(times)):
+            command.add_filter(f"[{i}:v]trim=end_frame=1,setpts=PTS-STARTPTS,"
+                               f"scale={SAMPLE_WIDTH}:{SAMPLE_HEIGHT},format=gray[s{i}]")
+            tiles += f'[s{i}]'
+        command.add_filter(f"{tiles}concat=n={len(times)}:v=1:a=0[vout]")
+        command.add_output('pipe:1', ['[vout]'], options=['-f', 'rawvideo', '-pix_fmt', 'gray'])
+
+        data = self.ffmpeg.run_pipe(command)
+        if not data:
+            return []
+        frames = frames_from_raw(data)
+        if len(frames) != len(times):
+            logging.warning(f"Số frame mẫu không khớp ({len(frames)}/{len(times)}): {video_path}")
+            return []
+
+        records = to_records(times, score_frames(frames))
+        if media_cache is not None:
+            media_cache.put_frame_scores(video_path, samples, records)
+        return records
+
+    def best_time(self, video_path: str, samples: int = 24) -> Optional[float]:
+        """Thời điểm có frame điểm cao nhất (None nếu không chấm được)"""
+        records = self.score_samples(video_path, samples)
+        if not records:
+            return None
+        return max(records, key=lambda record: record['score'])['time']
+
+    def process_folder(self, folder: str, mode: str = 'thumbnails',
+                       **kwargs) -> Dict[str, object]:
+        """Tạo thumbnail/sheet cho mọi video trong thư mục, nhiều video song song
+
+        `mode`: 'thumbnails', 'sprite' hoặc 'contact'. Trả về {video: kết quả}.
+        """
+        videos = [os.path.join(folder, name) for name in sorted(os.listdir(folder))
+                  if name.lower().endswith(VIDEO_EXTENSIONS)]
+        if mode == 'thumbnails':
+            worker = lambda path: self.thumbnails(path, **kwargs)
+        elif mode == 'sprite':
+            worker = lambda path: self.sheet(path, spacing=0, **kwargs)
+        elif mode == 'contact':
+            kwargs.setdefault('spacing', 4)
+            worker = lambda path: self.sheet(path, **kwargs)
+        else:
+            raise ValueError(f"Chế độ thumbnail không hợp lệ: {mode}")
+
+        if not videos:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(videos))) as executor:
+            results = dict(zip(videos, executor.map(worker, videos)))
+        logging.info(f"Tạo thumbnail: {sum(1 for r in results.values() if r)}/{len(videos)} video")
+        return results
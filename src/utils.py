@@ -3,11 +3,25 @@ Utilities cho TikTok Reup Offline
 """
 import os
 import json
-import hashlib
 import subprocess
 import logging
+import threading
+import time
+from array import array
+from collections import deque
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, List, Optional, Union
+from .probe import MediaInfo, parse_ffprobe_output
+from .media_cache import MediaCache
+from .hashing import FileHasher
+from .keyframe_index import KeyframeIndex
+from .ffmpeg_command import FFmpegCommand
+
+# Số dòng stderr cuối của FFmpeg được giữ lại để log khi lỗi
+STDERR_TAIL_LINES = 200
+# Timeout FFmpeg: tối thiểu 5 phút, cộng thêm theo độ dài input
+FFMPEG_MIN_TIMEOUT = 300
+FFMPEG_TIMEOUT_PER_SECOND = 10
 
 class ConfigManager:
     """Quản lý cấu hình ứng dụng"""
@@ -83,17 +97,13 @@ class FileManager:
         Path(path).mkdir(parents=True, exist_ok=True)
     
     @staticmethod
-    def get_file_hash(file_path: str) -> str:
-        """Tính hash MD5 của file"""
-        hash_md5 = hashlib.md5()
-        try:
-            with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_md5.update(chunk)
-            return hash_md5.hexdigest()
-        except Exception as e:
-            logging.error(f"Lỗi tính hash file {file_path}: {e}")
-            return ""
+    def get_file_hash(file_path: str, algorithm: str = 'md5',
+                      media_cache: Optional[MediaCache] = None) -> str:
+        """Tính hash của file (mặc định MD5, 'fast' cho hash không mật mã)
+        
+        Truyền `media_cache` để lưu/dùng lại kết quả khi file chưa thay đổi.
+        """
+        return FileHasher(media_cache).hash_file(file_path, algorithm)
     
     @staticmethod
     def get_file_size(file_path: str) -> int:
@@ -114,8 +124,17 @@ class FileManager:
 class FFmpegManager:
     """Quản lý FFmpeg"""
     
-    def __init__(self, ffmpeg_path: str = "tools/ffmpeg.exe"):
+    def __init__(self, ffmpeg_path: str = "tools/ffmpeg.exe", ffprobe_path: str = None,
+                 media_cache: Optional[MediaCache] = None):
         self.ffmpeg_path = ffmpeg_path
+        self.ffprobe_path = ffprobe_path or self._get_ffprobe_path(ffmpeg_path)
+        self.media_cache = media_cache
+    
+    @staticmethod
+    def _get_ffprobe_path(ffmpeg_path: str) -> str:
+        """Suy ra đường dẫn ffprobe nằm cạnh ffmpeg"""
+        directory, filename = os.path.split(ffmpeg_path)
+        return os.path.join(directory, filename.replace('ffmpeg', 'ffprobe'))
     
     def is_available(self) -> bool:
         """Kiểm tra FFmpeg có sẵn không"""
@@ -125,89 +144,287 @@ class FFmpegManager:
             return result.returncode == 0
         except Exception:
             return False
+
+    def get_version(self) -> str:
+        """Dòng phiên bản của FFmpeg (chỉ chạy `-version` một lần)"""
+        if getattr(self, '_version', None) is None:
+            try:
+                result = subprocess.run([self.ffmpeg_path, '-version'],
+                                        capture_output=True, text=True, timeout=10)
+                lines = result.stdout.splitlines()
+                self._version = lines[0].strip() if lines else ''
+            except Exception:
+                self._version = ''
+        return self._version
     
-    def run_command(self, command: str, timeout: int = 300) -> bool:
-        """Chạy lệnh FFmpeg"""
+    def run_command(self, command: Union[FFmpegCommand, List[str]], timeout: float = None,
+                    progress_callback: Callable[[Dict[str, Any]], None] = None,
+                    cancel_event: threading.Event = None, duration: float = None) -> bool:
+        """Chạy lệnh FFmpeg (argv, không qua shell)
+        
+        Đọc `-progress pipe:1` theo thời gian thực và gọi `progress_callback` với
+        { 'out_time', 'percent', 'fps', 'speed', 'eta' }. Đặt `cancel_event` để dừng
+        giữa chừng. Chỉ giữ lại STDERR_TAIL_LINES dòng stderr cuối để log lỗi.
+        Nếu không truyền `timeout`, thời gian chờ tỷ lệ với độ dài input.
+        """
         try:
-            # Thay thế ffmpeg path trong command
-            if command.startswith('ffmpeg '):
-                command = command.replace('ffmpeg ', f'"{self.ffmpeg_path}" ', 1)
+            argv = command.to_argv() if isinstance(command, FFmpegCommand) else list(command)
+            # Thay thế ffmpeg path, bật progress qua stdout
+            if argv and argv[0] == 'ffmpeg':
+                argv = [self.ffmpeg_path, '-progress', 'pipe:1', '-nostats', *argv[1:]]
             
-            logging.info(f"Chạy lệnh FFmpeg: {command}")
-            result = subprocess.run(command, shell=True, capture_output=True, 
-                                  text=True, timeout=timeout)
+            if duration is None:
+                duration = self._guess_input_duration(argv)
+            if timeout is None:
+                timeout = max(FFMPEG_MIN_TIMEOUT, (duration or 0) * FFMPEG_TIMEOUT_PER_SECOND)
             
-            if result.returncode == 0:
+            logging.info(f"Chạy lệnh FFmpeg: {subprocess.list2cmdline(argv)}")
+            process = subprocess.Popen(argv, stdin=subprocess.PIPE,
+                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                       text=True, encoding='utf-8', errors='replace')
+            
+            stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+            stderr_thread = threading.Thread(target=self._read_stderr, args=(process, stderr_tail), daemon=True)
+            stdout_thread = threading.Thread(target=self._read_progress,
+                                             args=(process, duration, progress_callback), daemon=True)
+            stderr_thread.start()
+            stdout_thread.start()
+            
+            deadline = time.monotonic() + timeout
+            stopped_reason = None
+            while process.poll() is None:
+                if cancel_event is not None and cancel_event.is_set():
+                    stopped_reason = "FFmpeg đã bị hủy"
+                elif time.monotonic() > deadline:
+                    stopped_reason = "FFmpeg timeout"
+                if stopped_reason:
+                    self._stop_process(process)
+                    break
+                if cancel_event is not None:
+                    cancel_event.wait(0.2)
+                else:
+                    time.sleep(0.2)
+            
+            process.wait()
+            stdout_thread.join(timeout=5)
+            stderr_thread.join(timeout=5)
+            
+            if stopped_reason:
+                logging.error(stopped_reason)
+                return False
+            if process.returncode == 0:
                 logging.info("FFmpeg chạy thành công")
                 return True
             else:
-                logging.error(f"FFmpeg lỗi: {result.stderr}")
+                logging.error(f"FFmpeg lỗi: {''.join(stderr_tail)}")
                 return False
                 
-        except subprocess.TimeoutExpired:
-            logging.error("FFmpeg timeout")
-            return False
         except Exception as e:
             logging.error(f"Lỗi chạy FFmpeg: {e}")
             return False
     
-    def get_video_info(self, video_path: str) -> Dict[str, Any]:
-        """Lấy thông tin video"""
+    @staticmethod
+    def _read_stderr(process: subprocess.Popen, stderr_tail: deque):
+        """Đọc stderr, chỉ giữ lại các dòng cuối"""
+        for line in process.stderr:
+            stderr_tail.append(line)
+    
+    @staticmethod
+    def _read_progress(process: subprocess.Popen, duration: Optional[float],
+                       progress_callback: Optional[Callable[[Dict[str, Any]], None]]):
+        """Parse output của `-progress` (các dòng key=value, kết thúc block bằng progress=...)"""
+        block = {}
+        for line in process.stdout:
+            key, _, value = line.strip().partition('=')
+            if key != 'progress':
+                block[key] = value
+                continue
+            if progress_callback is not None:
+                try:
+                    progress_callback(FFmpegManager._parse_progress(block, duration, value == 'end'))
+                except Exception as e:
+                    logging.error(f"Lỗi progress callback: {e}")
+            block = {}
+    
+    @staticmethod
+    def _parse_progress(block: Dict[str, str], duration: Optional[float], finished: bool) -> Dict[str, Any]:
+        """Chuyển một block progress thành thông tin tiến trình"""
         try:
-            cmd = f'"{self.ffmpeg_path}" -i "{video_path}" -f null -'
-            result = subprocess.run(cmd, shell=True, capture_output=True, 
-                                  text=True, timeout=30)
-            
-            # Parse thông tin từ stderr
-            info = {
-                'duration': 0,
-                'width': 0,
-                'height': 0,
-                'fps': 0
-            }
+            out_time = int(block.get('out_time_us') or block.get('out_time_ms') or 0) / 1_000_000
+        except ValueError:
+            out_time = 0.0
+        try:
+            fps = float(block.get('fps') or 0)
+        except ValueError:
+            fps = 0.0
+        try:
+            speed = float((block.get('speed') or '0').rstrip('x') or 0)
+        except ValueError:
+            speed = 0.0
+        
+        percent = None
+        eta = None
+        if finished:
+            percent = 100.0
+            eta = 0.0
+        elif duration:
+            percent = max(0.0, min(100.0, out_time * 100.0 / duration))
+            if speed > 0:
+                eta = max(0.0, (duration - out_time) / speed)
+        return {'out_time': out_time, 'percent': percent, 'fps': fps, 'speed': speed, 'eta': eta}
+    
+    @staticmethod
+    def _stop_process(process: subprocess.Popen):
+        """Dừng FFmpeg: gửi 'q' để FFmpeg tự kết thúc, quá thời gian thì kill"""
+        try:
+            process.stdin.write('q')
+            process.stdin.flush()
+            process.wait(timeout=5)
+        except Exception:
+            process.kill()
+    
+    def run_capture(self, command: Union[FFmpegCommand, List[str]], timeout: float = None) -> Optional[str]:
+        """Chạy lệnh FFmpeg ngắn và trả về stderr (vd. kết quả phân tích của loudnorm)
+        
+        Trả về None nếu FFmpeg lỗi.
+        """
+        try:
+            argv = command.to_argv() if isinstance(command, FFmpegCommand) else list(command)
+            if argv and argv[0] == 'ffmpeg':
+                argv = [self.ffmpeg_path, '-hide_banner', '-nostats', *argv[1:]]
+            if timeout is None:
+                duration = self._guess_input_duration(argv)
+                timeout = max(FFMPEG_MIN_TIMEOUT, (duration or 0) * FFMPEG_TIMEOUT_PER_SECOND)
+            
+            result = subprocess.run(argv, capture_output=True, text=True, encoding='utf-8',
+                                    errors='replace', timeout=timeout)
+            if result.returncode != 0:
+                logging.error(f"FFmpeg lỗi: {result.stderr[-4000:]}")
+                return None
+            return result.stderr
+        except Exception as e:
+            logging.error(f"Lỗi chạy FFmpeg: {e}")
+            return None
+    
+    def run_pipe(self, command: Union[FFmpegCommand, List[str]], timeout: float = None) -> Optional[bytes]:
+        """Chạy lệnh FFmpeg ghi ra `pipe:1` và trả về dữ liệu stdout (vd. rawvideo)
+        
+        Trả về None nếu FFmpeg lỗi.
+        """
+        try:
+            argv = command.to_argv() if isinstance(command, FFmpegCommand) else list(command)
+            if argv and argv[0] == 'ffmpeg':
+                argv = [self.ffmpeg_path, '-hide_banner', '-nostats', '-loglevel', 'error', *argv[1:]]
+            if timeout is None:
+                timeout = FFMPEG_MIN_TIMEOUT
+            
+            result = subprocess.run(argv, capture_output=True, timeout=timeout)
+            if result.returncode != 0:
+                logging.error(f"FFmpeg lỗi: {result.stderr.decode('utf-8', 'replace')[-4000:]}")
+                return None
+            return result.stdout
+        except Exception as e:
+            logging.error(f"Lỗi chạy FFmpeg: {e}")
+            return None
+    
+    def _guess_input_duration(self, argv: List[str]) -> Optional[float]:
+        """Lấy độ dài input đầu tiên của lệnh (dùng probe cache nên gần như không tốn chi phí)"""
+        if '-i' not in argv[:-1]:
+            return None
+        input_path = argv[argv.index('-i') + 1]
+        if not os.path.isfile(input_path):
+            return None
+        info = self.probe(input_path)
+        return info.duration if info and info.duration else None
+    
+    @staticmethod
+    def write_concat_list(list_path: str, paths: List[str]):
+        """Ghi file danh sách cho concat demuxer"""
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for path in paths:
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+    
+    def probe(self, video_path: str) -> Optional[MediaInfo]:
+        """Đọc thông tin media bằng ffprobe (chỉ đọc header, không giải mã)"""
+        try:
+            # File không đổi thì dùng kết quả đã cache, không cần gọi ffprobe
+            if self.media_cache is not None:
+                cached = self.media_cache.get_probe(video_path)
+                if cached is not None:
+                    return cached
+            
+            cmd = [
+                self.ffprobe_path, '-v', 'error',
+                '-print_format', 'json',
+                '-show_format', '-show_streams',
+                # Chỉ đọc packet 10 giây đầu để ước lượng khoảng cách keyframe
+                '-show_packets', '-read_intervals', '%+10',
+                '-show_entries', 'packet=stream_index,pts_time,flags',
+                video_path
+            ]
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
             
-            stderr = result.stderr
-            if 'Duration:' in stderr:
-                # Parse duration
-                duration_line = [line for line in stderr.split('\n') if 'Duration:' in line][0]
-                duration_str = duration_line.split('Duration:')[1].split(',')[0].strip()
-                info['duration'] = self._parse_duration(duration_str)
-            
-            if 'Video:' in stderr:
-                # Parse video info
-                video_line = [line for line in stderr.split('\n') if 'Video:' in line][0]
-                parts = video_line.split()
-                for i, part in enumerate(parts):
-                    if 'x' in part and part.replace('x', '').replace('.', '').isdigit():
-                        try:
-                            width, height = part.split('x')
-                            info['width'] = int(width)
-                            info['height'] = int(height)
-                        except:
-                            pass
-                    elif 'fps' in part:
-                        try:
-                            info['fps'] = float(part.replace('fps', ''))
-                        except:
-                            pass
+            if result.returncode != 0:
+                logging.error(f"ffprobe lỗi: {result.stderr}")
+                return None
             
+            info = parse_ffprobe_output(video_path, json.loads(result.stdout))
+            if self.media_cache is not None:
+                self.media_cache.put_probe(video_path, info)
             return info
             
         except Exception as e:
-            logging.error(f"Lỗi lấy thông tin video: {e}")
-            return {}
+            logging.error(f"Lỗi probe video: {e}")
+            return None
     
-    def _parse_duration(self, duration_str: str) -> float:
-        """Parse duration string thành seconds"""
+    def get_keyframe_index(self, video_path: str) -> Optional[KeyframeIndex]:
+        """Lấy chỉ mục keyframe của file (đọc packet một lần rồi cache lại)
+        
+        Chỉ đọc packet (không giải mã) nên nhanh hơn nhiều so với decode.
+        """
         try:
-            # Format: HH:MM:SS.mmm
-            parts = duration_str.split(':')
-            hours = int(parts[0])
-            minutes = int(parts[1])
-            seconds = float(parts[2])
-            return hours * 3600 + minutes * 60 + seconds
-        except:
-            return 0
+            if self.media_cache is not None:
+                cached = self.media_cache.get_keyframes(video_path)
+                if cached is not None:
+                    return cached
+            
+            cmd = [
+                self.ffprobe_path, '-v', 'error',
+                '-select_streams', 'v:0',
+                '-show_entries', 'packet=pts_time,pos,flags',
+                '-of', 'csv=p=0',
+                video_path
+            ]
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+            
+            if result.returncode != 0:
+                logging.error(f"ffprobe lỗi: {result.stderr}")
+                return None
+            
+            keyframes = []
+            for line in result.stdout.splitlines():
+                fields = line.split(',')
+                if len(fields) < 3 or 'K' not in fields[2] or fields[0] in ('', 'N/A'):
+                    continue
+                pos = int(fields[1]) if fields[1].isdigit() else -1
+                keyframes.append((float(fields[0]), pos))
+            keyframes.sort()
+            
+            index = KeyframeIndex(array('d', [t for t, _ in keyframes]),
+                                  array('q', [pos for _, pos in keyframes]))
+            if self.media_cache is not None:
+                self.media_cache.put_keyframes(video_path, index)
+            return index
+            
+        except Exception as e:
+            logging.error(f"Lỗi đọc keyframe: {e}")
+            return None
+    
+    def get_video_info(self, video_path: str) -> Dict[str, Any]:
+        """Lấy thông tin video"""
+        info = self.probe(video_path)
+        return info.to_dict() if info else {}
 
 class Logger:
     """Quản lý logging"""
@@ -0,0 +1,107 @@
+"""
+Render watermark (text, logo) sẵn thành PNG để ghép bằng filter overlay
+"""
+import os
+import hashlib
+import logging
+from typing import Optional, Tuple
+from PIL import Image, ImageDraw, ImageFont
+
+# Biểu thức vị trí cho filter overlay (W/H: khung video, w/h: ảnh watermark)
+OVERLAY_POSITIONS = {
+    'top-left': ('10', '10'),
+    'top-right': ('W-w-10', '10'),
+    'bottom-left': ('10', 'H-h-10'),
+    'bottom-right': ('W-w-10', 'H-h-10'),
+    'center': ('(W-w)/2', '(H-h)/2')
+}
+
+# Lề hai bên (px) khi thu nhỏ watermark cho vừa khung hình
+WATERMARK_MARGIN = 10
+
+def overlay_filter(position: str) -> str:
+    """Filter overlay theo vị trí watermark"""
+    x, y = OVERLAY_POSITIONS.get(position, OVERLAY_POSITIONS['bottom-right'])
+    return f"overlay={x}:{y}"
+
+class WatermarkRenderer:
+    """Vẽ watermark một lần bằng Pillow, lưu PNG RGBA theo (text, font, size, màu, logo, độ phân giải)
+
+    Ghép PNG bằng `overlay` rẻ hơn nhiều so với `drawtext` dựng chữ trên
+    từng frame. Font được nạp một lần cho mỗi (font, size) và PNG đã có thì
+    không phải vẽ lại, nên chạy hàng loạt không tốn công xử lý font cho mỗi file.
+    """
+
+    def __init__(self, cache_dir: str = "data/cache/watermarks"):
+        self.cache_dir = cache_dir
+        self._fonts = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def render(self, text: str, font_path: str, size: int, color: str,
+               resolution: Optional[Tuple[int, int]] = None,
+               logo_path: Optional[str] = None) -> Optional[str]:
+        """Trả về đường dẫn PNG watermark (vẽ mới nếu chưa có trong cache)"""
+        try:
+            logo_stat = os.stat(logo_path).st_mtime_ns if logo_path and os.path.exists(logo_path) else None
+            key = repr((text, font_path, int(size), color, tuple(resolution or ()), logo_path, logo_stat))
+            png_path = os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.png')
+            if os.path.exists(png_path):
+                return png_path
+
+            image = self._draw(text, font_path, int(size), color, logo_path if logo_stat else None)
+            if resolution and resolution[0] and image.width > resolution[0] - 2 * WATERMARK_MARGIN:
+                # Watermark rộng hơn khung hình: thu nhỏ cho vừa
+                ratio = (resolution[0] - 2 * WATERMARK_MARGIN) / image.width
+                image = image.resize((max(1, int(image.width * ratio)), max(1, int(image.height * ratio))),
+                                     Image.LANCZOS)
+
+            # Ghi file tạm rồi đổi tên để process khác không đọc phải PNG dở dang
+            temp_path = f"{png_path}.{os.getpid()}.tmp"
+            image.save(temp_path, format='PNG')
+            os.replace(temp_path, png_path)
+            return png_path
+        except Exception as e:
+            logging.error(f"Lỗi render watermark: {e}")
+            return None
+
+    def _get_font(self, font_path: str, size: int) -> ImageFont.ImageFont:
+        """Nạp font (cache theo đường dẫn và cỡ chữ)"""
+        key = (font_path, size)
+        if key not in self._fonts:
+            try:
+                self._fonts[key] = ImageFont.truetype(font_path, size)
+            except OSError:
+                logging.warning(f"Không nạp được font {font_path}, dùng font mặc định")
+                self._fonts[key] = ImageFont.load_default()
+        return self._fonts[key]
+
+    def _draw(self, text: str, font_path: str, size: int, color: str,
+              logo_path: Optional[str]) -> Image.Image:
+        """Vẽ logo (nếu có) và text cạnh nhau trên nền trong suốt"""
+        parts = []
+        if logo_path:
+            logo = Image.open(logo_path).convert('RGBA')
+            # Logo cao bằng khoảng 2 dòng chữ
+            logo_height = max(1, size * 2)
+            logo = logo.resize((max(1, logo.width * logo_height // logo.height), logo_height), Image.LANCZOS)
+            parts.append(logo)
+
+        if text:
+            font = self._get_font(font_path, size)
+            left, top, right, bottom = font.getbbox(text)
+            text_image = Image.new('RGBA', (max(1, right - left), max(1, bottom - top)), (0, 0, 0, 0))
+            ImageDraw.Draw(text_image).text((-left, -top), text, font=font, fill=color)
+            parts.append(text_image)
+
+        if not parts:
+            return Image.new('RGBA', (1, 1), (0, 0, 0, 0))
+
+        spacing = size // 2 if len(parts) > 1 else 0
+        width = sum(part.width for part in parts) + spacing * (len(parts) - 1)
+        height = max(part.height for part in parts)
+        image = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+        x = 0
+        for part in parts:
+            image.alpha_composite(part, (x, (height - part.height) // 2))
+            x += part.width + spacing
+        return image
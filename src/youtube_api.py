@@ -88,8 +88,13 @@ class YouTubeAPIService:
             Logger.log_error(f"Lỗi lấy thông tin channel: {e}")
             return None
     
-    def get_channel_videos(self, channel_url: str, max_results: int = 200) -> List[Dict[str, Any]]:
-        """Lấy danh sách video của channel"""
+    def get_channel_videos(self, channel_url: str, max_results: int = 200,
+                           since: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Lấy danh sách video của channel
+
+        `since`: con trỏ { 'video_id', 'published_at' } của lần đồng bộ trước,
+        chỉ lấy video đăng sau nó (dừng phân trang khi gặp video đã biết).
+        """
         try:
             if not self.is_available():
                 Logger.log_error("YouTube API service không khả dụng")
@@ -102,10 +107,11 @@ class YouTubeAPIService:
                 return []
             
             # Thử phương pháp 1: Sử dụng uploads playlist (hiệu quả hơn)
-            videos = self._get_videos_from_uploads_playlist(channel_id, max_results)
+            videos = self._get_videos_from_uploads_playlist(channel_id, max_results, since)
             
             # Nếu không đủ video, thử phương pháp 2: Search API
-            if len(videos) < max_results * 0.5:  # Nếu ít hơn 50% số video mong muốn
+            # (đồng bộ tăng dần thì ít video là bình thường)
+            if not since and len(videos) < max_results * 0.5:  # Nếu ít hơn 50% số video mong muốn
                 Logger.log_info("Uploads playlist không đủ video, thử Search API...")
                 search_videos = self._get_videos_from_search(channel_id, max_results)
                 if len(search_videos) > len(videos):
@@ -118,8 +124,21 @@ class YouTubeAPIService:
             Logger.log_error(f"Lỗi tổng quát: {e}")
             return []
     
-    def _get_videos_from_uploads_playlist(self, channel_id: str, max_results: int) -> List[Dict[str, Any]]:
-        """Lấy video từ uploads playlist (hiệu quả hơn)"""
+    @staticmethod
+    def _is_known(item: Dict[str, Any], since: Optional[Dict[str, Any]]) -> bool:
+        """Playlist item là video của con trỏ hoặc đăng trước nó"""
+        if not since:
+            return False
+        content_details = item.get('contentDetails', {})
+        if content_details.get('videoId') == since.get('video_id'):
+            return True
+        published = content_details.get('videoPublishedAt')
+        # Video của con trỏ đã bị xóa: dừng theo thời điểm đăng
+        return bool(published and since.get('published_at') and published < since['published_at'])
+    
+    def _get_videos_from_uploads_playlist(self, channel_id: str, max_results: int,
+                                          since: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Lấy video từ uploads playlist (hiệu quả hơn), mới nhất trước"""
         try:
             # Lấy thông tin channel để lấy uploads playlist ID
             channel_request = self.service.channels().list(
@@ -154,8 +173,16 @@ class YouTubeAPIService:
                         Logger.log_info("Không còn video trong playlist")
                         break
                     
-                    # Lấy video IDs để lấy thông tin chi tiết
-                    video_ids = [item['contentDetails']['videoId'] for item in playlist_response['items']]
+                    # Lấy video IDs để lấy thông tin chi tiết, dừng ở video đã biết
+                    video_ids = []
+                    reached_known = False
+                    for item in playlist_response['items']:
+                        if self._is_known(item, since):
+                            reached_known = True
+                            break
+                        video_ids.append(item['contentDetails']['videoId'])
+                    if not video_ids:
+                        break
                     
                     # Lấy thông tin chi tiết của tất cả video trong batch
                     videos_request = self.service.videos().list(
@@ -164,8 +191,9 @@ class YouTubeAPIService:
                     )
                     videos_response = videos_request.execute()
                     
-                    # Xử lý từng video
-                    for item in videos_response['items']:
+                    # Xử lý từng video (videos().list không giữ thứ tự id, sắp lại theo playlist)
+                    order = {video_id: i for i, video_id in enumerate(video_ids)}
+                    for item in sorted(videos_response['items'], key=lambda item: order.get(item['id'], 0)):
                         if len(videos) >= max_results:
                             break
                             
@@ -191,7 +219,7 @@ class YouTubeAPIService:
                         })
                     
                     next_page_token = playlist_response.get('nextPageToken')
-                    if not next_page_token:
+                    if reached_known or not next_page_token:
                         break
                         
                     page_count += 1
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra DownloadScheduler với hàm tải giả: thứ tự ưu tiên, giới hạn theo host, tải lại, dừng
+"""
+
+import sys
+import os
+import time
+import threading
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.download_scheduler import (DownloadScheduler, PRIORITY_NORMAL, PRIORITY_SELECTED,
+                                    hook_percent, host_of)
+
+class FakeDownload:
+    """Ghi lại thứ tự gọi và số job chạy đồng thời của từng host"""
+
+    def __init__(self, delay=0.0, fail_times=0):
+        self.delay = delay
+        self.fail_times = fail_times
+        self.calls = []
+        self.active = {}
+        self.peak = {}
+        self.attempts = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, url, progress_hook=None):
+        host = host_of(url)
+        with self.lock:
+            self.calls.append(url)
+            self.active[host] = self.active.get(host, 0) + 1
+            self.peak[host] = max(self.peak.get(host, 0), self.active[host])
+            self.attempts[url] = self.attempts.get(url, 0) + 1
+            failed = self.attempts[url] <= self.fail_times
+        time.sleep(self.delay)
+        if progress_hook:
+            progress_hook({'status': 'finished'})
+        with self.lock:
+            self.active[host] -= 1
+        return None if failed else f"/tmp/{url.rsplit('/', 1)[-1]}.mp4"
+
+def test_priority_order():
+    download = FakeDownload()
+    scheduler = DownloadScheduler(download, max_workers=1, rate=0)
+    jobs = [(i, f"https://www.youtube.com/watch?v={i}",
+             PRIORITY_SELECTED if i % 2 else PRIORITY_NORMAL) for i in range(6)]
+    results = list(scheduler.run(jobs))
+    assert len(results) == 6 and all(result['output'] for result in results)
+    # Job được chọn chạy trước, cùng ưu tiên thì theo thứ tự thêm
+    assert [url.rsplit('=', 1)[-1] for url in download.calls] == ['1', '3', '5', '0', '2', '4']
+
+def test_per_host_limit():
+    download = FakeDownload(delay=0.05)
+    scheduler = DownloadScheduler(download, max_workers=6, per_host=2, rate=0)
+    jobs = [(i, f"https://www.youtube.com/watch?v={i}", PRIORITY_NORMAL) for i in range(6)]
+    jobs += [(10 + i, f"https://m.tiktok.com/@user/video/{i}", PRIORITY_NORMAL) for i in range(6)]
+    results = list(scheduler.run(jobs))
+    assert len(results) == 12
+    assert download.peak == {'youtube.com': 2, 'tiktok.com': 2}, download.peak
+
+def test_retry_then_success():
+    download = FakeDownload(fail_times=1)
+    scheduler = DownloadScheduler(download, max_workers=2, rate=0, retry_delay=0.01)
+    results = list(scheduler.run([(0, "https://www.youtube.com/watch?v=a", PRIORITY_NORMAL)]))
+    assert results[0]['output'] and download.attempts["https://www.youtube.com/watch?v=a"] == 2
+
+def test_cancel_event_stops_queue():
+    cancel_event = threading.Event()
+    download = FakeDownload(delay=0.05)
+
+    def download_then_stop(url, progress_hook=None):
+        # Bấm "Dừng tải" khi job thứ 3 bắt đầu
+        if len(download.calls) == 2:
+            cancel_event.set()
+        return download(url, progress_hook)
+
+    scheduler = DownloadScheduler(download_then_stop, max_workers=2, per_host=2, rate=0,
+                                  cancel_event=cancel_event)
+    jobs = [(i, f"https://www.youtube.com/watch?v={i}", PRIORITY_NORMAL) for i in range(20)]
+    results = list(scheduler.run(jobs))
+    # Không lấy job mới sau khi dừng; các job đang chạy lúc đó vẫn chạy nốt và trả kết quả
+    assert len(download.calls) in (3, 4), download.calls
+    assert len(results) == len(download.calls)
+
+def test_hook_percent():
+    assert hook_percent({'status': 'downloading', 'downloaded_bytes': 50, 'total_bytes': 200}) == 25.0
+    assert hook_percent({'status': 'downloading', 'fragment_index': 3, 'fragment_count': 4}) == 75.0
+    assert hook_percent({'status': 'finished'}) == 100.0
+    assert hook_percent({'status': 'downloading'}) is None
+
+if __name__ == '__main__':
+    test_priority_order()
+    test_per_host_limit()
+    test_retry_then_success()
+    test_cancel_event_stops_queue()
+    test_hook_percent()
+    print("OK")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra escape giá trị drawtext: mô phỏng 2 lớp phân tích của FFmpeg
+(filtergraph rồi option của filter, đều dùng av_get_token) và so sánh giá trị thu được
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.pipeline import PipelineCompiler
+
+WHITESPACES = ' \n\t\r'
+
+def av_get_token(buf: str, term: str):
+    """Bản Python của av_get_token (libavutil/avstring.c), trả về (token, phần còn lại)"""
+    out = []
+    end = 0
+    p = 0
+    while p < len(buf) and buf[p] in WHITESPACES:
+        p += 1
+    while p < len(buf) and buf[p] not in term:
+        c = buf[p]
+        p += 1
+        if c == '\\' and p < len(buf):
+            out.append(buf[p])
+            p += 1
+            end = len(out)
+        elif c == "'":
+            while p < len(buf) and buf[p] != "'":
+                out.append(buf[p])
+                p += 1
+            if p < len(buf):
+                p += 1
+                end = len(out)
+        else:
+            out.append(c)
+    while len(out) > end and out[-1] in WHITESPACES:
+        out.pop()
+    return ''.join(out), buf[p:]
+
+def parse_filter_options(filter_string: str) -> dict:
+    """Tách `name=k=v:k=v` như avfilter_graph_parse + av_opt_set_from_string"""
+    name, args = filter_string.split('=', 1)
+    args, rest = av_get_token(args, '[],;')
+    assert rest == '', f"filtergraph bị cắt tại: {rest!r}"
+    options = {}
+    while args:
+        key, args = args.split('=', 1)
+        value, args = av_get_token(args, ':')
+        options[key] = value
+        args = args[1:] if args.startswith(':') else args
+    return options
+
+class StaticConfig:
+    """Cấu hình tối thiểu cho PipelineCompiler (watermark mặc định)"""
+
+    def get(self, key, default=None):
+        return default
+
+def build_drawtext(text: str, font_path: str) -> str:
+    """Chuỗi drawtext do PipelineCompiler dựng khi không có PNG watermark"""
+    return PipelineCompiler(StaticConfig(), font_path)._build_watermark(text, 'bottom-right')
+
+CASES = [
+    ("it's", 'C:/Windows/Fonts/arial.ttf'),
+    ('Title: part 1', 'C:/Windows/Fonts/arial.ttf'),
+    ('back\\slash [x], y; z', '/usr/share/fonts/DejaVuSans.ttf'),
+    ("C:\\path 'quoted': 100%", 'D:\\Fonts\\my font.ttf'),
+]
+
+def test_drawtext_round_trip():
+    for text, font_path in CASES:
+        options = parse_filter_options(build_drawtext(text, font_path))
+        assert options['text'] == text, (options['text'], text)
+        assert options['fontfile'] == font_path, (options['fontfile'], font_path)
+        assert options['fontsize'] == '24'
+        assert options['y'] == 'h-th-10'
+
+if __name__ == '__main__':
+    for text, font_path in CASES:
+        options = parse_filter_options(build_drawtext(text, font_path))
+        print(f"{text!r} -> {options['text']!r} | {font_path!r} -> {options['fontfile']!r}")
+    test_drawtext_round_trip()
+    print("OK")
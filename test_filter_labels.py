@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra nhãn pad trong filter graph của PipelineCompiler: mỗi nhãn chỉ được
+tạo một lần và dùng một lần (FFmpeg từ chối graph có nhãn trùng)
+"""
+
+import re
+import sys
+import os
+from collections import Counter
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.pipeline import PipelineCompiler
+from src.probe import MediaInfo, VideoStreamInfo, AudioStreamInfo
+
+LABEL = re.compile(r'\[([^\]]+)\]')
+
+class StaticConfig:
+    """Cấu hình tối thiểu cho PipelineCompiler"""
+
+    def get(self, key, default=None):
+        return default
+
+def graph_labels(filter_graph: str):
+    """(nhãn output, nhãn input) của các pad có tên trong graph"""
+    outputs, inputs = Counter(), Counter()
+    for chain in filter_graph.split(';'):
+        chain = chain.strip()
+        # Nhãn đầu chain là input của filter đầu tiên
+        leading = re.match(r'^((?:\[[^\]]+\])*)', chain).group(1)
+        inputs.update(LABEL.findall(leading))
+        for filter_string in chain[len(leading):].split(','):
+            # Nhãn cuối mỗi filter là output; nhãn trước tên filter (sau ',') là input
+            head = re.match(r'^((?:\[[^\]]+\])*)', filter_string).group(1)
+            inputs.update(LABEL.findall(head))
+            tail = re.search(r'((?:\[[^\]]+\])*)$', filter_string).group(1)
+            outputs.update(LABEL.findall(tail))
+    return outputs, inputs
+
+def assert_unique_labels(command):
+    outputs, inputs = graph_labels(';'.join(command.filters))
+    duplicated = [label for label, count in outputs.items() if count > 1]
+    assert not duplicated, f"nhãn output trùng: {duplicated}"
+    internal = {label: count for label, count in inputs.items() if not re.match(r'^\d+:', label)}
+    assert all(count == 1 for count in internal.values()), f"nhãn dùng nhiều lần: {internal}"
+    assert set(internal) <= set(outputs), f"nhãn chưa được tạo: {set(internal) - set(outputs)}"
+
+def media():
+    return MediaInfo(duration=30.0, video=VideoStreamInfo(width=1920, height=1080),
+                     audio=[AudioStreamInfo()])
+
+def test_blur_op_with_blur_variant():
+    compiler = PipelineCompiler(StaticConfig(), '')
+    operations = [{'type': '9_16', 'params': {'mode': 'blur'}}]
+    variants = {'9_16_blur': 'out_blur.mp4', '9_16': 'out_pad.mp4', 'source': 'out.mp4'}
+    command = compiler.compile_variants('in.mp4', operations, variants, media())
+    assert_unique_labels(command)
+
+def test_two_blur_ops():
+    compiler = PipelineCompiler(StaticConfig(), '')
+    operations = [{'type': '9_16', 'params': {'mode': 'blur'}},
+                  {'type': 'flip', 'params': {'direction': 'horizontal'}},
+                  {'type': '9_16', 'params': {'mode': 'blur'}}]
+    command = compiler.compile('in.mp4', operations, 'out.mp4', media())
+    assert_unique_labels(command)
+
+def test_graph_labels_detects_duplicates():
+    outputs, _ = graph_labels("[0:v]split[a][b];[a]null[x];[b]split[a][c]")
+    assert outputs['a'] == 2
+
+if __name__ == '__main__':
+    compiler = PipelineCompiler(StaticConfig(), '')
+    command = compiler.compile_variants('in.mp4', [{'type': '9_16', 'params': {'mode': 'blur'}}],
+                                        {'9_16_blur': 'out_blur.mp4', '9_16': 'out_pad.mp4'}, media())
+    print(';'.join(command.filters))
+    test_graph_labels_detects_duplicates()
+    test_blur_op_with_blur_variant()
+    test_two_blur_ops()
+    print("OK")
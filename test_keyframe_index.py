@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra tra cứu keyframe của KeyframeIndex
+"""
+
+import sys
+import os
+from array import array
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.keyframe_index import KeyframeIndex
+
+def make_index():
+    # Keyframe mỗi 2 giây, 0..10s
+    return KeyframeIndex(array('d', [0.0, 2.0, 4.0, 6.0, 8.0, 10.0]),
+                         array('q', [0, 100, 200, 300, 400, 500]))
+
+def test_before_after():
+    index = make_index()
+    assert index.before(3.0) == 2.0
+    assert index.after(3.0) == 4.0
+    # Đúng tại keyframe (kể cả sai số làm tròn) thì trả về chính nó
+    assert index.before(4.0) == 4.0
+    assert index.after(4.0) == 4.0
+    assert index.before(4.0 - 1e-9) == 4.0
+    assert index.after(4.0 + 1e-9) == 4.0
+    assert index.before(10.5) == 10.0
+    assert index.after(10.5) is None
+    assert index.before(-1.0) is None
+    assert index.after(-1.0) == 0.0
+
+def test_nearest_and_offset():
+    index = make_index()
+    assert index.nearest(4.9) == 4.0
+    assert index.nearest(5.1) == 6.0
+    assert index.offset_before(5.0) == 200
+    assert KeyframeIndex().nearest(1.0) is None
+
+def test_interval_points():
+    index = make_index()
+    assert index.interval_points(3.0, 10.0) == [2.0, 6.0, 8.0]
+    assert index.interval_points(4.0, 10.0) == [4.0, 8.0]
+    # Khoảng dài hơn video: không chia
+    assert index.interval_points(20.0, 10.0) == []
+    # Không lấy ranh giới trùng nhau hoặc nằm ở đầu/cuối video
+    assert index.interval_points(0.5, 3.0) == [2.0]
+
+def test_blobs_round_trip():
+    index = make_index()
+    restored = KeyframeIndex.from_blobs(*index.to_blobs())
+    assert list(restored.times) == list(index.times)
+    assert list(restored.offsets) == list(index.offsets)
+
+if __name__ == '__main__':
+    test_before_after()
+    test_nearest_and_offset()
+    test_interval_points()
+    test_blobs_round_trip()
+    print("OK")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra chọn format tốt nhất và bản ghi rút gọn của metadata cache
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.metadata_cache import MetadataCache, best_format, compact_info
+
+FORMATS = [
+    {'format_id': 'audio', 'vcodec': 'none', 'acodec': 'mp4a', 'tbr': 128},
+    {'format_id': '360', 'height': 360, 'vcodec': 'avc1', 'acodec': 'mp4a', 'tbr': 600},
+    {'format_id': '720-video', 'height': 720, 'vcodec': 'avc1', 'acodec': 'none', 'tbr': 2500},
+    {'format_id': '720-low', 'height': 720, 'vcodec': 'avc1', 'acodec': 'mp4a', 'tbr': 1200},
+    {'format_id': '720-high', 'height': 720, 'vcodec': 'avc1', 'acodec': 'mp4a', 'tbr': 2000},
+    {'format_id': '1080', 'height': 1080, 'vcodec': 'avc1', 'acodec': 'none', 'tbr': 4500},
+]
+
+def test_best_format_respects_max_height():
+    assert best_format(FORMATS, 1080)['format_id'] == '1080'
+    assert best_format(FORMATS, 720)['format_id'] == '720-high'
+    assert best_format(FORMATS, 480)['format_id'] == '360'
+    assert best_format(FORMATS, 240) is None
+    assert best_format([], 1080) is None
+
+def test_best_format_skips_audio_only():
+    assert best_format(FORMATS[:1], 1080) is None
+
+def test_compact_info_keeps_fields_for_best_format():
+    record = compact_info({'id': 'abc', 'title': 'x', 'description': 'd' * 1000, 'formats': FORMATS})
+    assert 'best_format' not in record
+    assert [fmt['format_id'] for fmt in record['formats']] == [fmt['format_id'] for fmt in FORMATS[1:]]
+    assert len(record['description']) == 500
+    # Bản ghi đã rút gọn vẫn đủ trường để chọn lại theo độ phân giải khác
+    assert best_format(record['formats'], 720)['format_id'] == '720-high'
+    assert best_format(record['formats'], 1080)['format_id'] == '1080'
+
+def test_cache_ttl():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = MetadataCache(os.path.join(directory, 'metadata.db'), ttl=60)
+        cache.put('url', {'id': 'abc'})
+        assert cache.get('url') == {'id': 'abc'}
+        assert cache.get('url', ttl=-1) is None
+        assert cache.purge_expired(ttl=-1) == 1
+        assert cache.get('url') is None
+        cache.close()
+
+if __name__ == '__main__':
+    test_best_format_respects_max_height()
+    test_best_format_skips_audio_only()
+    test_compact_info_keeps_fields_for_best_format()
+    test_cache_ttl()
+    print("OK")
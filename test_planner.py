@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra OperationPlanner: bỏ thao tác thừa, đưa cắt lên đầu, chỉ đổi thứ tự thao tác giao hoán
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.planner import OperationPlanner
+from src.probe import MediaInfo, VideoStreamInfo
+
+def op(op_type, **params):
+    return {'type': op_type, 'params': params}
+
+def types(operations):
+    return [operation['type'] for operation in operations]
+
+def media(width, height, duration=60.0):
+    return MediaInfo(duration=duration, video=VideoStreamInfo(width=width, height=height))
+
+def test_drop_noops():
+    planner = OperationPlanner()
+    operations = [
+        op('speed', speed=1.0),
+        op('cut', start_time=0, duration=120),
+        op('9_16'),
+        op('flip', direction='horizontal'),
+        op('flip', direction='horizontal'),
+        op('md5'),
+        op('md5'),
+    ]
+    assert types(planner.plan(operations, media(720, 1280))) == ['md5']
+    # Không có thông tin probe: chỉ bỏ những gì chắc chắn thừa
+    assert types(planner.plan(operations)) == ['cut', '9_16', 'md5']
+
+def test_flip_different_directions_kept():
+    planner = OperationPlanner()
+    operations = [op('flip', direction='horizontal'), op('flip', direction='vertical')]
+    assert types(planner.plan(operations, media(720, 1280))) == ['flip', 'flip']
+
+def test_hoist_cut_after_speed():
+    planner = OperationPlanner()
+    operations = [op('speed', speed=2.0), op('cut', start_time=5, duration=10)]
+    planned = planner.plan(operations, media(720, 1280))
+    assert types(planned) == ['cut', 'speed']
+    # Cắt 5s..15s của video đã tăng tốc 2x = 10s..30s của video gốc
+    assert planned[0]['params']['start_time'] == 10.0
+    assert planned[0]['params']['duration'] == 20.0
+    assert operations[1]['params']['start_time'] == 5, "không được sửa danh sách gốc"
+
+def test_downscale_only_across_flip():
+    planner = OperationPlanner()
+    operations = [op('watermark', text='x'), op('flip', direction='horizontal'), op('9_16')]
+    # Video lớn hơn 720x1280: 9_16 lên trước lật, watermark giữ trước 9_16
+    assert types(planner.plan(operations, media(1920, 1080))) == ['watermark', '9_16', 'flip']
+    # Video nhỏ: 9_16 phóng to, giữ nguyên thứ tự
+    assert types(planner.plan(operations, media(640, 360))) == ['watermark', 'flip', '9_16']
+
+if __name__ == '__main__':
+    test_drop_noops()
+    test_flip_different_directions_kept()
+    test_hoist_cut_after_speed()
+    test_downscale_only_across_flip()
+    print("OK")
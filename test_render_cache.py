@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra giới hạn dung lượng của RenderCache: dọn file cũ theo LRU, giữ file vừa ghi
+"""
+
+import sys
+import os
+import time
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.render_cache import RenderCache
+
+def write_file(directory, name, size):
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(b'\0' * size)
+    return path
+
+def test_evict_least_recently_used():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = RenderCache(os.path.join(directory, 'render.db'), max_bytes=250)
+        first = write_file(directory, 'a.mp4', 100)
+        cache.put('a', first)
+        time.sleep(0.01)
+        second = write_file(directory, 'b.mp4', 100)
+        cache.put('b', second)
+        time.sleep(0.01)
+        assert cache.get('a') == first
+        time.sleep(0.01)
+        third = write_file(directory, 'c.mp4', 100)
+        cache.put('c', third)
+        # 'b' dùng lâu nhất nên bị xóa
+        assert cache.get('b') is None and not os.path.exists(second)
+        assert cache.get('a') == first and cache.get('c') == third
+        cache.close()
+
+def test_put_keeps_oversized_new_file():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = RenderCache(os.path.join(directory, 'render.db'), max_bytes=150)
+        old = write_file(directory, 'old.mp4', 100)
+        cache.put('old', old)
+        time.sleep(0.01)
+        big = write_file(directory, 'big.mp4', 500)
+        cache.put('big', big)
+        # File vừa ghi lớn hơn cả giới hạn vẫn còn để người gọi dùng
+        assert os.path.exists(big) and cache.get('big') == big
+        assert cache.get('old') is None and not os.path.exists(old)
+        cache.close()
+
+if __name__ == '__main__':
+    test_evict_least_recently_used()
+    test_put_keeps_oversized_new_file()
+    print("OK")